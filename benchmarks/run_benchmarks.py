@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+AI Agent Wizard - Suite de benchmarks del pipeline de indexación
+Genera repositorios sintéticos (ver synthetic_repo.py), instala el motor de
+este checkout en su .ai/ y mide update_index.py completo y por etapa
+(--profile) en tres escenarios:
+
+    full         Sin caché: escaneo, extracción y generación completos
+    noop         --incremental sin cambios (todo desde .ai/.cache.json)
+    edit         --incremental tras modificar un archivo
+
+Cada escenario se repite --repeat veces y se guarda la mediana. Los
+resultados van a un JSON que se puede comparar contra otro commit.
+
+USO:
+    python benchmarks/run_benchmarks.py [opciones]
+    python benchmarks/run_benchmarks.py --compare BASE.json NUEVO.json
+    python benchmarks/run_benchmarks.py --scaling RESULTADO.json
+
+OPCIONES:
+    --sizes LISTA        Tamaños separados por coma (1k, 10k, 100k o número;
+                         default: 1k)
+    --scenarios LISTA    Escenarios (default: full,noop,edit)
+    --repeat N           Repeticiones por escenario (default: 3)
+    --jobs N             Procesos de extracción (default: CPUs)
+    --mix, --routes, --imports, --classes, --functions, --seed
+                         Forma del repositorio (ver synthetic_repo.py)
+    --imports-heavy      Mide la resolución de imports: repos con 7 imports
+                         internos por archivo, escenario full por defecto y
+                         tabla de merge:import_index y merge:dependencies
+                         por tamaño (ej: --sizes 1k,10k,50k)
+    --workdir DIR        Dónde generar los repos; se reutilizan si ya existen
+                         con la misma configuración (default: temporal)
+    --output FILE        JSON de resultados (default: benchmarks/results/<commit>.json)
+    --baseline FILE      Compara contra un resultado anterior al terminar
+    --max-regression P   Con --baseline/--compare: falla (exit 1) si algo
+                         empeora más de P% (default: 10)
+    --min-seconds S      Ignora en la comparación etapas más rápidas que S
+                         segundos en la base (ruido; default: 0.1)
+    --max-exponent E     Con varios tamaños o --scaling: falla (exit 1) si
+                         alguna etapa crece más rápido que tamaño^E entre el
+                         menor y el mayor tamaño (lineal = 1.0; ej: 1.25)
+    --help, -h           Mostrar esta ayuda
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import platform
+import datetime
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+
+from synthetic_repo import generate_repo, load_repo_stats, parse_size, parse_mix, DEFAULTS, DEFAULT_MIX
+
+# Incrementar cuando cambie el formato del JSON de resultados
+RESULTS_VERSION = 1
+
+BENCH_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCH_DIR.parent
+ENGINE_DIR = REPO_DIR / 'src'
+
+SCENARIOS = ('full', 'noop', 'edit')
+
+DEFAULT_REPEAT = 3
+DEFAULT_MAX_REGRESSION = 10.0
+DEFAULT_MIN_SECONDS = 0.1
+
+# Por debajo de esto en el tamaño menor, el redondeo del perfil domina el exponente
+MIN_SCALING_SECONDS = 0.01
+
+# --imports-heavy: imports internos por archivo y etapas que se reportan
+IMPORTS_HEAVY = 7
+IMPORT_STAGES = ('merge:import_index', 'merge:dependencies')
+
+
+def _git_commit():
+    """Commit actual del checkout ('abc1234', con '-dirty' si hay cambios), o None"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=str(REPO_DIR),
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                               cwd=str(REPO_DIR), capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('-dirty' if dirty else '')
+
+
+def install_engine(repo):
+    """Copia el motor de este checkout a repo/.ai/ (reemplaza el anterior)"""
+    ai_dir = Path(repo) / '.ai'
+    engine = ai_dir / 'src'
+    if engine.exists():
+        shutil.rmtree(engine)
+    ai_dir.mkdir(exist_ok=True)
+    shutil.copytree(ENGINE_DIR, engine, ignore=shutil.ignore_patterns('__pycache__'))
+    shutil.copy2(ENGINE_DIR / 'scripts' / 'update_index.py', ai_dir / 'update_index.py')
+    return ai_dir
+
+
+def reset_outputs(ai_dir):
+    """Borra índices, caché y perfil generados (deja el motor instalado)"""
+    for entry in os.listdir(ai_dir):
+        path = os.path.join(ai_dir, entry)
+        if entry != 'update_index.py' and os.path.isfile(path):
+            os.remove(path)
+
+
+def _edit_target(repo):
+    """Primer archivo .py del repo (orden estable): el que modifica el escenario edit"""
+    for root, dirs, files in os.walk(os.path.join(repo, 'py')):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith('.py'):
+                return os.path.join(root, name)
+    return None
+
+
+def run_update(ai_dir, args, jobs=None):
+    """
+    Ejecuta update_index.py --profile en un proceso nuevo.
+
+    Returns:
+        (segundos del proceso, informe de .ai/.profile.json)
+    """
+    cmd = [sys.executable, str(Path(ai_dir) / 'update_index.py'), '--quiet', '--profile'] + args
+    if jobs:
+        cmd += ['--jobs', str(jobs)]
+    start = time.perf_counter()
+    result = subprocess.run(cmd, cwd=str(Path(ai_dir).parent), capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"update_index.py falló: {result.stdout}{result.stderr}".strip())
+    with open(Path(ai_dir) / '.profile.json', encoding='utf-8') as f:
+        return elapsed, json.load(f)
+
+
+def _stage_times(report):
+    """{'tipo:nombre': segundos} de etapas y extractores de un informe de --profile"""
+    times = {f"{s['kind']}:{s['name']}": s['wall_s'] for s in report['stages']}
+    times.update({f"extract:{e['name']}": e['wall_s'] for e in report['extractors']})
+    return times
+
+
+def run_scenario(repo, ai_dir, scenario, repeat, jobs=None):
+    """
+    Mide un escenario repeat veces.
+
+    Returns:
+        Dict {'scenario', 'runs', 'wall_s', 'pipeline_s', 'stages'} con medianas:
+        wall_s es el proceso completo (incluye arrancar Python e importar el
+        motor) y pipeline_s solo update_all()
+    """
+    walls, pipelines, stages = [], [], {}
+    target = _edit_target(repo) if scenario == 'edit' else None
+    if scenario in ('noop', 'edit'):
+        reset_outputs(ai_dir)
+        run_update(ai_dir, [], jobs)  # caché caliente
+
+    for i in range(repeat):
+        if scenario == 'full':
+            reset_outputs(ai_dir)
+            args = []
+        else:
+            args = ['--incremental']
+        original = None
+        if target:
+            with open(target, encoding='utf-8') as f:
+                original = f.read()
+            with open(target, 'a', encoding='utf-8', newline='\n') as f:
+                f.write(f"\n\ndef bench_edit_{i}(value):\n    return value\n")
+        try:
+            wall, report = run_update(ai_dir, args, jobs)
+        finally:
+            if original is not None:
+                with open(target, 'w', encoding='utf-8', newline='\n') as f:
+                    f.write(original)
+        walls.append(wall)
+        pipelines.append(report['total']['wall_s'])
+        for key, seconds in _stage_times(report).items():
+            stages.setdefault(key, []).append(seconds)
+
+    return {
+        'scenario': scenario,
+        'runs': [round(w, 4) for w in walls],
+        'wall_s': round(statistics.median(walls), 4),
+        'pipeline_s': round(statistics.median(pipelines), 4),
+        'stages': {key: round(statistics.median(values), 4) for key, values in sorted(stages.items())},
+    }
+
+
+def prepare_repo(workdir, n_files, shape):
+    """Genera (o reutiliza, si la configuración coincide) el repo sintético de n_files"""
+    repo = os.path.join(workdir, f"synthetic-{n_files}")
+    expected = dict(shape, n_files=n_files, git=False)
+    stats = load_repo_stats(repo)
+    if stats is None or stats['config'] != json.loads(json.dumps(expected)):
+        print(f"  Generando repo sintético de {n_files} archivos...", flush=True)
+        stats = generate_repo(repo, n_files, **shape)
+    return repo, stats
+
+
+def run_suite(sizes, scenarios, repeat, jobs, shape, workdir):
+    """
+    Ejecuta todos los escenarios para cada tamaño.
+
+    Returns:
+        Dict de resultados (serializable a JSON)
+    """
+    results = []
+    for n_files in sizes:
+        repo, stats = prepare_repo(workdir, n_files, shape)
+        ai_dir = install_engine(repo)
+        for scenario in scenarios:
+            print(f"  {n_files} archivos / {scenario}...", end="", flush=True)
+            entry = run_scenario(repo, ai_dir, scenario, repeat, jobs)
+            entry['size'] = n_files
+            entry['repo'] = {k: stats[k] for k in ('files', 'lines', 'routes', 'languages')}
+            results.append(entry)
+            print(f" {entry['wall_s']:.2f}s (update_all {entry['pipeline_s']:.2f}s)")
+
+    return {
+        'version': RESULTS_VERSION,
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': sys.platform,
+        'cpu_count': os.cpu_count(),
+        'config': {'sizes': sizes, 'scenarios': list(scenarios), 'repeat': repeat,
+                   'jobs': jobs, **shape},
+        'results': results,
+    }
+
+
+def compare_results(baseline, current, max_regression=DEFAULT_MAX_REGRESSION,
+                    min_seconds=DEFAULT_MIN_SECONDS):
+    """
+    Compara dos resultados por (tamaño, escenario): update_all y cada etapa.
+
+    Las etapas que en la base tardan menos de min_seconds no se comparan
+    (su variación es ruido).
+
+    Returns:
+        (líneas del informe, [regresiones]) donde cada regresión es
+        (tamaño, escenario, métrica, base, actual, porcentaje)
+    """
+    base_index = {(r['size'], r['scenario']): r for r in baseline['results']}
+    lines = [f"  Base: {baseline.get('commit')}  →  Actual: {current.get('commit')}"]
+    regressions = []
+    for entry in current['results']:
+        base = base_index.get((entry['size'], entry['scenario']))
+        if base is None:
+            continue
+        metrics = [('update_all', base['pipeline_s'], entry['pipeline_s'])]
+        metrics += [(key, seconds, entry['stages'].get(key))
+                    for key, seconds in sorted(base['stages'].items()) if seconds >= min_seconds]
+        lines.append(f"\n  {entry['size']} archivos / {entry['scenario']}")
+        for name, old, new in metrics:
+            if new is None or not old:
+                continue
+            change = (new - old) / old * 100
+            flag = ''
+            if change > max_regression:
+                flag = '  REGRESIÓN'
+                regressions.append((entry['size'], entry['scenario'], name, old, new, change))
+            lines.append(f"    {name:<36} {old:>9.3f}s → {new:>9.3f}s  {change:+7.1f}%{flag}")
+    return lines, regressions
+
+
+def scaling_exponents(report, min_seconds=DEFAULT_MIN_SECONDS):
+    """
+    Exponente de crecimiento de update_all y de cada etapa entre el menor y
+    el mayor tamaño de cada escenario: tiempo ∝ archivos^exponente.
+
+    1.0 es lineal; un bucle O(archivos × endpoints) con rutas proporcionales
+    al tamaño se acerca a 2.0. Solo se calculan las métricas que en el mayor
+    tamaño tardan al menos min_seconds.
+
+    Returns:
+        Lista [(escenario, métrica, tamaño menor, tamaño mayor, t menor, t mayor, exponente)]
+    """
+    by_scenario = {}
+    for entry in report['results']:
+        by_scenario.setdefault(entry['scenario'], []).append(entry)
+
+    rows = []
+    for scenario, entries in by_scenario.items():
+        entries.sort(key=lambda e: e['size'])
+        small, large = entries[0], entries[-1]
+        if large['size'] <= small['size']:
+            continue
+        metrics = [('update_all', small['pipeline_s'], large['pipeline_s'])]
+        metrics += [(key, small['stages'].get(key), seconds)
+                    for key, seconds in sorted(large['stages'].items())]
+        for name, t_small, t_large in metrics:
+            if t_small is None or t_small < MIN_SCALING_SECONDS or t_large < min_seconds:
+                continue
+            exponent = math.log(t_large / t_small) / math.log(large['size'] / small['size'])
+            rows.append((scenario, name, small['size'], large['size'], t_small, t_large, exponent))
+    return rows
+
+
+def stage_table(report, keys):
+    """
+    Segundos de las etapas indicadas por (tamaño, escenario).
+
+    Returns:
+        Lista [(tamaño, escenario, [segundos o None por clave])] ordenada por
+        escenario y tamaño
+    """
+    entries = sorted(report['results'], key=lambda e: (e['scenario'], e['size']))
+    return [(e['size'], e['scenario'], [e['stages'].get(key) for key in keys]) for e in entries]
+
+
+def _report_stages(report, keys):
+    """Imprime la tabla de etapas de stage_table() (con segundos por cada 1k archivos)"""
+    print(f"  Etapas por tamaño ({', '.join(keys)})")
+    for size, scenario, times in stage_table(report, keys):
+        cells = ['       -' if t is None else f"{t:>7.3f}s ({t * 1000 / size:.4f}s/1k)" for t in times]
+        print(f"    {scenario:<5} {size:>7}  " + '  '.join(cells))
+
+
+def _report_scaling(report, argv):
+    """Imprime los exponentes de crecimiento y retorna el código de salida"""
+    max_exponent = _option(argv, '--max-exponent', None, float)
+    rows = scaling_exponents(report, _option(argv, '--min-seconds', DEFAULT_MIN_SECONDS, float))
+    if not rows:
+        print("  Escalado: hacen falta al menos dos tamaños con etapas medibles")
+        return 0
+    print("  Escalado (tiempo ∝ archivos^exponente; 1.0 = lineal)")
+    slow = []
+    for scenario, name, n_small, n_large, t_small, t_large, exponent in rows:
+        flag = ''
+        if max_exponent is not None and exponent > max_exponent:
+            flag = '  SUPERLINEAL'
+            slow.append(name)
+        print(f"    {scenario:<5} {name:<36} {n_small:>7} → {n_large:<7} "
+              f"{t_small:>8.3f}s → {t_large:>8.3f}s  ^{exponent:.2f}{flag}")
+    if max_exponent is None:
+        return 0
+    if slow:
+        print(f"\n  FAIL {len(slow)} métricas crecen más rápido que archivos^{max_exponent:g}")
+        return 1
+    print(f"\n  ok Todas las métricas crecen como mucho archivos^{max_exponent:g}")
+    return 0
+
+
+def _load_json(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _option(argv, name, default, parse):
+    """Lee --name V / --name=V de argv"""
+    for i, arg in enumerate(argv):
+        if arg.startswith(name + '='):
+            return parse(arg.split('=', 1)[1])
+        if arg == name and i + 1 < len(argv):
+            return parse(argv[i + 1])
+    return default
+
+
+def _report_comparison(baseline, current, argv):
+    """Imprime la comparación y retorna el código de salida (1 si hay regresiones)"""
+    max_regression = _option(argv, '--max-regression', DEFAULT_MAX_REGRESSION, float)
+    lines, regressions = compare_results(
+        baseline, current, max_regression, _option(argv, '--min-seconds', DEFAULT_MIN_SECONDS, float)
+    )
+    print('\n'.join(lines))
+    if regressions:
+        print(f"\n  FAIL {len(regressions)} métricas empeoraron más de {max_regression:g}%")
+        return 1
+    print(f"\n  ok Ninguna métrica empeoró más de {max_regression:g}%")
+    return 0
+
+
+def main(argv):
+    if '--help' in argv or '-h' in argv:
+        print(__doc__)
+        return 0
+
+    if '--compare' in argv:
+        i = argv.index('--compare')
+        if len(argv) < i + 3:
+            print("ERROR: --compare necesita BASE.json y NUEVO.json")
+            return 2
+        return _report_comparison(_load_json(argv[i + 1]), _load_json(argv[i + 2]), argv)
+
+    if '--scaling' in argv:
+        i = argv.index('--scaling')
+        if len(argv) < i + 2:
+            print("ERROR: --scaling necesita un JSON de resultados")
+            return 2
+        return _report_scaling(_load_json(argv[i + 1]), argv)
+
+    imports_heavy = '--imports-heavy' in argv
+    sizes = _option(argv, '--sizes', [1000], lambda v: [parse_size(s) for s in v.split(',')])
+    scenarios = _option(argv, '--scenarios', ['full'] if imports_heavy else list(SCENARIOS),
+                        lambda v: v.split(','))
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        print(f"ERROR: escenarios desconocidos: {', '.join(sorted(unknown))}")
+        return 2
+    shape = {
+        'mix': _option(argv, '--mix', dict(DEFAULT_MIX), parse_mix),
+        'routes': _option(argv, '--routes', DEFAULTS['routes'], float),
+        'imports': _option(argv, '--imports', IMPORTS_HEAVY if imports_heavy else DEFAULTS['imports'], float),
+        'classes': _option(argv, '--classes', DEFAULTS['classes'], int),
+        'functions': _option(argv, '--functions', DEFAULTS['functions'], int),
+        'seed': _option(argv, '--seed', DEFAULTS['seed'], int),
+    }
+    repeat = _option(argv, '--repeat', DEFAULT_REPEAT, lambda v: max(1, int(v)))
+    jobs = _option(argv, '--jobs', None, int)
+
+    workdir = _option(argv, '--workdir', None, str)
+    temporary = workdir is None
+    if temporary:
+        workdir = tempfile.mkdtemp(prefix='ai-wizard-bench-')
+    try:
+        report = run_suite(sizes, scenarios, repeat, jobs, shape, workdir)
+    finally:
+        if temporary:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = _option(argv, '--output', None, str)
+    if output is None:
+        output = str(BENCH_DIR / 'results' / f"{report['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+        f.write('\n')
+    print(f"\n  → {output}")
+
+    status = 0
+    if imports_heavy:
+        print()
+        _report_stages(report, IMPORT_STAGES)
+    if len(sizes) > 1:
+        print()
+        status = _report_scaling(report, argv)
+    baseline = _option(argv, '--baseline', None, str)
+    if baseline:
+        print()
+        status = max(status, _report_comparison(_load_json(baseline), report, argv))
+    return status
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main(sys.argv[1:]))
+    except (ValueError, OSError, RuntimeError) as e:
+        print(f"ERROR: {e}")
+        sys.exit(2)
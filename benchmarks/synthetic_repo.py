@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+AI Agent Wizard - Generador de repositorios sintéticos para benchmarks
+Crea proyectos multi-lenguaje (Python/Flask, TypeScript/Express, Go,
+PHP/Laravel, Vue) con densidades configurables de rutas, imports, clases y
+funciones. Con la misma configuración y semilla genera exactamente los
+mismos archivos (contenido y mtime), así los resultados son comparables
+entre commits.
+
+USO:
+    python benchmarks/synthetic_repo.py <directorio> [opciones]
+
+OPCIONES:
+    --files N        Número de archivos fuente (acepta 1k, 10k, 100k; default: 1k)
+    --mix SPEC       Proporción por lenguaje (default: py=35,ts=30,go=15,php=10,vue=10)
+    --routes F       Endpoints por archivo py/ts/php, promedio (default: 0.3)
+    --imports N      Imports internos por archivo (default: 3)
+    --classes N      Clases por archivo (default: 1)
+    --functions N    Funciones/métodos por clase y por módulo (default: 4)
+    --seed N         Semilla (default: 0)
+    --git            Inicializa un repositorio git con los archivos en el índice
+    --help, -h       Mostrar esta ayuda
+"""
+
+import os
+import sys
+import json
+import random
+import shutil
+import subprocess
+
+DEFAULT_MIX = {'py': 35, 'ts': 30, 'go': 15, 'php': 10, 'vue': 10}
+
+DEFAULTS = {
+    'routes': 0.3,
+    'imports': 3,
+    'classes': 1,
+    'functions': 4,
+    'seed': 0,
+}
+
+# Archivos por paquete/directorio
+FILES_PER_PACKAGE = 100
+
+# mtime fijo (2024-01-01 UTC): la caché incremental confía en el stat de los
+# archivos generados y el repositorio es idéntico en cada generación
+FIXED_MTIME = 1704067200
+
+# Variables de entorno distintas que leen los módulos
+ENV_VARS = 40
+
+MARKER_FILE = '.synthetic.json'
+
+_ROOT_FILES = {
+    'requirements.txt': 'flask==3.0\n',
+    'package.json': json.dumps({
+        'name': 'synthetic',
+        'dependencies': {'express': '^4.19.0', 'vue': '^3.4.0'},
+    }, indent=2) + '\n',
+    'composer.json': json.dumps({'require': {'laravel/framework': '^11.0'}}, indent=2) + '\n',
+    'go.mod': 'module example.com/synthetic\n\ngo 1.22\n',
+}
+
+
+def parse_size(value):
+    """'1k' → 1000, '100k' → 100000, '2500' → 2500"""
+    value = str(value).strip().lower()
+    if value.endswith('k'):
+        return int(float(value[:-1]) * 1000)
+    return int(value)
+
+
+def parse_mix(spec):
+    """'py=50,ts=50' → {'py': 50, 'ts': 50}"""
+    mix = {}
+    for part in spec.split(','):
+        lang, _, weight = part.partition('=')
+        lang = lang.strip()
+        if lang not in DEFAULT_MIX:
+            raise ValueError(f"Lenguaje no soportado en --mix: {lang} (usa {', '.join(DEFAULT_MIX)})")
+        mix[lang] = float(weight)
+    return mix
+
+
+def _count(rng, density):
+    """Entero con promedio density (parte fraccionaria por sorteo)"""
+    whole = int(density)
+    return whole + (1 if rng.random() < density - whole else 0)
+
+
+def _file_path(lang, index):
+    """Ruta relativa del archivo index (un paquete cada FILES_PER_PACKAGE archivos)"""
+    package = f"pkg{index // FILES_PER_PACKAGE:04d}"
+    if lang == 'php':
+        return f"app/{package.capitalize()}/Mod{index}.php"
+    if lang == 'vue':
+        return f"web/components/{package}/Comp{index}.vue"
+    if lang == 'ts':
+        return f"web/src/{package}/mod{index}.ts"
+    return f"{lang}/{package}/mod{index}.{lang}"
+
+
+def _python_file(rng, index, targets, cfg):
+    lines = [f'"""Módulo sintético {index}"""\n', 'import os\n']
+    for target in targets:
+        lines.append(f"from py.pkg{target // FILES_PER_PACKAGE:04d}.mod{target} import helper_{target}_0\n")
+    n_routes = _count(rng, cfg['routes'])
+    if n_routes:
+        lines += ['from flask import Flask\n', '\n', 'app = Flask(__name__)\n']
+    lines.append('\n')
+
+    for c in range(cfg['classes']):
+        lines += ['\n', f'class Model{index}_{c}:\n',
+                  f'    """Modelo {c} del módulo {index}"""\n', '\n']
+        for k in range(cfg['functions']):
+            lines += [f'    def method_{k}(self, value):\n',
+                      f'        return helper_{index}_{k}(value) + {k}\n', '\n']
+
+    for k in range(cfg['functions']):
+        lines += ['\n', f'def helper_{index}_{k}(value):\n', f'    """Helper {k}"""\n']
+        if k == 0:
+            lines.append(f"    limit = int(os.environ.get('SYN_VAR_{index % ENV_VARS}', '10'))\n")
+        else:
+            lines.append('    limit = 10\n')
+        if targets and k == 1:
+            lines.append(f'    value = helper_{targets[0]}_0(value)\n')
+        lines.append('    return min(value, limit)\n')
+
+    for j in range(n_routes):
+        method = ('GET', 'POST', 'PUT')[j % 3]
+        lines += ['\n', '\n', f"@app.route('/py{index}/r{j}', methods=['{method}'])\n",
+                  f'def route_{index}_{j}():\n', f'    return str(helper_{index}_0({j}))\n']
+    return lines, n_routes
+
+
+def _typescript_file(rng, index, targets, cfg):
+    lines = []
+    for target in targets:
+        rel = f"../pkg{target // FILES_PER_PACKAGE:04d}/mod{target}"
+        lines.append(f"import {{ helper{target}_0 }} from '{rel}';\n")
+    n_routes = _count(rng, cfg['routes'])
+    if n_routes:
+        lines += ["import express from 'express';\n", '\n', 'const router = express.Router();\n']
+    lines.append('\n')
+
+    for c in range(cfg['classes']):
+        lines += [f'export class Service{index}_{c} {{\n']
+        for k in range(cfg['functions']):
+            lines += [f'  method{k}(value: number): number {{\n',
+                      f'    return helper{index}_{k}(value) + {k};\n', '  }\n', '\n']
+        lines += ['}\n', '\n']
+
+    for k in range(cfg['functions']):
+        lines.append(f'export function helper{index}_{k}(value: number): number {{\n')
+        if k == 0:
+            lines.append(f"  const limit = Number(process.env.SYN_VAR_{index % ENV_VARS} || 10);\n")
+        else:
+            lines.append('  const limit = 10;\n')
+        if targets and k == 1:
+            lines.append(f'  value = helper{targets[0]}_0(value);\n')
+        lines += ['  return Math.min(value, limit);\n', '}\n', '\n']
+
+    for j in range(n_routes):
+        method = ('get', 'post', 'put')[j % 3]
+        lines.append(f"router.{method}('/ts{index}/r{j}', (req, res) => res.json(helper{index}_0({j})));\n")
+    if n_routes:
+        lines += ['\n', 'export default router;\n']
+    return lines, n_routes
+
+
+def _go_file(rng, index, targets, cfg):
+    package = f"pkg{index // FILES_PER_PACKAGE:04d}"
+    lines = [f'package {package}\n', '\n', 'import (\n', '\t"fmt"\n', '\t"os"\n']
+    for target in targets:
+        lines.append(f'\t"example.com/synthetic/go/pkg{target // FILES_PER_PACKAGE:04d}"\n')
+    lines += [')\n', '\n']
+
+    for c in range(cfg['classes']):
+        lines += [f'type Model{index}_{c} struct {{\n', '\tID   int\n', '\tName string\n', '}\n', '\n']
+        for k in range(cfg['functions']):
+            lines += [f'func (m *Model{index}_{c}) Method{k}(value int) int {{\n',
+                      f'\treturn Helper{index}_{k}(value) + m.ID\n', '}\n', '\n']
+
+    for k in range(cfg['functions']):
+        lines.append(f'func Helper{index}_{k}(value int) int {{\n')
+        if k == 0:
+            lines.append(f'\tfmt.Println(os.Getenv("SYN_VAR_{index % ENV_VARS}"))\n')
+        lines += ['\treturn value + 1\n', '}\n', '\n']
+    return lines, 0
+
+
+def _php_file(rng, index, targets, cfg):
+    package = f"Pkg{index // FILES_PER_PACKAGE:04d}"
+    lines = ['<?php\n', '\n', f'namespace App\\{package};\n', '\n']
+    for target in targets:
+        lines.append(f'use App\\Pkg{target // FILES_PER_PACKAGE:04d}\\Mod{target}_0;\n')
+    n_routes = _count(rng, cfg['routes'])
+    if n_routes:
+        lines.append('use Illuminate\\Support\\Facades\\Route;\n')
+    lines.append('\n')
+
+    for c in range(cfg['classes']):
+        lines += [f'class Mod{index}_{c}\n', '{\n']
+        for k in range(cfg['functions']):
+            lines += [f'    public function method{k}($value)\n', '    {\n']
+            if k == 0:
+                lines.append(f"        $limit = env('SYN_VAR_{index % ENV_VARS}', 10);\n")
+            else:
+                lines.append('        $limit = 10;\n')
+            lines += ['        return min($value, $limit);\n', '    }\n', '\n']
+        lines += ['}\n', '\n']
+
+    for j in range(n_routes):
+        method = ('get', 'post', 'put')[j % 3]
+        lines.append(f"Route::{method}('/php{index}/r{j}', [Mod{index}_0::class, 'method0']);\n")
+    return lines, n_routes
+
+
+def _vue_file(rng, index, targets, cfg):
+    lines = ['<template>\n', f'  <div class="comp-{index}">{{{{ title }}}}</div>\n', '</template>\n',
+             '\n', '<script>\n']
+    for target in targets:
+        lines.append(f"import Comp{target} from '../pkg{target // FILES_PER_PACKAGE:04d}/Comp{target}.vue';\n")
+    lines += ['\n', 'export default {\n', f"  name: 'Comp{index}',\n", "  props: ['title', 'value'],\n"]
+    if targets:
+        lines.append(f"  components: {{ {', '.join(f'Comp{t}' for t in targets)} }},\n")
+    lines.append('  methods: {\n')
+    for k in range(cfg['functions']):
+        lines += [f'    method{k}(value) {{\n', f'      return value + {k};\n', '    },\n']
+    lines += ['  },\n', '};\n', '</script>\n']
+    return lines, 0
+
+
+_RENDERERS = {
+    'py': _python_file,
+    'ts': _typescript_file,
+    'go': _go_file,
+    'php': _php_file,
+    'vue': _vue_file,
+}
+
+
+def generate_repo(root, n_files, mix=None, routes=DEFAULTS['routes'], imports=DEFAULTS['imports'],
+                  classes=DEFAULTS['classes'], functions=DEFAULTS['functions'],
+                  seed=DEFAULTS['seed'], git=False):
+    """
+    Genera un repositorio sintético en root (lo vacía si ya existía).
+
+    Args:
+        root: Directorio destino
+        n_files: Número de archivos fuente
+        mix: Dict {lenguaje: peso} (default: DEFAULT_MIX)
+        routes: Endpoints por archivo py/ts/php (promedio)
+        imports: Imports hacia otros archivos del mismo lenguaje por archivo
+        classes: Clases por archivo
+        functions: Funciones/métodos por clase y por módulo
+        seed: Semilla del generador
+        git: Si True, crea un repositorio git con los archivos en el índice
+
+    Returns:
+        Dict con la configuración y los totales generados ({'files', 'lines',
+        'routes', 'languages': {lenguaje: archivos}, ...}), también guardado
+        en root/.synthetic.json
+    """
+    mix = mix or DEFAULT_MIX
+    cfg = {'routes': routes, 'imports': imports, 'classes': classes, 'functions': functions}
+    rng = random.Random(seed)
+
+    if os.path.exists(root):
+        shutil.rmtree(root)
+    os.makedirs(root)
+
+    # Lenguaje de cada archivo, decidido antes de escribir para poder
+    # apuntar imports a archivos que todavía no existen
+    langs = sorted(mix)
+    weights = [mix[lang] for lang in langs]
+    plan = rng.choices(langs, weights=weights, k=n_files)
+    by_lang = {lang: [] for lang in langs}
+    for index, lang in enumerate(plan):
+        by_lang[lang].append(index)
+
+    stats = {'files': n_files, 'lines': 0, 'routes': 0,
+             'languages': {lang: len(indexes) for lang, indexes in by_lang.items()}}
+    created_dirs = set()
+    for index, lang in enumerate(plan):
+        candidates = by_lang[lang]
+        n_imports = min(_count(rng, imports), len(candidates) - 1)
+        targets = []
+        while len(targets) < n_imports:
+            target = candidates[rng.randrange(len(candidates))]
+            if target != index and target not in targets:
+                targets.append(target)
+
+        lines, n_routes = _RENDERERS[lang](rng, index, targets, cfg)
+        stats['lines'] += len(lines)
+        stats['routes'] += n_routes
+
+        path = os.path.join(root, *_file_path(lang, index).split('/'))
+        directory = os.path.dirname(path)
+        if directory not in created_dirs:
+            os.makedirs(directory, exist_ok=True)
+            created_dirs.add(directory)
+        with open(path, 'w', encoding='utf-8', newline='\n') as f:
+            f.writelines(lines)
+        os.utime(path, (FIXED_MTIME, FIXED_MTIME))
+
+    for name, content in _ROOT_FILES.items():
+        path = os.path.join(root, name)
+        with open(path, 'w', encoding='utf-8', newline='\n') as f:
+            f.write(content)
+        os.utime(path, (FIXED_MTIME, FIXED_MTIME))
+
+    stats['config'] = dict(cfg, n_files=n_files, mix=mix, seed=seed, git=git)
+    marker = os.path.join(root, MARKER_FILE)
+    with open(marker, 'w', encoding='utf-8') as f:
+        json.dump(stats, f, indent=2, sort_keys=True)
+    os.utime(marker, (FIXED_MTIME, FIXED_MTIME))
+
+    if git:
+        subprocess.run(['git', 'init', '-q'], cwd=root, check=True)
+        subprocess.run(['git', 'add', '-A'], cwd=root, check=True)
+    return stats
+
+
+def load_repo_stats(root):
+    """Retorna el contenido de root/.synthetic.json, o None si no es un repo generado"""
+    try:
+        with open(os.path.join(root, MARKER_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return None
+
+
+def _option(argv, name, default, parse):
+    """Lee --name V / --name=V de argv"""
+    for i, arg in enumerate(argv):
+        if arg.startswith(name + '='):
+            return parse(arg.split('=', 1)[1])
+        if arg == name and i + 1 < len(argv):
+            return parse(argv[i + 1])
+    return default
+
+
+if __name__ == '__main__':
+    args = [a for a in sys.argv[1:] if not a.startswith('-')]
+    if '--help' in sys.argv or '-h' in sys.argv or not args:
+        print(__doc__)
+        sys.exit(0)
+
+    try:
+        stats = generate_repo(
+            args[0],
+            _option(sys.argv, '--files', 1000, parse_size),
+            mix=_option(sys.argv, '--mix', None, parse_mix),
+            routes=_option(sys.argv, '--routes', DEFAULTS['routes'], float),
+            imports=_option(sys.argv, '--imports', DEFAULTS['imports'], float),
+            classes=_option(sys.argv, '--classes', DEFAULTS['classes'], int),
+            functions=_option(sys.argv, '--functions', DEFAULTS['functions'], int),
+            seed=_option(sys.argv, '--seed', DEFAULTS['seed'], int),
+            git='--git' in sys.argv,
+        )
+    except (ValueError, OSError, subprocess.CalledProcessError) as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    print(f"  {stats['files']} archivos, {stats['lines']} líneas, {stats['routes']} endpoints")
+    print(f"  {', '.join(f'{lang}: {n}' for lang, n in sorted(stats['languages'].items()))}")
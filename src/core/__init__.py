@@ -1,14 +1,15 @@
 """Core modules - Escaneo, detección y extracción"""
 
-from .scanner import scan_files, is_empty_project, iter_source_files
+from .scanner import scan_files, is_empty_project, iter_source_files, build_manifest
 from .detectors import detect_languages, detect_frameworks, detect_services, detect_monorepo  
-from .extractors import extract_functions, extract_endpoints, extract_vue_components, extract_dependencies
+from .extractors import extract_functions, extract_endpoints, extract_vue_components, extract_dependencies, extract_all
 from .validators import validate_environment, check_python_version, check_git_installed
 
 __all__ = [
     'scan_files',
     'is_empty_project',
     'iter_source_files',
+    'build_manifest',
     'detect_languages',
     'detect_frameworks',
     'detect_services',
@@ -17,6 +18,7 @@ __all__ = [
     'extract_endpoints',
     'extract_vue_components',
     'extract_dependencies',
+    'extract_all',
     'validate_environment',
     'check_python_version',
     'check_git_installed',
@@ -0,0 +1,414 @@
+"""
+Caché incremental por archivo para la regeneración de índices.
+Guarda en .ai/.cache.json el stat (mtime, tamaño), el hash del contenido y las
+salidas de los extractores de cada archivo, de modo que solo se vuelven a leer
+y extraer los archivos que realmente cambiaron.
+"""
+
+import os
+import io
+import json
+import sys
+import pickle
+import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+try:
+    from utils.warnings import warn, vprint
+    from utils.profiler import (
+        profiled, is_profiling, enable_profiling, take_extractor_stats, merge_extractor_stats
+    )
+except ImportError:
+    def warn(msg, ctx=""): pass
+    def vprint(msg, level=1): pass
+    def profiled(kind, name=None, items=None): return lambda func: func
+    def is_profiling(): return False
+    def enable_profiling(trace_memory=False, origin=None): pass
+    def take_extractor_stats(): return {}
+    def merge_extractor_stats(stats): pass
+
+from .scanner import iter_source_files, peak_memory_mb
+from . import extractors
+from .extractors import extract_file_record, set_python_backend, register_file_visitor, extra_file_visitors
+
+CACHE_FILE = '.cache.json'
+
+# Incrementar cuando cambie el formato de los registros por archivo
+CACHE_VERSION = 1
+
+# Archivos modificados en esta ventana antes del escaneo que generó la caché no
+# se consideran confiables por stat (mtime con resolución gruesa): se verifica su hash
+RACY_WINDOW_NS = 2 * 10**9
+
+# Por debajo de este número de archivos pendientes, arrancar procesos cuesta más
+# de lo que ahorra (ej: pre-commit con pocos archivos modificados)
+MIN_PARALLEL_FILES = 64
+
+
+def _visitor_code_digest(visitor):
+    """
+    Huella del código de un visitor: el archivo fuente de su módulo (cubre
+    también sus funciones auxiliares) o, si no hay archivo, su bytecode
+    """
+    module = sys.modules.get(getattr(visitor, '__module__', None) or '')
+    source = getattr(module, '__file__', None)
+    if source:
+        try:
+            with open(source, 'rb') as f:
+                return hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+        except IOError:
+            pass
+    code = getattr(visitor, '__code__', None)
+    if code is None:
+        return ''
+    return hashlib.blake2b(code.co_code + repr(code.co_consts).encode(), digest_size=8).hexdigest()
+
+
+def _engine_fingerprint():
+    """
+    Huella del motor: invalida la caché cuando cambian los extractores, el
+    backend Python o los visitors registrados (ver register_file_visitor),
+    incluido el código de los visitors que no son del motor
+    """
+    builtin = set(extractors._BUILTIN_VISITORS)
+    visitors = sorted(
+        f"{key}={getattr(visitor, '__module__', '')}.{getattr(visitor, '__qualname__', '')}"
+        + ('' if (key, visitor) in builtin else f"@{_visitor_code_digest(visitor)}")
+        for key, visitor in extractors.FILE_VISITORS
+    )
+    digest = hashlib.blake2b(f"{CACHE_VERSION}:{extractors.PYTHON_BACKEND}:{','.join(visitors)}".encode(),
+                             digest_size=8)
+    for module_file in ('extractors.py', 'cache.py'):
+        try:
+            with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), module_file), 'rb') as f:
+                digest.update(f.read())
+        except IOError:
+            pass
+    return digest.hexdigest()
+
+
+def content_digest(data):
+    """
+    Hash rápido del contenido binario de un archivo.
+
+    Se guarda en files_map[...]['hash'] y generate_changes_yaml() lo reutiliza
+    para .ai/.state.json, sin volver a leer el archivo.
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def new_cache():
+    """Retorna una caché vacía (fuerza re-extracción completa)"""
+    return {'version': CACHE_VERSION, 'engine': _engine_fingerprint(), 'scanned_ns': 0, 'files': {}}
+
+
+@profiled('scan', items=lambda cache: len(cache['files']))
+def load_cache(ai_dir):
+    """
+    Carga la caché incremental de .ai/.cache.json.
+
+    Si no existe, está corrupta o fue creada por otra versión del motor,
+    retorna una caché vacía.
+    """
+    cache_path = os.path.join(str(ai_dir), CACHE_FILE)
+    if not os.path.exists(cache_path):
+        return new_cache()
+
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (IOError, ValueError) as e:
+        warn(f"Caché incremental ilegible, se reconstruye: {e}", "load_cache")
+        return new_cache()
+
+    if not cache_matches_engine(cache):
+        vprint("Caché de otra versión del motor, se reconstruye", level=1)
+        return new_cache()
+    return cache
+
+
+def cache_matches_engine(cache):
+    """
+    True si la caché fue creada por este motor con el backend Python y los
+    visitors actuales (llamar después de set_python_backend())
+    """
+    return cache.get('version') == CACHE_VERSION and cache.get('engine') == _engine_fingerprint()
+
+
+@profiled('write', name='.cache.json')
+def save_cache(ai_dir, cache):
+    """Guarda la caché incremental en .ai/.cache.json"""
+    os.makedirs(str(ai_dir), exist_ok=True)
+    cache_path = os.path.join(str(ai_dir), CACHE_FILE)
+    try:
+        # dumps() usa el codificador en C; dump() a un archivo usa el de Python
+        data = json.dumps(cache, separators=(',', ':'))
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+    except IOError as e:
+        warn(f"No se pudo guardar la caché incremental: {e}", "save_cache")
+
+
+def default_jobs():
+    """Número de procesos por defecto para la extracción (CPUs disponibles)"""
+    return os.cpu_count() or 1
+
+
+def _read_and_extract(filepath, rel_path, known_hash=None):
+    """
+    Lee un archivo y ejecuta todos los extractores sobre él.
+
+    Se ejecuta tanto en serie como dentro de un ProcessPoolExecutor, por lo que
+    no registra advertencias: los errores se retornan al proceso principal.
+
+    Returns:
+        Tupla (digest, ext, n_lines, record, error). record es None si el hash
+        coincide con known_hash (el registro cacheado sigue siendo válido).
+    """
+    try:
+        with open(filepath, 'rb') as f:
+            data = f.read()
+    except IOError as e:
+        return None, None, 0, None, str(e)
+
+    digest = content_digest(data)
+    if digest == known_hash:
+        return digest, None, 0, None, None
+
+    # Mismo decodificado que scan_files (modo texto, newlines universales)
+    lines = io.StringIO(data.decode('utf-8', errors='ignore'), newline=None).readlines()
+    ext = Path(filepath).suffix.lstrip('.')
+    record = extract_file_record(rel_path, {'type': ext, 'lines': len(lines), 'content': lines})
+    return digest, ext, len(lines), record, None
+
+
+def _read_and_extract_in_worker(filepath, rel_path, known_hash=None):
+    """
+    _read_and_extract() en un worker del pool, más los tiempos por extractor
+    de ese archivo ({} sin --profile) y (pid, memoria pico del worker en MB)
+    """
+    result = _read_and_extract(filepath, rel_path, known_hash)
+    return result, take_extractor_stats(), (os.getpid(), peak_memory_mb())
+
+
+def _init_worker(python_backend, profiling, visitors=()):
+    """Configura un worker del pool: backend Python, visitors registrados y perfilado (sin tracemalloc)"""
+    set_python_backend(python_backend)
+    # Con spawn/forkserver el worker solo tiene los visitors del motor
+    for key, visitor in visitors:
+        register_file_visitor(key, visitor)
+    if profiling:
+        enable_profiling(trace_memory=False)
+
+
+@profiled('scan', items=lambda result: len(result[0]))
+def scan_incremental(project_path, cache, show_progress=False, jobs=1, max_memory_mb=None, manifest=None,
+                     changed_paths=None):
+    """
+    Escanea el proyecto reutilizando los registros de la caché.
+
+    Por cada archivo fuente:
+    - stat igual al guardado → reutiliza el registro sin leer el archivo
+    - stat distinto pero mismo hash → reutiliza el registro (solo se leyó)
+    - hash distinto o archivo nuevo → re-extrae con extract_file_record()
+
+    Con jobs > 1 la lectura y extracción de los archivos pendientes se reparte
+    en un ProcessPoolExecutor. Los resultados se combinan en orden de escaneo,
+    así que la salida es idéntica a la del modo serie.
+
+    El contenido de cada archivo se libera apenas se extrae: solo se conservan
+    los registros por archivo, por lo que la memoria no crece con el tamaño
+    del corpus. Con max_memory_mb se advierte (una vez) si el pico de memoria
+    supera el límite, indicando el archivo en el que ocurrió. Con jobs > 1 el
+    pico es el de este proceso más la suma del de cada worker (cada uno lo
+    envía con sus resultados; con fork las páginas compartidas se cuentan en
+    ambos, así que es una cota superior).
+
+    Con changed_paths (ej: archivos staged en pre-commit) solo se revisan esos
+    archivos; el resto de las entradas de la caché se reutiliza sin stat.
+
+    Las entradas de archivos eliminados se descartan. cache['files'] se
+    reemplaza con el estado actual; cache['scanned_ns'] solo avanza en un
+    escaneo completo (sin changed_paths).
+
+    Args:
+        project_path: Ruta absoluta del proyecto
+        cache: Dict retornado por load_cache() o new_cache()
+        show_progress: Si True, muestra progreso de escaneo
+        jobs: Procesos para leer/extraer (1 = serie)
+        max_memory_mb: Límite de memoria pico a vigilar (None = sin límite)
+        manifest: Manifiesto de build_manifest(); si es None se recorre el árbol
+        changed_paths: Rutas relativas a revisar (None = revisar todas)
+
+    Returns:
+        Tupla (files_map, records, stats):
+        - files_map: {filepath_relativo: {'type': 'py', 'lines': N, 'hash': digest}}
+          (sin contenido; hash es content_digest() de los bytes del archivo)
+        - records: {filepath_relativo: record} en orden de escaneo
+        - stats: {'reused': N, 'extracted': N, 'removed': N,
+          'workers_peak_mb': suma de la memoria pico de los workers (0 en serie)}
+    """
+    vprint("Iniciando escaneo incremental...", level=1)
+
+    old_entries = cache.get('files', {})
+    trusted_before = cache.get('scanned_ns', 0) - RACY_WINDOW_NS
+    scanned_ns = time.time_ns()
+    stats = {'reused': 0, 'extracted': 0, 'removed': 0, 'workers_peak_mb': 0}
+    if changed_paths is not None:
+        changed_paths = {os.path.join(*p.split('/')) for p in changed_paths}
+
+    # 1. stat de todos los archivos: los que no cambiaron no se leen
+    scanned = []   # [(rel_path, filepath, stat)] en orden de escaneo
+    pending = []   # [(filepath, rel_path, hash_cacheado)] a leer/extraer
+    source_files = manifest['files'] if manifest is not None else iter_source_files(project_path)
+    for filepath in source_files:
+        rel_path = os.path.relpath(filepath, project_path)
+        if changed_paths is not None and rel_path not in changed_paths and rel_path in old_entries:
+            scanned.append((rel_path, filepath, None))
+            continue
+        try:
+            st = os.stat(filepath)
+        except OSError as e:
+            warn(f"No se pudo leer {rel_path}: {e}", "scan_incremental")
+            continue
+
+        scanned.append((rel_path, filepath, st))
+        entry = old_entries.get(rel_path)
+        if not (entry and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size
+                and entry['mtime_ns'] < trusted_before):
+            pending.append((filepath, rel_path, entry['hash'] if entry else None))
+
+    # 2. Leer y extraer los pendientes (en serie o en paralelo)
+    loaded = {}
+    total = len(pending)
+    memory_warned = False
+    for i, (rel_path, result, workers_mb) in enumerate(_iter_extracted(pending, jobs), 1):
+        if show_progress and (i % 10 == 0 or i == total):
+            percent = int(100 * i / total)
+            print(f"\r         Escaneando... {i}/{total} ({percent}%)", end="", flush=True)
+        loaded[rel_path] = result
+        stats['workers_peak_mb'] = workers_mb
+        if max_memory_mb and not memory_warned:
+            peak = peak_memory_mb()
+            if peak is not None:
+                peak += workers_mb
+            if peak is not None and peak > max_memory_mb:
+                warn(f"Memoria pico {peak:.0f} MB supera el límite de {max_memory_mb} MB "
+                     f"(al procesar {rel_path})", "scan_incremental")
+                memory_warned = True
+
+    if show_progress and total:
+        print()  # Nueva linea al terminar
+
+    # 3. Combinar en orden de escaneo
+    new_entries = {}
+    files_map = {}
+    records = {}
+    for rel_path, filepath, st in scanned:
+        entry = old_entries.get(rel_path)
+        if rel_path not in loaded:
+            new_entries[rel_path] = entry
+            files_map[rel_path] = {'type': entry['type'], 'lines': entry['lines'], 'hash': entry['hash']}
+            records[rel_path] = entry['record']
+            stats['reused'] += 1
+            continue
+
+        digest, ext, n_lines, record, error = loaded[rel_path]
+        if error:
+            warn(f"No se pudo leer {rel_path}: {error}", "scan_incremental")
+            continue
+
+        if record is None:
+            record = entry['record']
+            ext, n_lines = entry['type'], entry['lines']
+            stats['reused'] += 1
+        else:
+            stats['extracted'] += 1
+            vprint(f"Archivo re-extraído: {rel_path} ({n_lines} lineas)", level=2)
+
+        new_entries[rel_path] = {
+            'mtime_ns': st.st_mtime_ns,
+            'size': st.st_size,
+            'hash': digest,
+            'type': ext,
+            'lines': n_lines,
+            'record': record,
+        }
+        files_map[rel_path] = {'type': ext, 'lines': n_lines, 'hash': digest}
+        records[rel_path] = record
+
+    stats['removed'] = sum(1 for f in old_entries if f not in new_entries)
+    cache['files'] = new_entries
+    if changed_paths is None:
+        # En un escaneo parcial las entradas sin revisar siguen sujetas a la
+        # ventana del último escaneo completo: avanzarla las daría por confiables
+        # sin haber verificado su hash
+        cache['scanned_ns'] = scanned_ns
+
+    vprint(f"Escaneo incremental: {stats['reused']} reutilizados, {stats['extracted']} extraídos, "
+           f"{stats['removed']} eliminados", level=1)
+    return files_map, records, stats
+
+
+def cached_file_list(project_path, cache, changed_paths):
+    """
+    Archivos fuente del proyecto según la caché, sin recorrer el árbol.
+
+    Parte de los archivos de la última indexación y aplica changed_paths:
+    los que existen se agregan, los que no se quitan. El orden es el de git
+    ls-files (ruta con '/'), igual que en un escaneo completo.
+
+    Args:
+        project_path: Ruta absoluta del proyecto
+        cache: Dict retornado por load_cache()
+        changed_paths: Rutas relativas (con '/' o os.sep) que cambiaron
+
+    Returns:
+        Lista de rutas absolutas
+    """
+    rel_paths = set(cache.get('files', {}))
+    for rel_path in changed_paths:
+        rel_path = os.path.join(*rel_path.split('/'))
+        if os.path.isfile(os.path.join(project_path, rel_path)):
+            rel_paths.add(rel_path)
+        else:
+            rel_paths.discard(rel_path)
+    ordered = sorted(rel_paths, key=lambda p: p.replace(os.sep, '/'))
+    return [os.path.join(project_path, p) for p in ordered]
+
+
+def _iter_extracted(pending, jobs):
+    """
+    Genera (rel_path, resultado de _read_and_extract, memoria de workers) en
+    el orden de pending. La memoria es la suma de la memoria pico que cada
+    worker vivo reportó hasta ese archivo (MB; 0 en serie o sin getrusage)
+    """
+    visitors = extra_file_visitors()
+    if jobs > 1 and visitors and len(pending) >= MIN_PARALLEL_FILES:
+        try:
+            pickle.dumps(visitors)
+        except (pickle.PicklingError, AttributeError, TypeError) as e:
+            warn(f"Visitors registrados no serializables con pickle, extracción en serie: {e}",
+                 "scan_incremental")
+            jobs = 1
+    if jobs <= 1 or len(pending) < MIN_PARALLEL_FILES:
+        for filepath, rel_path, known_hash in pending:
+            yield rel_path, _read_and_extract(filepath, rel_path, known_hash), 0
+        return
+
+    vprint(f"Extrayendo {len(pending)} archivos con {jobs} procesos", level=1)
+    paths, rel_paths, hashes = zip(*pending)
+    chunksize = max(1, len(pending) // (jobs * 8))
+    worker_peaks = {}  # {pid: memoria pico MB}
+    # Los workers heredan el backend Python y los visitors aunque el método de arranque sea spawn
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(extractors.PYTHON_BACKEND, is_profiling(), visitors)) as executor:
+        # map() preserva el orden de entrada: salida determinista
+        results = executor.map(_read_and_extract_in_worker, paths, rel_paths, hashes, chunksize=chunksize)
+        for rel_path, (result, extractor_stats, (pid, peak)) in zip(rel_paths, results):
+            merge_extractor_stats(extractor_stats)
+            if peak is not None:
+                worker_peaks[pid] = peak
+            yield rel_path, result, sum(worker_peaks.values())
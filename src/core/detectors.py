@@ -10,11 +10,16 @@ from pathlib import Path
 
 try:
     from utils.warnings import warn, vprint
+    from utils.profiler import profiled
 except ImportError:
     def warn(msg, ctx=""): pass
     def vprint(msg, level=1): pass
+    def profiled(kind, name=None, items=None): return lambda func: func
 
+from .scanner import root_has
 
+
+@profiled('detect')
 def detect_languages(project_path, source_files_iter):
     """
     Detecta lenguajes usados por extension de archivo.
@@ -50,12 +55,14 @@ def detect_languages(project_path, source_files_iter):
     return sorted(found)
 
 
-def detect_frameworks(project_path):
+@profiled('detect', items=lambda fw: len(fw['backend']) + len(fw['frontend']))
+def detect_frameworks(project_path, manifest=None):
     """
     Detecta frameworks por archivos de configuracion.
     
     Args:
         project_path: Ruta del proyecto
+        manifest: Manifiesto de build_manifest() (evita sondear el disco)
         
     Returns:
         Dict {'backend': [...], 'frontend': [...], 'db': [...], 'other': [...]}
@@ -120,15 +127,14 @@ def detect_frameworks(project_path):
     }
 
     for filename, (category, name) in indicators.items():
-        file_path = Path(project_path) / filename
-        if file_path.exists():
+        if root_has(project_path, filename, manifest):
             if name not in detections[category]:
                 detections[category].append(name)
                 vprint(f"Detectado {name} ({filename})", level=2)
 
     # Detectar frameworks especificos en package.json
     pkg_json = Path(project_path) / 'package.json'
-    if pkg_json.exists():
+    if root_has(project_path, 'package.json', manifest):
         try:
             with open(pkg_json, 'r', encoding='utf-8') as f:
                 pkg = json.load(f)
@@ -168,7 +174,7 @@ def detect_frameworks(project_path):
     req_files = ['requirements.txt', 'Pipfile', 'pyproject.toml']
     for req_file in req_files:
         req_path = Path(project_path) / req_file
-        if req_path.exists():
+        if root_has(project_path, req_file, manifest):
             try:
                 content = req_path.read_text(encoding='utf-8').lower()
                 if 'flask' in content and 'Flask' not in detections['backend']:
@@ -200,7 +206,7 @@ def detect_frameworks(project_path):
 
     # Detectar frameworks PHP en composer.json
     composer_json = Path(project_path) / 'composer.json'
-    if composer_json.exists():
+    if root_has(project_path, 'composer.json', manifest):
         try:
             with open(composer_json, 'r', encoding='utf-8') as f:
                 composer = json.load(f)
@@ -263,12 +269,13 @@ def detect_services(project_path):
     return services
 
 
-def detect_monorepo(project_path):
+def detect_monorepo(project_path, manifest=None):
     """
     Detecta si es un monorepo y retorna workspaces.
     
     Args:
         project_path: Ruta del proyecto
+        manifest: Manifiesto de build_manifest() (evita sondear el disco)
         
     Returns:
         Dict {'is_monorepo': bool, 'tool': str, 'workspaces': []}
@@ -284,7 +291,7 @@ def detect_monorepo(project_path):
     
     for indicator, tool in monorepo_indicators.items():
         indicator_path = Path(project_path) / indicator
-        if indicator_path.exists():
+        if root_has(project_path, indicator, manifest):
             workspaces = []
             
             if indicator == 'lerna.json':
@@ -304,7 +311,7 @@ def detect_monorepo(project_path):
     
     # Detectar por package.json con workspaces
     pkg_path = Path(project_path) / 'package.json'
-    if pkg_path.exists():
+    if root_has(project_path, 'package.json', manifest):
         try:
             with open(pkg_path) as f:
                 pkg = json.load(f)
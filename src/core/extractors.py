@@ -4,14 +4,41 @@ Extrae funciones, endpoints API, componentes UI y dependencias con números
 de línea exactos para eliminar navegación manual entre archivos.
 """
 
+import ast
 import re
 import os
+from bisect import bisect_left, bisect_right
 
 try:
     from utils.warnings import warn, vprint
+    from utils.profiler import profiled, is_profiling, count_extractor
 except ImportError:
     def warn(msg, ctx=""): pass
     def vprint(msg, level=1): pass
+    def profiled(kind, name=None, items=None): return lambda func: func
+    def is_profiling(): return False
+    def count_extractor(name, func, *args): return func(*args)
+
+from .scanner import root_has
+
+
+_NEWLINE = re.compile(r'\n')
+
+
+def line_offsets(content):
+    """
+    Offsets de inicio de cada línea dentro del contenido unido de un archivo.
+    
+    Se calcula una vez por archivo y se comparte entre todos los extractores que
+    aplican regex sobre el contenido unido, para convertir posiciones a líneas
+    con line_at() sin volver a recorrer ni recortar el contenido.
+    """
+    return [0] + [m.end() for m in _NEWLINE.finditer(content)]
+
+
+def line_at(offsets, pos):
+    """Número de línea (1-based) de la posición pos, en O(log n)"""
+    return bisect_right(offsets, pos)
 
 
 def extract_functions(files_map):
@@ -42,129 +69,8 @@ def extract_functions(files_map):
     
     functions = {}
 
-    patterns = {
-        'py': [
-            (r'^(\s*)def\s+(\w+)\s*\(', 'function'),
-            (r'^(\s*)class\s+(\w+)', 'class'),
-            (r'^(\s*)async\s+def\s+(\w+)\s*\(', 'async_function'),
-        ],
-        'js': [
-            (r'^\s*(?:export\s+)?(?:async\s+)?function\s+(\w+)', 'function'),
-            (r'^\s*(?:export\s+)?const\s+(\w+)\s*=\s*(?:async\s*)?\(', 'arrow'),
-            (r'^\s*(?:export\s+)?const\s+(\w+)\s*=\s*\{', 'object'),
-            (r'^\s*(?:export\s+)?class\s+(\w+)', 'class'),
-            (r'^\s*(\w+)\s*\(.*\)\s*\{', 'method'),
-        ],
-        'ts': None,  # Usa los mismos patrones que JS
-        'tsx': None,
-        'jsx': None,
-        'go': [
-            (r'^func\s+(?:\(\w+\s+\*?\w+\)\s+)?(\w+)\s*\(', 'function'),
-            (r'^type\s+(\w+)\s+struct', 'struct'),
-            (r'^type\s+(\w+)\s+interface', 'interface'),
-        ],
-        'rs': [
-            (r'^\s*(?:pub\s+)?fn\s+(\w+)', 'function'),
-            (r'^\s*(?:pub\s+)?struct\s+(\w+)', 'struct'),
-            (r'^\s*(?:pub\s+)?enum\s+(\w+)', 'enum'),
-            (r'^\s*impl(?:<[^>]+>)?\s+(\w+)', 'impl'),
-        ],
-        'java': [
-            (r'^\s*(?:public|private|protected)?\s*(?:static\s+)?(?:\w+\s+)+(\w+)\s*\(', 'method'),
-            (r'^\s*(?:public\s+)?class\s+(\w+)', 'class'),
-            (r'^\s*(?:public\s+)?interface\s+(\w+)', 'interface'),
-        ],
-        'rb': [
-            (r'^\s*def\s+(\w+)', 'method'),
-            (r'^\s*class\s+(\w+)', 'class'),
-            (r'^\s*module\s+(\w+)', 'module'),
-        ],
-        'php': [
-            (r'^\s*(?:public|private|protected)?\s*(?:static\s+)?function\s+(\w+)', 'function'),
-            (r'^\s*class\s+(\w+)', 'class'),
-            (r'^\s*trait\s+(\w+)', 'trait'),
-            (r'^\s*interface\s+(\w+)', 'interface'),
-            (r'^\s*namespace\s+([A-Za-z_\\]+)', 'namespace'),
-        ],
-    }
-
-    # Patrones para decoradores Python
-    py_decorator_re = re.compile(r'^\s*@(\w+(?:\.\w+)*)')
-    py_dataclass_re = re.compile(r'^\s*@dataclass')
-    py_property_re = re.compile(r'^\s*@property')
-
     for filepath, info in files_map.items():
-        ext = info['type']
-        pats = patterns.get(ext)
-        if pats is None and ext in ('ts', 'tsx', 'jsx'):
-            pats = patterns.get('js')
-        if not pats:
-            continue
-
-        file_funcs = {}
-        current_class = None
-        pending_decorators = []
-
-        for i, line in enumerate(info['content'], 1):
-            # Python: capturar decoradores
-            if ext == 'py':
-                dec_match = py_decorator_re.match(line)
-                if dec_match:
-                    decorator = dec_match.group(1)
-                    pending_decorators.append(decorator)
-                    # Registrar @dataclass y @property como anotaciones especiales
-                    continue
-            
-            for pattern, kind in pats:
-                if ext == 'py':
-                    m = re.match(pattern, line)
-                    if m:
-                        indent = len(m.group(1))
-                        name = m.group(2)
-                        
-                        # Agregar prefijo de decorador si es relevante
-                        decorator_prefix = ""
-                        if pending_decorators:
-                            for dec in pending_decorators:
-                                if dec in ('dataclass', 'dataclasses.dataclass'):
-                                    decorator_prefix = "@dataclass "
-                                elif dec == 'property':
-                                    decorator_prefix = "@property "
-                                elif dec in ('abstractmethod', 'abc.abstractmethod'):
-                                    decorator_prefix = "@abstract "
-                                elif dec in ('staticmethod',):
-                                    decorator_prefix = "@static "
-                                elif dec in ('classmethod',):
-                                    decorator_prefix = "@classmethod "
-                            pending_decorators = []
-                        else:
-                            pending_decorators = []
-                        
-                        if kind == 'class':
-                            current_class = name
-                            display_name = f"{decorator_prefix}{name}" if decorator_prefix else name
-                            file_funcs[display_name] = i
-                        elif indent > 0 and current_class:
-                            display_name = f"{current_class}.{decorator_prefix}{name}" if decorator_prefix else f"{current_class}.{name}"
-                            file_funcs[display_name] = i
-                        else:
-                            current_class = None
-                            display_name = f"{decorator_prefix}{name}" if decorator_prefix else name
-                            file_funcs[display_name] = i
-                        break
-                else:
-                    m = re.match(pattern, line)
-                    if m:
-                        name = m.group(1) if m.lastindex else m.group(0).strip()
-                        if name and not name.startswith(('if', 'for', 'while', 'switch', 'return', 'else')):
-                            file_funcs[name] = i
-                        break
-            else:
-                # Si no hubo match en ningún patrón, resetear decoradores pendientes
-                # solo si la línea no es vacía ni comentario
-                if ext == 'py' and line.strip() and not line.strip().startswith('#') and not line.strip().startswith('@'):
-                    pending_decorators = []
-
+        file_funcs = _extract_file_functions(info['type'], info['content'])
         if file_funcs:
             functions[filepath] = file_funcs
             vprint(f"{filepath}: {len(file_funcs)} funciones", level=2)
@@ -173,6 +79,157 @@ def extract_functions(files_map):
     return functions
 
 
+FUNCTION_PATTERNS = {
+    'py': [
+        (r'^(\s*)def\s+(\w+)\s*\(', 'function'),
+        (r'^(\s*)class\s+(\w+)', 'class'),
+        (r'^(\s*)async\s+def\s+(\w+)\s*\(', 'async_function'),
+    ],
+    'js': [
+        (r'^\s*(?:export\s+)?(?:async\s+)?function\s+(\w+)', 'function'),
+        (r'^\s*(?:export\s+)?const\s+(\w+)\s*=\s*(?:async\s*)?\(', 'arrow'),
+        (r'^\s*(?:export\s+)?const\s+(\w+)\s*=\s*\{', 'object'),
+        (r'^\s*(?:export\s+)?class\s+(\w+)', 'class'),
+        (r'^\s*(\w+)\s*\(.*\)\s*\{', 'method'),
+    ],
+    'ts': None,  # Usa los mismos patrones que JS
+    'tsx': None,
+    'jsx': None,
+    'go': [
+        (r'^func\s+(?:\(\w+\s+\*?\w+\)\s+)?(\w+)\s*\(', 'function'),
+        (r'^type\s+(\w+)\s+struct', 'struct'),
+        (r'^type\s+(\w+)\s+interface', 'interface'),
+    ],
+    'rs': [
+        (r'^\s*(?:pub\s+)?fn\s+(\w+)', 'function'),
+        (r'^\s*(?:pub\s+)?struct\s+(\w+)', 'struct'),
+        (r'^\s*(?:pub\s+)?enum\s+(\w+)', 'enum'),
+        (r'^\s*impl(?:<[^>]+>)?\s+(\w+)', 'impl'),
+    ],
+    'java': [
+        (r'^\s*(?:public|private|protected)?\s*(?:static\s+)?(?:\w+\s+)+(\w+)\s*\(', 'method'),
+        (r'^\s*(?:public\s+)?class\s+(\w+)', 'class'),
+        (r'^\s*(?:public\s+)?interface\s+(\w+)', 'interface'),
+    ],
+    'rb': [
+        (r'^\s*def\s+(\w+)', 'method'),
+        (r'^\s*class\s+(\w+)', 'class'),
+        (r'^\s*module\s+(\w+)', 'module'),
+    ],
+    'php': [
+        (r'^\s*(?:public|private|protected)?\s*(?:static\s+)?function\s+(\w+)', 'function'),
+        (r'^\s*class\s+(\w+)', 'class'),
+        (r'^\s*trait\s+(\w+)', 'trait'),
+        (r'^\s*interface\s+(\w+)', 'interface'),
+        (r'^\s*namespace\s+([A-Za-z_\\]+)', 'namespace'),
+    ],
+}
+
+# Patrones para decoradores Python
+_PY_DECORATOR_RE = re.compile(r'^\s*@(\w+(?:\.\w+)*)')
+
+
+def _compile_function_patterns():
+    """
+    Compila FUNCTION_PATTERNS una sola vez.
+    
+    Por lenguaje retorna (prefiltro, [(regex, kind)]). El prefiltro es la
+    alternación de todos los patrones: una sola búsqueda descarta las líneas
+    que no pueden coincidir con ninguno, y solo las que pasan se prueban
+    patrón por patrón (en el orden original, así gana el mismo patrón).
+    """
+    compiled = {}
+    for ext, pats in FUNCTION_PATTERNS.items():
+        if pats is None:
+            pats = FUNCTION_PATTERNS['js']
+        prefilter = re.compile('|'.join(f'(?:{pattern})' for pattern, _ in pats))
+        compiled[ext] = (prefilter, [(re.compile(pattern), kind) for pattern, kind in pats])
+    return compiled
+
+
+_COMPILED_FUNCTION_PATTERNS = _compile_function_patterns()
+
+
+def _extract_file_functions(ext, content_lines):
+    """Extrae funciones/clases de un solo archivo. Retorna {function_name: line_number}"""
+    table = _COMPILED_FUNCTION_PATTERNS.get(ext)
+    if not table:
+        return {}
+    prefilter, pats = table
+
+    file_funcs = {}
+    current_class = None
+    pending_decorators = []
+
+    for i, line in enumerate(content_lines, 1):
+        # Python: capturar decoradores
+        if ext == 'py':
+            dec_match = _PY_DECORATOR_RE.match(line)
+            if dec_match:
+                decorator = dec_match.group(1)
+                pending_decorators.append(decorator)
+                # Registrar @dataclass y @property como anotaciones especiales
+                continue
+        
+        if not prefilter.match(line):
+            # Ningún patrón coincide: mismo efecto que agotar el for de abajo
+            if ext == 'py' and line.strip() and not line.strip().startswith('#') and not line.strip().startswith('@'):
+                pending_decorators = []
+            continue
+        
+        for pattern, kind in pats:
+            if ext == 'py':
+                m = pattern.match(line)
+                if m:
+                    indent = len(m.group(1))
+                    name = m.group(2)
+                    
+                    # Agregar prefijo de decorador si es relevante
+                    decorator_prefix = ""
+                    if pending_decorators:
+                        for dec in pending_decorators:
+                            if dec in ('dataclass', 'dataclasses.dataclass'):
+                                decorator_prefix = "@dataclass "
+                            elif dec == 'property':
+                                decorator_prefix = "@property "
+                            elif dec in ('abstractmethod', 'abc.abstractmethod'):
+                                decorator_prefix = "@abstract "
+                            elif dec in ('staticmethod',):
+                                decorator_prefix = "@static "
+                            elif dec in ('classmethod',):
+                                decorator_prefix = "@classmethod "
+                        pending_decorators = []
+                    else:
+                        pending_decorators = []
+                    
+                    if kind == 'class':
+                        current_class = name
+                        display_name = f"{decorator_prefix}{name}" if decorator_prefix else name
+                        file_funcs[display_name] = i
+                    elif indent > 0 and current_class:
+                        display_name = f"{current_class}.{decorator_prefix}{name}" if decorator_prefix else f"{current_class}.{name}"
+                        file_funcs[display_name] = i
+                    else:
+                        current_class = None
+                        display_name = f"{decorator_prefix}{name}" if decorator_prefix else name
+                        file_funcs[display_name] = i
+                    break
+            else:
+                m = pattern.match(line)
+                if m:
+                    name = m.group(1) if m.lastindex else m.group(0).strip()
+                    if name and not name.startswith(('if', 'for', 'while', 'switch', 'return', 'else')):
+                        file_funcs[name] = i
+                    break
+        else:
+            # Si no hubo match en ningún patrón, resetear decoradores pendientes
+            # solo si la línea no es vacía ni comentario
+            if ext == 'py' and line.strip() and not line.strip().startswith('#') and not line.strip().startswith('@'):
+                pending_decorators = []
+
+    return file_funcs
+
+
 def extract_endpoints(files_map):
     """
     Extrae endpoints API de frameworks web.
@@ -195,108 +252,128 @@ def extract_endpoints(files_map):
     
     endpoints = {}
 
-    flask_pattern = re.compile(
-        r"""@\w+\.route\(\s*['"]([^'"]+)['"]\s*(?:,\s*methods\s*=\s*\[([^\]]+)\])?\s*\)"""
-    )
-    express_pattern = re.compile(
-        r"""(?:app|router)\.(get|post|put|patch|delete)\(\s*['"]([^'"]+)['"]"""
-    )
-    fastapi_pattern = re.compile(
-        r"""@\w+\.(get|post|put|patch|delete)\(\s*['"]([^'"]+)['"]"""
-    )
-    # Django: path('route/', view, name='...')
-    django_path_pattern = re.compile(
-        r"""(?:path|re_path)\(\s*['"]([^'"]*)['"]\s*,\s*(\w+(?:\.\w+)*)"""
-    )
-    # Laravel: Route::get('/route', [Controller::class, 'method']) o Route::get('/route', 'Controller@method')
-    laravel_pattern = re.compile(
-        r"""Route::(get|post|put|patch|delete|any)\(\s*['"]([^'"]+)['"]"""
-    )
-    # NestJS: @Get('/route'), @Post('/route')
-    nestjs_pattern = re.compile(
-        r"""@(Get|Post|Put|Patch|Delete)\(\s*(?:['"]([^'"]*)['"]\s*)?\)"""
-    )
-
     for filepath, info in files_map.items():
         content = ''.join(info['content'])
-        ext = info['type']
+        offsets = line_offsets(content)
+        endpoints.update(_extract_file_endpoints(filepath, info['type'], content, offsets))
 
-        # Flask
-        for match in flask_pattern.finditer(content):
-            route = match.group(1)
-            methods = match.group(2)
-            if methods:
-                for method in re.findall(r"'(\w+)'", methods):
-                    key = f"{method.upper()} {route}"
-                    pos = match.end()
-                    handler_match = re.search(r'def\s+(\w+)', content[pos:pos+200])
-                    handler = handler_match.group(1) if handler_match else 'unknown'
-                    line = content[:match.start()].count('\n') + 1
-                    endpoints[key] = {'handler': handler, 'file': filepath, 'line': line}
-            else:
-                key = f"GET {route}"
-                pos = match.end()
-                handler_match = re.search(r'def\s+(\w+)', content[pos:pos+200])
-                handler = handler_match.group(1) if handler_match else 'unknown'
-                line = content[:match.start()].count('\n') + 1
-                endpoints[key] = {'handler': handler, 'file': filepath, 'line': line}
-
-        # Express & FastAPI
-        for pattern in [express_pattern, fastapi_pattern]:
-            for match in pattern.finditer(content):
-                method = match.group(1).upper()
-                route = match.group(2)
-                key = f"{method} {route}"
-                line = content[:match.start()].count('\n') + 1
-                # Intentar encontrar handler
-                pos = match.end()
-                handler_match = re.search(r'(?:def|async def|function)\s+(\w+)', content[pos:pos+300])
-                handler = handler_match.group(1) if handler_match else 'inline'
-                endpoints[key] = {'handler': handler, 'file': filepath, 'line': line}
+    vprint(f"Total endpoints extraidos: {len(endpoints)}", level=1)
+    return endpoints
 
-        # Django urls.py
-        if ext == 'py' and ('urls' in filepath.lower() or 'urlpatterns' in content):
-            for match in django_path_pattern.finditer(content):
-                route = match.group(1)
-                handler = match.group(2)
-                key = f"ALL /{route}" if route else f"ALL /"
-                line = content[:match.start()].count('\n') + 1
-                endpoints[key] = {'handler': handler, 'file': filepath, 'line': line}
 
-        # Laravel routes
-        if ext == 'php':
-            for match in laravel_pattern.finditer(content):
-                method = match.group(1).upper()
-                route = match.group(2)
-                key = f"{method} {route}"
-                line = content[:match.start()].count('\n') + 1
-                # Intentar encontrar controller
-                pos = match.end()
-                ctrl_match = re.search(r"""(\w+)(?:::class|@(\w+))""", content[pos:pos+200])
-                handler = ctrl_match.group(1) if ctrl_match else 'inline'
-                if ctrl_match and ctrl_match.group(2):
-                    handler = f"{ctrl_match.group(1)}@{ctrl_match.group(2)}"
-                endpoints[key] = {'handler': handler, 'file': filepath, 'line': line}
+_FLASK_PATTERN = re.compile(
+    r"""@\w+\.route\(\s*['"]([^'"]+)['"]\s*(?:,\s*methods\s*=\s*\[([^\]]+)\])?\s*\)"""
+)
+_EXPRESS_PATTERN = re.compile(
+    r"""(?:app|router)\.(get|post|put|patch|delete)\(\s*['"]([^'"]+)['"]"""
+)
+_FASTAPI_PATTERN = re.compile(
+    r"""@\w+\.(get|post|put|patch|delete)\(\s*['"]([^'"]+)['"]"""
+)
+# Django: path('route/', view, name='...')
+_DJANGO_PATH_PATTERN = re.compile(
+    r"""(?:path|re_path)\(\s*['"]([^'"]*)['"]\s*,\s*(\w+(?:\.\w+)*)"""
+)
+# Laravel: Route::get('/route', [Controller::class, 'method']) o Route::get('/route', 'Controller@method')
+_LARAVEL_PATTERN = re.compile(
+    r"""Route::(get|post|put|patch|delete|any)\(\s*['"]([^'"]+)['"]"""
+)
+# NestJS: @Get('/route'), @Post('/route')
+_NESTJS_PATTERN = re.compile(
+    r"""@(Get|Post|Put|Patch|Delete)\(\s*(?:['"]([^'"]*)['"]\s*)?\)"""
+)
+
+
+_FLASK_HANDLER = re.compile(r'def\s+(\w+)')
+_ROUTE_HANDLER = re.compile(r'(?:def|async def|function)\s+(\w+)')
+_LARAVEL_CONTROLLER = re.compile(r"""(\w+)(?:::class|@(\w+))""")
+_NESTJS_HANDLER = re.compile(r'(?:async\s+)?(\w+)\s*\(')
+
+
+def _extract_file_endpoints(filepath, ext, content, offsets):
+    """
+    Extrae endpoints de un solo archivo. Retorna {endpoint_key: {'handler', 'file', 'line'}}
+    
+    offsets es line_offsets() del mismo contenido: las líneas se obtienen por
+    bisect y los handlers se buscan con pos/endpos, sin recortar content.
+    """
+    endpoints = {}
 
-        # NestJS decorators
-        if ext in ('ts', 'js'):
-            # Primero detectar el controller
-            controller_match = re.search(r"@Controller\(\s*['\"](/[^'\"]*)['\"]", content)
-            base_route = controller_match.group(1) if controller_match else ''
-            
-            for match in nestjs_pattern.finditer(content):
-                method = match.group(1).upper()
-                route = match.group(2) or ''
-                full_route = f"{base_route}/{route}".replace('//', '/')
-                key = f"{method} {full_route}"
-                line = content[:match.start()].count('\n') + 1
-                # Intentar encontrar método handler
+    # Flask
+    for match in _FLASK_PATTERN.finditer(content):
+        route = match.group(1)
+        methods = match.group(2)
+        if methods:
+            for method in re.findall(r"'(\w+)'", methods):
+                key = f"{method.upper()} {route}"
                 pos = match.end()
-                handler_match = re.search(r'(?:async\s+)?(\w+)\s*\(', content[pos:pos+100])
+                handler_match = _FLASK_HANDLER.search(content, pos, pos + 200)
                 handler = handler_match.group(1) if handler_match else 'unknown'
+                line = line_at(offsets, match.start())
                 endpoints[key] = {'handler': handler, 'file': filepath, 'line': line}
+        else:
+            key = f"GET {route}"
+            pos = match.end()
+            handler_match = _FLASK_HANDLER.search(content, pos, pos + 200)
+            handler = handler_match.group(1) if handler_match else 'unknown'
+            line = line_at(offsets, match.start())
+            endpoints[key] = {'handler': handler, 'file': filepath, 'line': line}
+
+    # Express & FastAPI
+    for pattern in [_EXPRESS_PATTERN, _FASTAPI_PATTERN]:
+        for match in pattern.finditer(content):
+            method = match.group(1).upper()
+            route = match.group(2)
+            key = f"{method} {route}"
+            line = line_at(offsets, match.start())
+            # Intentar encontrar handler
+            pos = match.end()
+            handler_match = _ROUTE_HANDLER.search(content, pos, pos + 300)
+            handler = handler_match.group(1) if handler_match else 'inline'
+            endpoints[key] = {'handler': handler, 'file': filepath, 'line': line}
+
+    # Django urls.py
+    if ext == 'py' and ('urls' in filepath.lower() or 'urlpatterns' in content):
+        for match in _DJANGO_PATH_PATTERN.finditer(content):
+            route = match.group(1)
+            handler = match.group(2)
+            key = f"ALL /{route}" if route else f"ALL /"
+            line = line_at(offsets, match.start())
+            endpoints[key] = {'handler': handler, 'file': filepath, 'line': line}
+
+    # Laravel routes
+    if ext == 'php':
+        for match in _LARAVEL_PATTERN.finditer(content):
+            method = match.group(1).upper()
+            route = match.group(2)
+            key = f"{method} {route}"
+            line = line_at(offsets, match.start())
+            # Intentar encontrar controller
+            pos = match.end()
+            ctrl_match = _LARAVEL_CONTROLLER.search(content, pos, pos + 200)
+            handler = ctrl_match.group(1) if ctrl_match else 'inline'
+            if ctrl_match and ctrl_match.group(2):
+                handler = f"{ctrl_match.group(1)}@{ctrl_match.group(2)}"
+            endpoints[key] = {'handler': handler, 'file': filepath, 'line': line}
+
+    # NestJS decorators
+    if ext in ('ts', 'js'):
+        # Primero detectar el controller
+        controller_match = re.search(r"@Controller\(\s*['\"](/[^'\"]*)['\"]", content)
+        base_route = controller_match.group(1) if controller_match else ''
+        
+        for match in _NESTJS_PATTERN.finditer(content):
+            method = match.group(1).upper()
+            route = match.group(2) or ''
+            full_route = f"{base_route}/{route}".replace('//', '/')
+            key = f"{method} {full_route}"
+            line = line_at(offsets, match.start())
+            # Intentar encontrar método handler
+            pos = match.end()
+            handler_match = _NESTJS_HANDLER.search(content, pos, pos + 100)
+            handler = handler_match.group(1) if handler_match else 'unknown'
+            endpoints[key] = {'handler': handler, 'file': filepath, 'line': line}
 
-    vprint(f"Total endpoints extraidos: {len(endpoints)}", level=1)
     return endpoints
 
 
@@ -320,121 +397,140 @@ def extract_ui_components(files_map):
     
     components = {}
 
-    # Patrones React
-    react_func_component = re.compile(
-        r"""(?:export\s+)?(?:default\s+)?function\s+([A-Z]\w+)\s*\("""
-    )
-    react_arrow_component = re.compile(
-        r"""(?:export\s+)?(?:default\s+)?const\s+([A-Z]\w+)\s*(?::\s*\w+(?:<[^>]+>)?\s*)?=\s*(?:React\.)?(?:memo|forwardRef)?\s*\(?(?:async\s*)?\("""
-    )
-    react_hook_pattern = re.compile(r'\buse[A-Z]\w+')
-    react_props_pattern = re.compile(r'(?:interface|type)\s+(\w+Props)\s*(?:=\s*)?{([^}]+)}', re.DOTALL)
-
     for filepath, info in files_map.items():
         content = ''.join(info['content'])
-        ext = info['type']
-
-        # === VUE COMPONENTS ===
-        if ext == 'vue' or (ext in ('js', 'ts') and ('defineComponent' in content or 'createApp' in content)):
-            # Detectar nombre del componente
-            name_match = re.search(r"name:\s*['\"](\w+)['\"]", content)
-            if not name_match:
-                if '.vue' in filepath:
-                    # Nombre del archivo sin extensión
-                    name_match_fallback = os.path.splitext(os.path.basename(filepath))[0]
-                    if name_match_fallback[0].isupper():
-                        comp_name = name_match_fallback
-                    else:
-                        continue
+        _merge_components(components, _extract_file_components(filepath, info['type'], content))
+
+    vprint(f"Total componentes extraidos: {len(components)}", level=1)
+    return components
+
+
+# Patrones React
+_REACT_FUNC_COMPONENT = re.compile(
+    r"""(?:export\s+)?(?:default\s+)?function\s+([A-Z]\w+)\s*\("""
+)
+_REACT_ARROW_COMPONENT = re.compile(
+    r"""(?:export\s+)?(?:default\s+)?const\s+([A-Z]\w+)\s*(?::\s*\w+(?:<[^>]+>)?\s*)?=\s*(?:React\.)?(?:memo|forwardRef)?\s*\(?(?:async\s*)?\("""
+)
+_REACT_HOOK_PATTERN = re.compile(r'\buse[A-Z]\w+')
+_REACT_PROPS_PATTERN = re.compile(r'(?:interface|type)\s+(\w+Props)\s*(?:=\s*)?{([^}]+)}', re.DOTALL)
+
+
+def _merge_components(components, file_components):
+    """
+    Integra los componentes de un archivo al mapa global.
+    Vue/Svelte sobreescriben; React conserva la primera definición encontrada.
+    """
+    for comp_name, comp in file_components.items():
+        if comp['type'] == 'react' and comp_name in components:
+            continue
+        components[comp_name] = comp
+
+
+def _extract_file_components(filepath, ext, content):
+    """Extrae componentes UI de un solo archivo. Retorna {component_name: {...}}"""
+    components = {}
+
+    # === VUE COMPONENTS ===
+    if ext == 'vue' or (ext in ('js', 'ts') and ('defineComponent' in content or 'createApp' in content)):
+        # Detectar nombre del componente
+        name_match = re.search(r"name:\s*['\"](\w+)['\"]", content)
+        if not name_match:
+            if '.vue' in filepath:
+                # Nombre del archivo sin extensión
+                name_match_fallback = os.path.splitext(os.path.basename(filepath))[0]
+                if name_match_fallback[0].isupper():
+                    comp_name = name_match_fallback
                 else:
-                    name_match = re.search(r"const\s+(\w+)\s*=\s*(?:defineComponent|createApp)", content)
-                    if not name_match:
-                        continue
-                    comp_name = name_match.group(1)
+                    return components
             else:
+                name_match = re.search(r"const\s+(\w+)\s*=\s*(?:defineComponent|createApp)", content)
+                if not name_match:
+                    return components
                 comp_name = name_match.group(1)
+        else:
+            comp_name = name_match.group(1)
 
-            # Extraer props
-            props = []
-            props_match = re.search(r"(?:defineProps|props)\s*(?:<[^>]+>)?\s*\(\s*\[([^\]]+)\]", content)
+        # Extraer props
+        props = []
+        props_match = re.search(r"(?:defineProps|props)\s*(?:<[^>]+>)?\s*\(\s*\[([^\]]+)\]", content)
+        if props_match:
+            props = re.findall(r"['\"](\w+)['\"]", props_match.group(1))
+        else:
+            props_match = re.search(r"(?:defineProps|props)\s*(?:<[^>]+>)?\s*\(\s*\{([^}]+)\}", content, re.DOTALL)
+            if not props_match:
+                props_match = re.search(r"props:\s*\{([^}]+)\}", content, re.DOTALL)
             if props_match:
-                props = re.findall(r"['\"](\w+)['\"]", props_match.group(1))
-            else:
-                props_match = re.search(r"(?:defineProps|props)\s*(?:<[^>]+>)?\s*\(\s*\{([^}]+)\}", content, re.DOTALL)
-                if not props_match:
-                    props_match = re.search(r"props:\s*\{([^}]+)\}", content, re.DOTALL)
-                if props_match:
-                    props = re.findall(r"(\w+)\s*:", props_match.group(1))
-
-            # Extraer emits
-            emits = []
-            emits_match = re.search(r"(?:defineEmits|emits)\s*\(\s*\[([^\]]+)\]", content)
-            if not emits_match:
-                emits_match = re.search(r"emits:\s*\[([^\]]+)\]", content)
-            if emits_match:
-                emits = re.findall(r"['\"]([^'\"]+)['\"]", emits_match.group(1))
-
-            if props or emits or 'template' in content or '<template' in content:
-                components[comp_name] = {
-                    'file': filepath,
-                    'props': props,
-                    'emits': emits,
-                    'hooks': [],
-                    'type': 'vue'
-                }
-                vprint(f"Vue: {comp_name}: {len(props)} props, {len(emits)} emits", level=2)
+                props = re.findall(r"(\w+)\s*:", props_match.group(1))
 
-        # === REACT COMPONENTS ===
-        elif ext in ('jsx', 'tsx', 'js', 'ts'):
-            # Verificar si parece un archivo React
-            has_jsx = 'React' in content or 'react' in content or 'jsx' in content or ext in ('jsx', 'tsx')
-            if not has_jsx:
-                continue
+        # Extraer emits
+        emits = []
+        emits_match = re.search(r"(?:defineEmits|emits)\s*\(\s*\[([^\]]+)\]", content)
+        if not emits_match:
+            emits_match = re.search(r"emits:\s*\[([^\]]+)\]", content)
+        if emits_match:
+            emits = re.findall(r"['\"]([^'\"]+)['\"]", emits_match.group(1))
 
-            # Buscar componentes función
-            for pattern in [react_func_component, react_arrow_component]:
-                for match in pattern.finditer(content):
-                    comp_name = match.group(1)
-                    
-                    # Extraer hooks usados
-                    hooks = list(set(react_hook_pattern.findall(content)))
-                    
-                    # Extraer props de TypeScript interface/type
-                    props = []
-                    props_match = react_props_pattern.search(content)
-                    if props_match:
-                        props = re.findall(r'(\w+)\s*[?:]', props_match.group(2))
-                    
-                    if comp_name not in components:
-                        components[comp_name] = {
-                            'file': filepath,
-                            'props': props,
-                            'emits': [],
-                            'hooks': hooks[:10],  # máximo 10 hooks
-                            'type': 'react'
-                        }
-                        vprint(f"React: {comp_name}: {len(props)} props, {len(hooks)} hooks", level=2)
-
-        # === SVELTE COMPONENTS ===
-        elif ext == 'svelte':
-            comp_name = os.path.splitext(os.path.basename(filepath))[0]
-            
-            # Extraer props (export let)
-            props = re.findall(r'export\s+let\s+(\w+)', content)
-            
-            # Extraer eventos (dispatch)
-            emits = re.findall(r"dispatch\(\s*['\"](\w+)['\"]", content)
-            
+        if props or emits or 'template' in content or '<template' in content:
             components[comp_name] = {
                 'file': filepath,
                 'props': props,
                 'emits': emits,
                 'hooks': [],
-                'type': 'svelte'
+                'type': 'vue'
             }
-            vprint(f"Svelte: {comp_name}: {len(props)} props", level=2)
+            vprint(f"Vue: {comp_name}: {len(props)} props, {len(emits)} emits", level=2)
+
+    # === REACT COMPONENTS ===
+    elif ext in ('jsx', 'tsx', 'js', 'ts'):
+        # Verificar si parece un archivo React
+        has_jsx = 'React' in content or 'react' in content or 'jsx' in content or ext in ('jsx', 'tsx')
+        if not has_jsx:
+            return components
+
+        # Buscar componentes función
+        for pattern in [_REACT_FUNC_COMPONENT, _REACT_ARROW_COMPONENT]:
+            for match in pattern.finditer(content):
+                comp_name = match.group(1)
+                
+                # Extraer hooks usados
+                hooks = list(set(_REACT_HOOK_PATTERN.findall(content)))
+                
+                # Extraer props de TypeScript interface/type
+                props = []
+                props_match = _REACT_PROPS_PATTERN.search(content)
+                if props_match:
+                    props = re.findall(r'(\w+)\s*[?:]', props_match.group(2))
+                
+                if comp_name not in components:
+                    components[comp_name] = {
+                        'file': filepath,
+                        'props': props,
+                        'emits': [],
+                        'hooks': hooks[:10],  # máximo 10 hooks
+                        'type': 'react'
+                    }
+                    vprint(f"React: {comp_name}: {len(props)} props, {len(hooks)} hooks", level=2)
+
+    # === SVELTE COMPONENTS ===
+    elif ext == 'svelte':
+        comp_name = os.path.splitext(os.path.basename(filepath))[0]
+        
+        # Extraer props (export let)
+        props = re.findall(r'export\s+let\s+(\w+)', content)
+        
+        # Extraer eventos (dispatch)
+        emits = re.findall(r"dispatch\(\s*['\"](\w+)['\"]", content)
+        
+        components[comp_name] = {
+            'file': filepath,
+            'props': props,
+            'emits': emits,
+            'hooks': [],
+            'type': 'svelte'
+        }
+        vprint(f"Svelte: {comp_name}: {len(props)} props", level=2)
 
-    vprint(f"Total componentes extraidos: {len(components)}", level=1)
     return components
 
 
@@ -444,7 +540,7 @@ def extract_vue_components(files_map):
     return extract_ui_components(files_map)
 
 
-def extract_call_graph(files_map, functions):
+def extract_call_graph(files_map, functions, dependencies=None):
     """
     Extrae grafo de llamadas entre funciones (caller → callees).
     
@@ -454,6 +550,8 @@ def extract_call_graph(files_map, functions):
     Args:
         files_map: Dict con contenido de archivos
         functions: Dict {filepath: {func_name: line_num}} ya extraído
+        dependencies: Dict de extract_dependencies(); si es None se calcula
+            (se usa para resolver llamadas a funciones importadas)
     
     Returns:
         Dict {
@@ -464,84 +562,166 @@ def extract_call_graph(files_map, functions):
     """
     vprint("Extrayendo grafo de llamadas...", level=1)
     
-    # Construir set de todas las funciones conocidas (nombre simple → func_key)
-    all_func_names = {}  # name → [func_keys]
-    func_lines = {}      # func_key → (filepath, start_line)
-    
-    for fpath, funcs in functions.items():
-        for fname, line_num in funcs.items():
-            # Limpiar nombre: quitar decoradores y prefijos de clase
-            clean_name = fname.split('.')[-1] if '.' in fname else fname
-            clean_name = clean_name.split(' ')[-1] if ' ' in clean_name else clean_name
-            func_key = f"{fpath}::{fname}"
-            func_lines[func_key] = (fpath, line_num)
-            if clean_name not in all_func_names:
-                all_func_names[clean_name] = []
-            all_func_names[clean_name].append(func_key)
-    
-    # Para cada función, analizar su cuerpo buscando llamadas
-    calls = {}     # func_key → [called_func_keys]
-    called_by = {} # func_key → [caller_func_keys]
-    
-    call_pattern = re.compile(r'\b(\w+)\s*\(')
-    
-    # Palabras clave que no son llamadas a funciones
-    skip_words = {
-        'if', 'for', 'while', 'switch', 'return', 'else', 'elif', 'catch',
-        'except', 'print', 'len', 'range', 'str', 'int', 'float', 'list',
-        'dict', 'set', 'tuple', 'bool', 'type', 'isinstance', 'hasattr',
-        'getattr', 'setattr', 'super', 'self', 'cls', 'None', 'True', 'False',
-        'require', 'import', 'from', 'const', 'let', 'var', 'new', 'typeof',
-        'throw', 'async', 'await', 'yield', 'not', 'and', 'or', 'in',
-    }
-    
+    file_calls = {}
     for fpath, info in files_map.items():
         if fpath not in functions:
             continue
-        content_lines = info.get('content', [])
-        if not content_lines:
-            continue
+        file_calls[fpath] = _extract_file_calls(info.get('content', []), functions[fpath])
+    
+    if dependencies is None:
+        dependencies = extract_dependencies(files_map)
+    return _resolve_call_graph(file_calls, functions, dependencies)
+
+
+_CALL_PATTERN = re.compile(r'\b(\w+)\s*\(')
+
+# Palabras clave que no son llamadas a funciones
+_CALL_SKIP_WORDS = {
+    'if', 'for', 'while', 'switch', 'return', 'else', 'elif', 'catch',
+    'except', 'print', 'len', 'range', 'str', 'int', 'float', 'list',
+    'dict', 'set', 'tuple', 'bool', 'type', 'isinstance', 'hasattr',
+    'getattr', 'setattr', 'super', 'self', 'cls', 'None', 'True', 'False',
+    'require', 'import', 'from', 'const', 'let', 'var', 'new', 'typeof',
+    'throw', 'async', 'await', 'yield', 'not', 'and', 'or', 'in',
+}
+
+
+def _extract_file_calls(content_lines, file_functions):
+    """
+    Extrae los nombres invocados dentro del cuerpo de cada función de un archivo.
+    
+    Returns:
+        Lista [[func_name, [called_names]]] en orden de línea. Los nombres aún no
+        están resueltos contra el resto del proyecto (ver _resolve_call_graph).
+    """
+    if not content_lines:
+        return []
+    
+    # Obtener funciones de este archivo ordenadas por línea
+    file_funcs = sorted(file_functions.items(), key=lambda x: x[1])
+    result = []
+    
+    for idx, (fname, start_line) in enumerate(file_funcs):
+        # Determinar rango del cuerpo de la función
+        if idx + 1 < len(file_funcs):
+            end_line = file_funcs[idx + 1][1] - 1
+        else:
+            end_line = len(content_lines)
         
-        # Obtener funciones de este archivo ordenadas por línea
-        file_funcs = sorted(functions[fpath].items(), key=lambda x: x[1])
+        called = set()
         
-        for idx, (fname, start_line) in enumerate(file_funcs):
-            # Determinar rango del cuerpo de la función
-            if idx + 1 < len(file_funcs):
-                end_line = file_funcs[idx + 1][1] - 1
-            else:
-                end_line = len(content_lines)
-            
-            func_key = f"{fpath}::{fname}"
-            func_calls = set()
+        # Analizar líneas del cuerpo
+        for line_idx in range(start_line, min(end_line, len(content_lines))):
+            line = content_lines[line_idx]
+            # Ignorar comentarios y strings
+            stripped = line.strip()
+            if stripped.startswith('#') or stripped.startswith('//') or stripped.startswith('/*'):
+                continue
             
-            # Analizar líneas del cuerpo
-            for line_idx in range(start_line, min(end_line, len(content_lines))):
-                line = content_lines[line_idx]
-                # Ignorar comentarios y strings
-                stripped = line.strip()
-                if stripped.startswith('#') or stripped.startswith('//') or stripped.startswith('/*'):
+            for match in _CALL_PATTERN.finditer(line):
+                called_name = match.group(1)
+                if called_name in _CALL_SKIP_WORDS or called_name.startswith('_'):
                     continue
-                
-                for match in call_pattern.finditer(line):
-                    called_name = match.group(1)
-                    if called_name in skip_words or called_name.startswith('_'):
-                        continue
-                    if called_name in all_func_names:
-                        for target_key in all_func_names[called_name]:
-                            if target_key != func_key:  # No auto-referencia
-                                func_calls.add(target_key)
-            
-            if func_calls:
-                calls[func_key] = sorted(func_calls)
-                for target in func_calls:
-                    if target not in called_by:
-                        called_by[target] = []
-                    called_by[target].append(func_key)
+                called.add(called_name)
+        
+        result.append([fname, sorted(called)])
+    
+    return result
+
+
+def _split_func_name(fname):
+    """'Clase.@property metodo' → ('Clase', 'metodo'); 'func' → (None, 'func')"""
+    owner, _, name = fname.rpartition('.')
+    name = name.split(' ')[-1]
+    if owner:
+        owner = '.'.join(part.split(' ')[-1] for part in owner.split('.'))
+    return owner or None, name
+
+
+@profiled('merge', name='call_graph', items=lambda graph: len(graph['calls']))
+def _resolve_call_graph(file_calls, functions, dependencies=None):
+    """
+    Resuelve los nombres invocados por archivo contra las funciones conocidas.
     
-    # Ordenar called_by
-    for key in called_by:
-        called_by[key] = sorted(set(called_by[key]))
+    Cada nombre se resuelve por alcance, del más cercano al más lejano:
+    1. Métodos de la misma clase en el mismo archivo
+    2. Funciones del mismo archivo
+    3. Funciones de los archivos que el archivo importa (dependencies)
+    4. Una función de otro archivo solo si es la única con ese nombre
+    Así un nombre común (get, save) no genera aristas a todo el proyecto.
+    
+    Internamente cada función es un ID entero y las aristas son listas de IDs;
+    los strings "filepath::func" solo se materializan al final.
+    
+    Args:
+        file_calls: Dict {filepath: [[func_name, [called_names]]]} (orden de archivos)
+        functions: Dict {filepath: {func_name: line_num}}
+        dependencies: Dict {filepath: [archivos importados]} (ver extract_dependencies)
+    
+    Returns:
+        Dict {'calls': {...}, 'called_by': {...}} igual que extract_call_graph
+    """
+    dependencies = dependencies or {}
+    
+    keys = []          # id → "filepath::func_name"
+    owners = []        # id → clase contenedora (o None)
+    ids_by_key = {}    # (filepath, func_name) → id
+    local_names = {}   # filepath → {nombre simple: [ids]}
+    global_names = {}  # nombre simple → [ids]
+    
+    for fpath, funcs in functions.items():
+        local = local_names.setdefault(fpath, {})
+        for fname in funcs:
+            fid = len(keys)
+            owner, clean_name = _split_func_name(fname)
+            keys.append(f"{fpath}::{fname}")
+            owners.append(owner)
+            ids_by_key[(fpath, fname)] = fid
+            local.setdefault(clean_name, []).append(fid)
+            global_names.setdefault(clean_name, []).append(fid)
+    
+    def resolve(fpath, caller_id, called_name):
+        local = local_names.get(fpath, {}).get(called_name)
+        if local:
+            owner = owners[caller_id]
+            same_class = [t for t in local if owner and owners[t] == owner]
+            return same_class or local
+        imported = []
+        for dep in dependencies.get(fpath, ()):
+            imported.extend(local_names.get(dep, {}).get(called_name, ()))
+        if imported:
+            return imported
+        candidates = global_names.get(called_name, ())
+        return candidates if len(candidates) == 1 else ()
+    
+    adjacency = {}     # caller_id → set(callee_ids), en orden de archivos
+    reverse = {}       # callee_id → set(caller_ids), en orden de aparición
+    for fpath, entries in file_calls.items():
+        for fname, called_names in entries:
+            caller_id = ids_by_key.get((fpath, fname))
+            if caller_id is None:
+                continue
+            targets = set()
+            for called_name in called_names:
+                targets.update(resolve(fpath, caller_id, called_name))
+            targets.discard(caller_id)  # No auto-referencia
+            if targets:
+                adjacency[caller_id] = targets
+    
+    # Orden alfabético de las claves, precalculado una vez como rango entero
+    rank = [0] * len(keys)
+    for position, fid in enumerate(sorted(range(len(keys)), key=keys.__getitem__)):
+        rank[fid] = position
+    
+    calls = {}
+    for caller_id, targets in adjacency.items():
+        ordered = sorted(targets, key=rank.__getitem__)
+        calls[keys[caller_id]] = [keys[t] for t in ordered]
+        for t in ordered:
+            reverse.setdefault(t, set()).add(caller_id)
+    
+    called_by = {keys[t]: [keys[c] for c in sorted(callers, key=rank.__getitem__)]
+                 for t, callers in reverse.items()}
     
     vprint(f"Grafo: {len(calls)} funciones con llamadas, {len(called_by)} funciones referenciadas", level=1)
     return {'calls': calls, 'called_by': called_by}
@@ -570,28 +750,36 @@ def extract_types_and_models(files_map):
     types = {}
     
     for filepath, info in files_map.items():
-        ext = info['type']
-        content_lines = info.get('content', [])
-        if not content_lines:
-            continue
-        
-        if ext == 'py':
-            _extract_python_types(filepath, content_lines, types)
-        elif ext in ('ts', 'tsx'):
-            _extract_ts_types(filepath, content_lines, types)
-        elif ext == 'go':
-            _extract_go_types(filepath, content_lines, types)
-        elif ext == 'rs':
-            _extract_rust_types(filepath, content_lines, types)
-        elif ext in ('java', 'kt'):
-            _extract_java_types(filepath, content_lines, types)
-        elif ext == 'php':
-            _extract_php_types(filepath, content_lines, types)
+        types.update(_extract_file_types(filepath, info['type'], info.get('content', [])))
     
     vprint(f"Total tipos/modelos extraídos: {len(types)}", level=1)
     return types
 
 
+def _extract_file_types(filepath, ext, content_lines):
+    """Extrae tipos/modelos de un solo archivo. Retorna {type_name: {...}}"""
+    types = {}
+    if not content_lines:
+        return types
+    
+    if ext == 'py':
+        _extract_python_types(filepath, content_lines, types)
+    elif ext in ('ts', 'tsx'):
+        _extract_ts_types(filepath, content_lines, types)
+    elif ext == 'go':
+        _extract_go_types(filepath, content_lines, types)
+    elif ext == 'rs':
+        _extract_rust_types(filepath, content_lines, types)
+    elif ext in ('java', 'kt'):
+        _extract_java_types(filepath, content_lines, types)
+    elif ext == 'php':
+        _extract_php_types(filepath, content_lines, types)
+    return types
+
+
+_PY_MODEL_BASES = {'BaseModel', 'Model', 'models.Model', 'db.Model', 'Base', 'DeclarativeBase', 'TypedDict', 'NamedTuple'}
+
+
 def _extract_python_types(filepath, lines, types):
     """Extrae dataclasses, Pydantic models, TypedDict, Django/SQLAlchemy models"""
     is_dataclass = False
@@ -606,7 +794,7 @@ def _extract_python_types(filepath, lines, types):
     dataclass_re = re.compile(r'^\s*@dataclass')
     class_re = re.compile(r'^(\s*)class\s+(\w+)(?:\(([^)]+)\))?')
     field_re = re.compile(r'^\s+(\w+)\s*[:=]\s*(.*)')
-    model_bases = {'BaseModel', 'Model', 'models.Model', 'db.Model', 'Base', 'DeclarativeBase', 'TypedDict', 'NamedTuple'}
+    model_bases = _PY_MODEL_BASES
     
     for i, line in enumerate(lines, 1):
         if dataclass_re.match(line):
@@ -905,108 +1093,121 @@ def extract_docstrings(files_map, functions):
     
     docstrings = {}
     
-    param_re = re.compile(r'^\s*(?::param|@param|Args:)\s*(\w+)(?:\s*\((\w+)\))?\s*:?\s*(.*)')
-    param_jsdoc_re = re.compile(r'^\s*\*?\s*@param\s+\{([^}]+)\}\s+(\w+)\s*-?\s*(.*)')
-    return_re = re.compile(r'^\s*(?::returns?|@returns?|Returns:)\s*(?:\{([^}]+)\})?\s*:?\s*(.*)')
-    
     for filepath, info in files_map.items():
         if filepath not in functions:
             continue
-        content_lines = info.get('content', [])
-        if not content_lines:
+        docstrings.update(_extract_file_docstrings(
+            filepath, info['type'], info.get('content', []), functions[filepath]
+        ))
+    
+    vprint(f"Total docstrings extraídos: {len(docstrings)}", level=1)
+    return docstrings
+
+
+_DOC_PARAM_RE = re.compile(r'^\s*(?::param|@param|Args:)\s*(\w+)(?:\s*\((\w+)\))?\s*:?\s*(.*)')
+_DOC_PARAM_JSDOC_RE = re.compile(r'^\s*\*?\s*@param\s+\{([^}]+)\}\s+(\w+)\s*-?\s*(.*)')
+_DOC_RETURN_RE = re.compile(r'^\s*(?::returns?|@returns?|Returns:)\s*(?:\{([^}]+)\})?\s*:?\s*(.*)')
+
+
+def _parse_doc_params(doc_lines):
+    """Extrae (params, returns) de las líneas de un docstring/JSDoc"""
+    params = []
+    for line in doc_lines:
+        line_str = line if isinstance(line, str) else str(line)
+        pm = _DOC_PARAM_JSDOC_RE.match(line_str) or _DOC_PARAM_RE.match(line_str)
+        if pm:
+            groups = pm.groups()
+            if len(groups) >= 3:
+                params.append({
+                    'name': groups[1] if groups[1] else groups[0],
+                    'type': groups[0] if _DOC_PARAM_JSDOC_RE.match(line_str) else (groups[1] or ''),
+                    'desc': groups[2] or ''
+                })
+    
+    returns = None
+    for line in doc_lines:
+        line_str = line if isinstance(line, str) else str(line)
+        rm = _DOC_RETURN_RE.match(line_str)
+        if rm:
+            returns = {'type': rm.group(1) or '', 'desc': rm.group(2) or ''}
+    return params, returns
+
+
+def _extract_file_docstrings(filepath, ext, content_lines, file_functions):
+    """Extrae docstrings/JSDoc de las funciones de un solo archivo. Retorna {func_key: {...}}"""
+    docstrings = {}
+    if not content_lines:
+        return docstrings
+    
+    file_funcs = sorted(file_functions.items(), key=lambda x: x[1])
+    
+    for idx, (fname, start_line) in enumerate(file_funcs):
+        if start_line > len(content_lines):
             continue
         
-        ext = info['type']
-        file_funcs = sorted(functions[filepath].items(), key=lambda x: x[1])
+        # Buscar docstring en las líneas siguientes a la definición
+        doc_lines = []
+        in_doc = False
+        doc_start = start_line  # 1-based, así que content_lines[start_line] es la siguiente
         
-        for idx, (fname, start_line) in enumerate(file_funcs):
-            if start_line > len(content_lines):
-                continue
-            
-            # Buscar docstring en las líneas siguientes a la definición
-            doc_lines = []
-            in_doc = False
-            doc_start = start_line  # 1-based, así que content_lines[start_line] es la siguiente
-            
-            if ext == 'py':
-                # Buscar triple-quote docstring
-                for j in range(start_line, min(start_line + 3, len(content_lines))):
-                    line = content_lines[j]
-                    if '"""' in line or "'''" in line:
-                        in_doc = True
-                        doc_start = j
-                        break
-                
-                if in_doc:
-                    quote = '"""' if '"""' in content_lines[doc_start] else "'''"
-                    # Si abre y cierra en la misma línea
-                    if content_lines[doc_start].count(quote) >= 2:
-                        doc_lines = [content_lines[doc_start].split(quote)[1]]
-                    else:
-                        for j in range(doc_start, min(doc_start + 30, len(content_lines))):
-                            doc_lines.append(content_lines[j])
-                            if j > doc_start and quote in content_lines[j]:
-                                break
-            
-            elif ext in ('js', 'ts', 'tsx', 'jsx'):
-                # Buscar JSDoc /** ... */ ANTES de la función
-                for j in range(max(0, start_line - 15), start_line - 1):
-                    line = content_lines[j]
-                    if '/**' in line:
-                        for k in range(j, start_line):
-                            doc_lines.append(content_lines[k])
-                            if '*/' in content_lines[k] and k > j:
-                                break
-                        break
-            
-            if not doc_lines:
-                continue
-            
-            # Parsear docstring
-            doc_text = ''.join(doc_lines)
-            # Limpiar
-            doc_text_clean = doc_text.replace('"""', '').replace("'''", '').replace('/**', '').replace('*/', '').strip()
-            doc_first_line = doc_text_clean.split('\n')[0].strip().lstrip('* ').strip()
-            
-            if not doc_first_line or len(doc_first_line) < 3:
-                continue
-            
-            # Extraer params
-            params = []
-            for line in doc_lines:
-                line_str = line if isinstance(line, str) else str(line)
-                pm = param_jsdoc_re.match(line_str) or param_re.match(line_str)
-                if pm:
-                    groups = pm.groups()
-                    if len(groups) >= 3:
-                        params.append({
-                            'name': groups[1] if groups[1] else groups[0],
-                            'type': groups[0] if param_jsdoc_re.match(line_str) else (groups[1] or ''),
-                            'desc': groups[2] or ''
-                        })
-            
-            # Extraer returns
-            returns = None
-            for line in doc_lines:
-                line_str = line if isinstance(line, str) else str(line)
-                rm = return_re.match(line_str)
-                if rm:
-                    returns = {'type': rm.group(1) or '', 'desc': rm.group(2) or ''}
+        if ext == 'py':
+            # Buscar triple-quote docstring
+            for j in range(start_line, min(start_line + 3, len(content_lines))):
+                line = content_lines[j]
+                if '"""' in line or "'''" in line:
+                    in_doc = True
+                    doc_start = j
+                    break
             
-            func_key = f"{filepath}::{fname}"
-            docstrings[func_key] = {
-                'file': filepath,
-                'line': start_line,
-                'description': doc_first_line[:150],
-                'params': params,
-                'returns': returns
-            }
+            if in_doc:
+                quote = '"""' if '"""' in content_lines[doc_start] else "'''"
+                # Si abre y cierra en la misma línea
+                if content_lines[doc_start].count(quote) >= 2:
+                    doc_lines = [content_lines[doc_start].split(quote)[1]]
+                else:
+                    for j in range(doc_start, min(doc_start + 30, len(content_lines))):
+                        doc_lines.append(content_lines[j])
+                        if j > doc_start and quote in content_lines[j]:
+                            break
+        
+        elif ext in ('js', 'ts', 'tsx', 'jsx'):
+            # Buscar JSDoc /** ... */ ANTES de la función
+            for j in range(max(0, start_line - 15), start_line - 1):
+                line = content_lines[j]
+                if '/**' in line:
+                    for k in range(j, start_line):
+                        doc_lines.append(content_lines[k])
+                        if '*/' in content_lines[k] and k > j:
+                            break
+                    break
+        
+        if not doc_lines:
+            continue
+        
+        # Parsear docstring
+        doc_text = ''.join(doc_lines)
+        # Limpiar
+        doc_text_clean = doc_text.replace('"""', '').replace("'''", '').replace('/**', '').replace('*/', '').strip()
+        doc_first_line = doc_text_clean.split('\n')[0].strip().lstrip('* ').strip()
+        
+        if not doc_first_line or len(doc_first_line) < 3:
+            continue
+        
+        params, returns = _parse_doc_params(doc_lines)
+        
+        func_key = f"{filepath}::{fname}"
+        docstrings[func_key] = {
+            'file': filepath,
+            'line': start_line,
+            'description': doc_first_line[:150],
+            'params': params,
+            'returns': returns
+        }
     
-    vprint(f"Total docstrings extraídos: {len(docstrings)}", level=1)
     return docstrings
 
 
-def extract_config_map(files_map, project_path):
+def extract_config_map(files_map, project_path, manifest=None):
     """
     Extrae variables de entorno, archivos de configuración y constantes.
     
@@ -1018,6 +1219,7 @@ def extract_config_map(files_map, project_path):
     Args:
         files_map: Dict con contenido de archivos
         project_path: Ruta del proyecto
+        manifest: Manifiesto de build_manifest() (evita sondear el disco)
     
     Returns:
         Dict {
@@ -1030,64 +1232,79 @@ def extract_config_map(files_map, project_path):
     env_vars = []
     seen_vars = set()
     
-    # Patrones para detectar variables de entorno
-    patterns = [
-        # Python: os.environ['KEY'], os.environ.get('KEY', default), os.getenv('KEY')
-        re.compile(r"""os\.environ(?:\.get)?\s*\(\s*['\"](\w+)['\"](?:\s*,\s*['\"]?([^'\")\s]+))?"""),
-        re.compile(r"""os\.environ\s*\[\s*['\"](\w+)['\"]\s*\]"""),
-        re.compile(r"""os\.getenv\s*\(\s*['\"](\w+)['\"](?:\s*,\s*['\"]?([^'\")\s]+))?"""),
-        # JavaScript: process.env.KEY, process.env['KEY']
-        re.compile(r"""process\.env\.(\w+)"""),
-        re.compile(r"""process\.env\s*\[\s*['\"](\w+)['\"]\s*\]"""),
-        # PHP: env('KEY', default), getenv('KEY'), $_ENV['KEY']
-        re.compile(r"""env\s*\(\s*['\"](\w+)['\"](?:\s*,\s*['\"]?([^'\")\s]+))?"""),
-        re.compile(r"""getenv\s*\(\s*['\"](\w+)['\"]"""),
-        re.compile(r"""\$_ENV\s*\[\s*['\"](\w+)['\"]\s*\]"""),
-        # Rust: std::env::var("KEY")
-        re.compile(r"""env::var\s*\(\s*['\"](\w+)['\"]"""),
-        # Go: os.Getenv("KEY")
-        re.compile(r"""os\.Getenv\s*\(\s*['\"](\w+)['\"]"""),
-    ]
-    
     for filepath, info in files_map.items():
-        content_lines = info.get('content', [])
-        if not content_lines:
-            continue
-        
-        for i, line in enumerate(content_lines, 1):
-            for pattern in patterns:
-                for match in pattern.finditer(line):
-                    var_name = match.group(1)
-                    default_val = match.group(2) if match.lastindex and match.lastindex >= 2 else ''
-                    if var_name not in seen_vars:
-                        seen_vars.add(var_name)
-                        env_vars.append({
-                            'name': var_name,
-                            'file': filepath,
-                            'line': i,
-                            'default': default_val or ''
-                        })
-    
-    # Detectar archivos de configuración
-    config_files = []
-    config_patterns = [
-        '.env', '.env.example', '.env.local', '.env.production', '.env.development',
-        'config.yaml', 'config.yml', 'config.json', 'config.toml',
-        'settings.py', 'settings.json', 'appsettings.json',
-        '.flaskenv', 'docker-compose.yml', 'docker-compose.yaml',
-        'pyproject.toml', 'tsconfig.json', 'webpack.config.js', 'vite.config.ts',
-        'vite.config.js', 'next.config.js', 'next.config.mjs', 'nuxt.config.ts',
-    ]
-    
-    for cfg in config_patterns:
-        full_path = os.path.join(project_path, cfg)
-        if os.path.exists(full_path):
-            config_files.append({'path': cfg, 'type': os.path.splitext(cfg)[1].lstrip('.') or 'env'})
+        for var in _extract_file_env_vars(filepath, info.get('content', [])):
+            if var['name'] not in seen_vars:
+                seen_vars.add(var['name'])
+                env_vars.append(var)
+    
+    config_files = _detect_config_files(project_path, manifest)
     
     vprint(f"Variables de entorno: {len(env_vars)}, Archivos config: {len(config_files)}", level=1)
     return {'env_vars': env_vars, 'config_files': config_files}
 
 
+# Patrones para detectar variables de entorno
+_ENV_VAR_PATTERNS = [
+    # Python: os.environ['KEY'], os.environ.get('KEY', default), os.getenv('KEY')
+    re.compile(r"""os\.environ(?:\.get)?\s*\(\s*['\"](\w+)['\"](?:\s*,\s*['\"]?([^'\")\s]+))?"""),
+    re.compile(r"""os\.environ\s*\[\s*['\"](\w+)['\"]\s*\]"""),
+    re.compile(r"""os\.getenv\s*\(\s*['\"](\w+)['\"](?:\s*,\s*['\"]?([^'\")\s]+))?"""),
+    # JavaScript: process.env.KEY, process.env['KEY']
+    re.compile(r"""process\.env\.(\w+)"""),
+    re.compile(r"""process\.env\s*\[\s*['\"](\w+)['\"]\s*\]"""),
+    # PHP: env('KEY', default), getenv('KEY'), $_ENV['KEY']
+    re.compile(r"""env\s*\(\s*['\"](\w+)['\"](?:\s*,\s*['\"]?([^'\")\s]+))?"""),
+    re.compile(r"""getenv\s*\(\s*['\"](\w+)['\"]"""),
+    re.compile(r"""\$_ENV\s*\[\s*['\"](\w+)['\"]\s*\]"""),
+    # Rust: std::env::var("KEY")
+    re.compile(r"""env::var\s*\(\s*['\"](\w+)['\"]"""),
+    # Go: os.Getenv("KEY")
+    re.compile(r"""os\.Getenv\s*\(\s*['\"](\w+)['\"]"""),
+]
+
+# Archivos de configuración conocidos (relativos a la raíz del proyecto)
+CONFIG_FILE_NAMES = [
+    '.env', '.env.example', '.env.local', '.env.production', '.env.development',
+    'config.yaml', 'config.yml', 'config.json', 'config.toml',
+    'settings.py', 'settings.json', 'appsettings.json',
+    '.flaskenv', 'docker-compose.yml', 'docker-compose.yaml',
+    'pyproject.toml', 'tsconfig.json', 'webpack.config.js', 'vite.config.ts',
+    'vite.config.js', 'next.config.js', 'next.config.mjs', 'nuxt.config.ts',
+]
+
+
+def _extract_file_env_vars(filepath, content_lines):
+    """Extrae variables de entorno de un solo archivo (primera aparición de cada una)"""
+    env_vars = []
+    seen_vars = set()
+    
+    for i, line in enumerate(content_lines, 1):
+        for pattern in _ENV_VAR_PATTERNS:
+            for match in pattern.finditer(line):
+                var_name = match.group(1)
+                default_val = match.group(2) if match.lastindex and match.lastindex >= 2 else ''
+                if var_name not in seen_vars:
+                    seen_vars.add(var_name)
+                    env_vars.append({
+                        'name': var_name,
+                        'file': filepath,
+                        'line': i,
+                        'default': default_val or ''
+                    })
+    return env_vars
+
+
+@profiled('merge', name='config_files')
+def _detect_config_files(project_path, manifest=None):
+    """Detecta archivos de configuración presentes en la raíz del proyecto"""
+    config_files = []
+    for cfg in CONFIG_FILE_NAMES:
+        if root_has(project_path, cfg, manifest):
+            config_files.append({'path': cfg, 'type': os.path.splitext(cfg)[1].lstrip('.') or 'env'})
+    return config_files
+
+
 def extract_patterns(files_map, functions, frameworks):
     """
     Detecta patrones de diseño y convenciones reales del código.
@@ -1110,37 +1327,51 @@ def extract_patterns(files_map, functions, frameworks):
     """
     vprint("Detectando patrones de diseño...", level=1)
     
-    result = {
+    file_facts = {}
+    for filepath, info in files_map.items():
+        file_facts[filepath] = _extract_file_pattern_facts(filepath, info['type'], info.get('content', []))
+    
+    return _merge_pattern_facts(file_facts, functions)
+
+
+# --- Auth patterns ---
+_AUTH_KEYWORDS = {
+    'jwt': ['jwt', 'jsonwebtoken', 'JWT_SECRET', 'jwt.sign', 'jwt.verify', 'JWTAuth', 'PyJWT'],
+    'session': ['session', 'SESSION_SECRET', 'express-session', 'session_start', 'SessionMiddleware'],
+    'oauth': ['oauth', 'OAuth', 'passport', 'social_auth', 'allauth', 'Socialite'],
+}
+
+
+def _extract_file_pattern_facts(filepath, ext, content_lines):
+    """
+    Extrae los hechos de un solo archivo que alimentan PATTERNS.yaml.
+    
+    Returns:
+        Dict {'middleware': [], 'decorators': {dec: count}, 'custom_exceptions': [],
+              'auth': [], 'centralized_error': bool, 'design_patterns': []}
+    """
+    facts = {
         'middleware': [],
         'decorators': {},
-        'design_patterns': [],
-        'error_handling': {'strategy': 'distributed', 'custom_exceptions': []},
-        'naming': {'style': 'unknown', 'samples': {}},
+        'custom_exceptions': [],
         'auth': [],
+        'centralized_error': False,
+        'design_patterns': [],
     }
+    content = ''.join(content_lines)
     
-    all_func_names = []
-    decorator_counts = {}
-    has_centralized_error = False
-    custom_exceptions = set()
-    
-    for filepath, info in files_map.items():
-        ext = info['type']
-        content_lines = info.get('content', [])
-        if not content_lines:
-            continue
-        
-        content = ''.join(content_lines)
+    if content_lines:
+        custom_exceptions = set()
         
         # --- Middleware detection ---
         if ext == 'py':
             # Django middleware
             for i, line in enumerate(content_lines, 1):
                 if 'MIDDLEWARE' in line and '=' in line:
-                    result['middleware'].append({'type': 'django', 'file': filepath, 'line': i})
+                    facts['middleware'].append({'type': 'django', 'file': filepath, 'line': i})
                 if re.match(r'^\s*class\s+\w+Middleware', line):
                     name = re.match(r'^\s*class\s+(\w+Middleware)', line).group(1)
-                    result['middleware'].append({'type': 'custom', 'name': name, 'file': filepath, 'line': i})
+                    facts['middleware'].append({'type': 'custom', 'name': name, 'file': filepath, 'line': i})
             
             # Detectar decoradores
             for i, line in enumerate(content_lines, 1):
@@ -1148,7 +1379,7 @@ def extract_patterns(files_map, functions, frameworks):
                 if dm:
                     dec = dm.group(1)
                     if dec not in ('property', 'staticmethod', 'classmethod', 'abstractmethod', 'dataclass'):
-                        decorator_counts[dec] = decorator_counts.get(dec, 0) + 1
+                        facts['decorators'][dec] = facts['decorators'].get(dec, 0) + 1
             
             # Custom exceptions
             for line in content_lines:
@@ -1160,49 +1391,81 @@ def extract_patterns(files_map, functions, frameworks):
             # Express middleware
             for i, line in enumerate(content_lines, 1):
                 if re.search(r'app\.use\(', line):
-                    result['middleware'].append({'type': 'express', 'file': filepath, 'line': i})
+                    facts['middleware'].append({'type': 'express', 'file': filepath, 'line': i})
         
         elif ext == 'php':
             # Laravel middleware
             for i, line in enumerate(content_lines, 1):
                 if re.search(r'->middleware\(', line):
-                    result['middleware'].append({'type': 'laravel', 'file': filepath, 'line': i})
+                    facts['middleware'].append({'type': 'laravel', 'file': filepath, 'line': i})
+        
+        facts['custom_exceptions'] = sorted(custom_exceptions)
         
         # --- Auth patterns ---
-        auth_keywords = {
-            'jwt': ['jwt', 'jsonwebtoken', 'JWT_SECRET', 'jwt.sign', 'jwt.verify', 'JWTAuth', 'PyJWT'],
-            'session': ['session', 'SESSION_SECRET', 'express-session', 'session_start', 'SessionMiddleware'],
-            'oauth': ['oauth', 'OAuth', 'passport', 'social_auth', 'allauth', 'Socialite'],
-        }
         content_lower = content.lower()
-        for auth_type, keywords in auth_keywords.items():
+        for auth_type, keywords in _AUTH_KEYWORDS.items():
             if any(kw.lower() in content_lower for kw in keywords):
-                if auth_type not in result['auth']:
-                    result['auth'].append(auth_type)
+                facts['auth'].append(auth_type)
         
         # --- Error handling ---
-        if 'error_handler' in content.lower() or 'errorhandler' in content.lower() or 'exception_handler' in content.lower():
+        if 'error_handler' in content_lower or 'errorhandler' in content_lower or 'exception_handler' in content_lower:
+            facts['centralized_error'] = True
+    
+    # --- Design patterns ---
+    basename = os.path.basename(filepath).lower()
+    if 'singleton' in content.lower() or '_instance' in content:
+        facts['design_patterns'].append('singleton')
+    if 'factory' in basename or 'Factory' in content:
+        facts['design_patterns'].append('factory')
+    if 'repository' in basename or 'Repository' in content:
+        facts['design_patterns'].append('repository')
+    if 'service' in basename:
+        facts['design_patterns'].append('service_layer')
+    
+    return facts
+
+
+@profiled('merge', name='patterns')
+def _merge_pattern_facts(file_facts, functions):
+    """
+    Combina los hechos por archivo en el resultado final de extract_patterns.
+    
+    Args:
+        file_facts: Dict {filepath: facts} en orden de archivos
+        functions: Dict de funciones extraídas
+    """
+    result = {
+        'middleware': [],
+        'decorators': {},
+        'design_patterns': [],
+        'error_handling': {'strategy': 'distributed', 'custom_exceptions': []},
+        'naming': {'style': 'unknown', 'samples': {}},
+        'auth': [],
+    }
+    
+    all_func_names = []
+    decorator_counts = {}
+    has_centralized_error = False
+    custom_exceptions = set()
+    design_patterns = set()
+    
+    for filepath, facts in file_facts.items():
+        result['middleware'].extend(facts['middleware'])
+        for dec, count in facts['decorators'].items():
+            decorator_counts[dec] = decorator_counts.get(dec, 0) + count
+        custom_exceptions.update(facts['custom_exceptions'])
+        for auth_type in facts['auth']:
+            if auth_type not in result['auth']:
+                result['auth'].append(auth_type)
+        if facts['centralized_error']:
             has_centralized_error = True
+        design_patterns.update(facts['design_patterns'])
         
         # --- Collect function names for naming analysis ---
         if filepath in functions:
             all_func_names.extend(functions[filepath].keys())
     
-    # --- Design patterns ---
-    for filepath, info in files_map.items():
-        content = ''.join(info.get('content', []))
-        basename = os.path.basename(filepath).lower()
-        
-        if 'singleton' in content.lower() or '_instance' in content:
-            result['design_patterns'].append('singleton')
-        if 'factory' in basename or 'Factory' in content:
-            result['design_patterns'].append('factory')
-        if 'repository' in basename or 'Repository' in content:
-            result['design_patterns'].append('repository')
-        if 'service' in basename:
-            result['design_patterns'].append('service_layer')
-    
-    result['design_patterns'] = sorted(set(result['design_patterns']))
+    result['design_patterns'] = sorted(design_patterns)
     
     # --- Analyze naming conventions ---
     snake_count = sum(1 for n in all_func_names if '_' in n and n.islower())
@@ -1247,87 +1510,665 @@ def extract_dependencies(files_map):
     vprint("Mapeando dependencias...", level=1)
     
     deps = {}
-
-    py_import = re.compile(r'^\s*(?:from\s+(\S+)\s+import|import\s+(\S+))')
-    js_import = re.compile(r"""(?:import\s+.*?from\s+|require\s*\(\s*)['"]([^'"]+)['"]""")
-    php_use = re.compile(r'^\s*use\s+([A-Za-z_\\]+(?:\\[A-Za-z_]+)*)')
-    php_include = re.compile(r"""(?:require|include)(?:_once)?\s*(?:\(\s*)?['"]([^'"]+)['"]""")
+    index = build_import_index(list(files_map))
 
     for filepath, info in files_map.items():
-        file_deps = set()
-        ext = info['type']
-
-        for line in info['content']:
-            if ext == 'py':
-                m = py_import.match(line)
-                if m:
-                    module = (m.group(1) or m.group(2)).split('.')[0]
-                    # Buscar coincidencia en archivos del proyecto
-                    for other_path in files_map:
-                        if other_path == filepath:
-                            continue
-                        # Coincidencia por nombre de módulo
-                        other_parts = other_path.replace("\\", "/").replace("/", ".").rstrip(".py")
-                        if module in other_parts.split("."):
-                            file_deps.add(other_path)
-                            break
-                        # Coincidencia por subdirectorio
-                        if module in other_path.replace("\\", "/"):
-                            file_deps.add(other_path)
-                            break
-                            
-            elif ext in ('js', 'ts', 'tsx', 'jsx', 'vue'):
-                m = js_import.search(line)
-                if m:
-                    imported = m.group(1)
-                    if imported.startswith('.'):
-                        # Imports relativos
-                        base_dir = os.path.dirname(filepath)
-                        resolved = os.path.normpath(os.path.join(base_dir, imported))
-                        
-                        for other_path in files_map:
-                            if other_path.startswith(resolved):
-                                file_deps.add(other_path)
-                                break
-                    elif imported.startswith('@/') or imported.startswith('~/'):
-                        # Aliases: @/ → src/, ~/ → src/
-                        alias_path = imported[2:]  # quitar @/ o ~/
-                        for other_path in files_map:
-                            normalized = other_path.replace("\\", "/")
-                            if alias_path in normalized:
-                                file_deps.add(other_path)
-                                break
-                    # Los imports de node_modules se ignoran (no están en files_map)
-                    
-            elif ext == 'php':
-                # PHP use statements
-                m = php_use.match(line)
-                if m:
-                    namespace = m.group(1).replace("\\", "/")
-                    # Buscar archivo que coincida con el namespace
-                    for other_path in files_map:
-                        normalized = other_path.replace("\\", "/")
-                        # Comparar última parte del path con última parte del namespace
-                        ns_parts = namespace.split("/")
-                        if ns_parts[-1].lower() in normalized.lower():
-                            file_deps.add(other_path)
-                            break
-                
-                # PHP require/include
-                m = php_include.search(line)
-                if m:
-                    included = m.group(1)
-                    if not included.startswith('http'):
-                        base_dir = os.path.dirname(filepath)
-                        resolved = os.path.normpath(os.path.join(base_dir, included))
-                        for other_path in files_map:
-                            if other_path == resolved or other_path.endswith(included):
-                                file_deps.add(other_path)
-                                break
-
+        imports = _extract_file_imports(info['type'], info['content'])
+        file_deps = _resolve_file_imports(filepath, imports, index)
         if file_deps:
-            deps[filepath] = sorted(file_deps)
+            deps[filepath] = file_deps
             vprint(f"{filepath}: {len(file_deps)} dependencias", level=2)
 
     vprint(f"Total archivos con dependencias: {len(deps)}", level=1)
     return deps
+
+
+_PY_IMPORT = re.compile(r'^\s*(?:from\s+(\S+)\s+import|import\s+(\S+))')
+_JS_IMPORT = re.compile(r"""(?:import\s+.*?from\s+|require\s*\(\s*)['"]([^'"]+)['"]""")
+_PHP_USE = re.compile(r'^\s*use\s+([A-Za-z_\\]+(?:\\[A-Za-z_]+)*)')
+_PHP_INCLUDE = re.compile(r"""(?:require|include)(?:_once)?\s*(?:\(\s*)?['"]([^'"]+)['"]""")
+
+
+def _extract_file_imports(ext, content_lines):
+    """
+    Extrae los imports crudos de un solo archivo, sin resolverlos.
+    
+    Returns:
+        Lista [[kind, spec]] en orden de aparición. kind: 'py', 'js', 'php_use', 'php_include'
+    """
+    imports = []
+
+    for line in content_lines:
+        if ext == 'py':
+            m = _PY_IMPORT.match(line)
+            if m:
+                imports.append(['py', (m.group(1) or m.group(2)).rstrip(',')])
+
+        elif ext in ('js', 'ts', 'tsx', 'jsx', 'vue'):
+            m = _JS_IMPORT.search(line)
+            if m:
+                imports.append(['js', m.group(1)])
+
+        elif ext == 'php':
+            # PHP use statements
+            m = _PHP_USE.match(line)
+            if m:
+                imports.append(['php_use', m.group(1)])
+
+            # PHP require/include
+            m = _PHP_INCLUDE.search(line)
+            if m:
+                imports.append(['php_include', m.group(1)])
+
+    return imports
+
+
+def _index_first(index, key, path):
+    """Guarda hasta dos rutas por clave (en orden de escaneo) para poder excluir el propio archivo"""
+    paths = index.get(key)
+    if paths is None:
+        index[key] = [path]
+    elif len(paths) < 2 and paths[0] != path:
+        paths.append(path)
+
+
+@profiled('merge', name='import_index')
+def build_import_index(all_paths):
+    """
+    Construye una sola vez las tablas para resolver imports en O(1).
+    
+    Tablas (las claves usan '/' como separador):
+    - 'runs': cualquier secuencia contigua de segmentos de la ruta sin extensión
+      ('src/core/scanner' → 'core/scanner', 'core', 'scanner', ...). Resuelve
+      módulos Python con puntos, paquetes y aliases JS (@/, ~/).
+    - 'stems': ruta completa sin extensión → archivo (imports relativos JS)
+    - 'suffixes': sufijos de la ruta completa con extensión (require/include PHP)
+    - 'names': nombre base sin extensión en minúsculas (namespaces PHP)
+    - 'sorted': rutas normalizadas ordenadas, para búsqueda por prefijo con bisect
+    
+    Args:
+        all_paths: Lista de rutas relativas del proyecto (orden de escaneo)
+    
+    Returns:
+        Dict con las tablas anteriores
+    """
+    runs, stems, suffixes, names = {}, {}, {}, {}
+    normalized = []
+
+    for path in all_paths:
+        norm = path.replace("\\", "/")
+        normalized.append((norm, path))
+        stem = os.path.splitext(norm)[0]
+        _index_first(stems, stem, path)
+
+        segments = stem.split('/')
+        for i in range(len(segments)):
+            for j in range(i + 1, len(segments) + 1):
+                _index_first(runs, '/'.join(segments[i:j]), path)
+
+        parts = norm.split('/')
+        for i in range(len(parts)):
+            _index_first(suffixes, '/'.join(parts[i:]), path)
+
+        _index_first(names, segments[-1].lower(), path)
+
+    normalized.sort()
+    return {
+        'runs': runs,
+        'stems': stems,
+        'suffixes': suffixes,
+        'names': names,
+        'sorted': normalized,
+        'sorted_keys': [norm for norm, _ in normalized],
+    }
+
+
+def _lookup(table, key, filepath):
+    """Primer archivo registrado bajo key que no sea el propio filepath"""
+    for path in table.get(key, ()):
+        if path != filepath:
+            return path
+    return None
+
+
+def _lookup_prefix(index, prefix, filepath):
+    """Primer archivo (orden alfabético) cuya ruta empieza con prefix"""
+    keys = index['sorted_keys']
+    i = bisect_left(keys, prefix)
+    while i < len(keys) and keys[i].startswith(prefix):
+        path = index['sorted'][i][1]
+        if path != filepath:
+            return path
+        i += 1
+    return None
+
+
+def _resolve_py_module(module, filepath, index):
+    """Resuelve 'a.b.c' o '.a.b' (relativo) a un archivo del proyecto"""
+    if module.startswith('.'):
+        level = len(module) - len(module.lstrip('.'))
+        base_dir = os.path.dirname(filepath.replace("\\", "/"))
+        for _ in range(level - 1):
+            base_dir = os.path.dirname(base_dir)
+        rest = module.lstrip('.').replace('.', '/')
+        if not rest:
+            return None
+        target = f"{base_dir}/{rest}" if base_dir else rest
+        found = _lookup(index['stems'], target, filepath) or _lookup(index['stems'], target + '/__init__', filepath)
+        if found:
+            return found
+        module = module.lstrip('.')
+
+    # Del módulo más específico al más general: a/b/c → a/b → a
+    segments = module.split('.')
+    for n in range(len(segments), 0, -1):
+        found = _lookup(index['runs'], '/'.join(segments[:n]), filepath)
+        if found:
+            return found
+    return None
+
+
+def _resolve_file_imports(filepath, imports, index):
+    """
+    Resuelve los imports crudos de un archivo contra los archivos del proyecto.
+    
+    Args:
+        filepath: Archivo que importa
+        imports: Lista [[kind, spec]] de _extract_file_imports
+        index: Tablas de build_import_index()
+    
+    Returns:
+        Lista ordenada de archivos importados
+    """
+    file_deps = set()
+
+    for kind, spec in imports:
+        found = None
+
+        if kind == 'py':
+            found = _resolve_py_module(spec, filepath, index)
+
+        elif kind == 'js':
+            imported = spec
+            if imported.startswith('.'):
+                # Imports relativos: archivo exacto, luego cualquier ruta con ese prefijo
+                base_dir = os.path.dirname(filepath)
+                resolved = os.path.normpath(os.path.join(base_dir, imported)).replace("\\", "/")
+                found = (_lookup(index['stems'], os.path.splitext(resolved)[0], filepath)
+                         or _lookup_prefix(index, resolved, filepath))
+            elif imported.startswith('@/') or imported.startswith('~/'):
+                # Aliases: @/ → src/, ~/ → src/
+                alias_path = os.path.splitext(imported[2:])[0]  # quitar @/ o ~/
+                found = _lookup(index['runs'], alias_path, filepath)
+            # Los imports de node_modules se ignoran (no están en files_map)
+
+        elif kind == 'php_use':
+            # Namespace completo como ruta, luego solo el nombre de la clase
+            ns_parts = spec.split("\\")
+            found = (_lookup(index['runs'], '/'.join(ns_parts), filepath)
+                     or _lookup(index['names'], ns_parts[-1].lower(), filepath))
+
+        elif kind == 'php_include':
+            included = spec
+            if not included.startswith('http'):
+                base_dir = os.path.dirname(filepath)
+                resolved = os.path.normpath(os.path.join(base_dir, included)).replace("\\", "/")
+                found = (_lookup(index['suffixes'], resolved, filepath)
+                         or _lookup(index['suffixes'], included.replace("\\", "/").lstrip('./'), filepath))
+
+        if found:
+            file_deps.add(found)
+
+    return sorted(file_deps)
+
+
+# ============================================================================
+# BACKEND AST PARA PYTHON
+# ============================================================================
+#
+# Opcional (set_python_backend('ast')). Cada .py se parsea una vez y de ese
+# árbol salen funciones, llamadas, tipos y docstrings. Si el archivo no parsea
+# (sintaxis de otra versión, bytes nulos...) se usa el camino regex.
+
+PYTHON_BACKENDS = ('regex', 'ast')
+PYTHON_BACKEND = 'regex'
+
+_PY_DEF_NODES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+# Mismos prefijos que _extract_file_functions (gana el último decorador reconocido)
+_PY_DECORATOR_PREFIXES = {
+    'dataclass': '@dataclass ', 'dataclasses.dataclass': '@dataclass ',
+    'property': '@property ',
+    'abstractmethod': '@abstract ', 'abc.abstractmethod': '@abstract ',
+    'staticmethod': '@static ',
+    'classmethod': '@classmethod ',
+}
+
+
+def set_python_backend(backend):
+    """
+    Selecciona el backend de extracción para archivos .py.
+    
+    Args:
+        backend: 'regex' (por defecto) o 'ast'
+    """
+    global PYTHON_BACKEND
+    if backend not in PYTHON_BACKENDS:
+        raise ValueError(f"Backend Python desconocido: {backend} (opciones: {', '.join(PYTHON_BACKENDS)})")
+    PYTHON_BACKEND = backend
+
+
+def _py_node_text(node, content):
+    """Texto de una expresión (nombre con puntos o fragmento de código)"""
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return f"{_py_node_text(node.value, content)}.{node.attr}"
+    text = ast.get_source_segment(content, node) if hasattr(ast, 'get_source_segment') else None
+    return ' '.join(text.split()) if text else 'Any'
+
+
+def _py_decorator_prefix(node, content):
+    prefix = ''
+    for dec in node.decorator_list:
+        target = dec.func if isinstance(dec, ast.Call) else dec
+        prefix = _PY_DECORATOR_PREFIXES.get(_py_node_text(target, content), prefix)
+    return prefix
+
+
+# Nodos sin hijos que puedan contener llamadas: no se recorren
+_PY_LEAF_NODES = (ast.Name, ast.Constant, ast.expr_context, ast.operator, ast.boolop,
+                  ast.unaryop, ast.cmpop, ast.alias)
+
+
+def _py_node_calls(node):
+    """Nombres invocados en el cuerpo de node, sin entrar en defs/clases anidadas"""
+    called = set()
+    stack = list(node.body)
+    while stack:
+        child = stack.pop()
+        if isinstance(child, _PY_DEF_NODES):
+            continue
+        if isinstance(child, ast.Call):
+            func = child.func
+            name = func.id if isinstance(func, ast.Name) else (func.attr if isinstance(func, ast.Attribute) else None)
+            if name and name not in _CALL_SKIP_WORDS and not name.startswith('_'):
+                called.add(name)
+        for field in child._fields:
+            value = getattr(child, field, None)
+            if isinstance(value, list):
+                stack.extend(v for v in value if isinstance(v, ast.AST) and not isinstance(v, _PY_LEAF_NODES))
+            elif isinstance(value, ast.AST) and not isinstance(value, _PY_LEAF_NODES):
+                stack.append(value)
+    return sorted(called)
+
+
+def _py_class_type(filepath, node, content):
+    """Tipo/modelo de una clase (mismas reglas que _extract_python_types) o None"""
+    decorators = [_py_node_text(d.func if isinstance(d, ast.Call) else d, content) for d in node.decorator_list]
+    is_dataclass = any(d.split('.')[-1] == 'dataclass' for d in decorators)
+    base_list = [_py_node_text(b, content) for b in node.bases]
+    bases = ', '.join(base_list)
+    is_model = any(b in _PY_MODEL_BASES or b.endswith('Model') or b.endswith('Base') for b in base_list)
+    if not (is_dataclass or is_model or 'TypedDict' in bases):
+        return None
+    
+    fields = []
+    for stmt in node.body:
+        if isinstance(stmt, ast.AnnAssign) and isinstance(stmt.target, ast.Name):
+            names, field_type = [stmt.target.id], _py_node_text(stmt.annotation, content)
+        elif isinstance(stmt, ast.Assign):
+            names = [t.id for t in stmt.targets if isinstance(t, ast.Name)]
+            field_type = _py_node_text(stmt.value.func, content) if isinstance(stmt.value, ast.Call) else 'Any'
+        else:
+            continue
+        for name in names:
+            if name not in ('self', 'cls', 'Meta') and not name.startswith('_'):
+                fields.append({'name': name, 'type': field_type})
+    if not fields:
+        return None
+    
+    kind = 'dataclass' if is_dataclass else ('pydantic' if 'BaseModel' in bases else
+           ('django_model' if 'models.Model' in bases or 'Model' in bases else
+           ('typed_dict' if 'TypedDict' in bases else 'model')))
+    return {'file': filepath, 'line': node.lineno, 'kind': kind, 'fields': fields, 'extends': base_list}
+
+
+def extract_python_ast(filepath, content):
+    """
+    Extrae funciones, llamadas, tipos y docstrings de un .py con un solo parseo.
+    
+    A diferencia del camino regex, las funciones anidadas y las clases internas
+    se nombran con su ruta completa ("outer.inner", "Outer.Inner.method") y las
+    llamadas se asignan al cuerpo exacto de cada función.
+    
+    Args:
+        filepath: Ruta relativa del archivo
+        content: Contenido completo del archivo
+    
+    Returns:
+        Dict {'functions', 'calls', 'types', 'docstrings'} con el mismo formato
+        que los extractores regex, o None si el archivo no se pudo parsear
+    """
+    try:
+        tree = ast.parse(content, filename=filepath)
+    except (SyntaxError, ValueError, RecursionError, MemoryError):
+        return None
+    
+    functions = {}
+    calls = []
+    types = {}
+    docstrings = {}
+    
+    def visit(nodes, parent):
+        for node in nodes:
+            if not isinstance(node, _PY_DEF_NODES):
+                # Defs dentro de if/try/with/for: mismo nivel que el bloque
+                visit([c for c in ast.iter_child_nodes(node)
+                       if isinstance(c, (ast.stmt, ast.excepthandler)) or type(c).__name__ == 'match_case'],
+                      parent)
+                continue
+            
+            prefix = _py_decorator_prefix(node, content)
+            name = f"{parent}.{prefix}{node.name}" if parent else f"{prefix}{node.name}"
+            functions[name] = node.lineno
+            calls.append([name, _py_node_calls(node)])
+            
+            doc = ast.get_docstring(node)
+            if doc:
+                doc_lines = doc.splitlines()
+                first_line = doc_lines[0].strip().lstrip('* ').strip()
+                if len(first_line) >= 3:
+                    params, returns = _parse_doc_params(doc_lines)
+                    docstrings[f"{filepath}::{name}"] = {
+                        'file': filepath,
+                        'line': node.lineno,
+                        'description': first_line[:150],
+                        'params': params,
+                        'returns': returns,
+                    }
+            
+            if isinstance(node, ast.ClassDef):
+                type_info = _py_class_type(filepath, node, content)
+                if type_info:
+                    types[node.name] = type_info
+            
+            visit(node.body, f"{parent}.{node.name}" if parent else node.name)
+    
+    visit(tree.body, '')
+    return {'functions': functions, 'calls': calls, 'types': types, 'docstrings': docstrings}
+
+
+# ============================================================================
+# MOTOR DE UNA SOLA PASADA
+# ============================================================================
+#
+# Cada archivo se visita una vez: su contenido se une una sola vez y cada
+# extractor registrado (visitor) recibe el mismo contexto:
+#   {'filepath', 'ext', 'lines': [lineas], 'content': str,
+#    'offsets': line_offsets(content), 'record': {...}}
+# Con el backend AST, los .py traen además 'py_ast' (ver extract_python_ast).
+# 'record' contiene las salidas de los visitors anteriores, por lo que un
+# visitor puede depender de otro (calls y docstrings usan 'functions').
+
+
+def _visit_functions(ctx):
+    if ctx.get('py_ast'):
+        return ctx['py_ast']['functions']
+    return _extract_file_functions(ctx['ext'], ctx['lines'])
+
+
+def _visit_calls(ctx):
+    if ctx.get('py_ast'):
+        return ctx['py_ast']['calls']
+    file_funcs = ctx['record']['functions']
+    return _extract_file_calls(ctx['lines'], file_funcs) if file_funcs else []
+
+
+def _visit_types(ctx):
+    if ctx.get('py_ast'):
+        return ctx['py_ast']['types']
+    return _extract_file_types(ctx['filepath'], ctx['ext'], ctx['lines'])
+
+
+def _visit_docstrings(ctx):
+    if ctx.get('py_ast'):
+        return ctx['py_ast']['docstrings']
+    file_funcs = ctx['record']['functions']
+    if not file_funcs:
+        return {}
+    return _extract_file_docstrings(ctx['filepath'], ctx['ext'], ctx['lines'], file_funcs)
+
+
+# Lista ordenada de (clave del registro, visitor(ctx))
+FILE_VISITORS = [
+    ('functions', _visit_functions),
+    ('endpoints', lambda ctx: _extract_file_endpoints(ctx['filepath'], ctx['ext'], ctx['content'], ctx['offsets'])),
+    ('components', lambda ctx: _extract_file_components(ctx['filepath'], ctx['ext'], ctx['content'])),
+    ('imports', lambda ctx: _extract_file_imports(ctx['ext'], ctx['lines'])),
+    ('calls', _visit_calls),
+    ('types', _visit_types),
+    ('docstrings', _visit_docstrings),
+    ('env_vars', lambda ctx: _extract_file_env_vars(ctx['filepath'], ctx['lines'])),
+    ('patterns', lambda ctx: _extract_file_pattern_facts(ctx['filepath'], ctx['ext'], ctx['lines'])),
+]
+
+# Visitors propios del motor (los workers del pool los tienen al importar el módulo)
+_BUILTIN_VISITORS = tuple(FILE_VISITORS)
+
+
+def register_file_visitor(key, visitor):
+    """
+    Registra un extractor adicional en el motor de una sola pasada.
+    
+    El visitor se ejecuta después de los ya registrados y su salida queda en
+    record[key]; merge_file_records() la expone en results['extra'][key]. Debe
+    retornar datos serializables a JSON (se guardan en la caché incremental).
+    Si key ya existe, reemplaza al visitor anterior en su misma posición.
+    
+    Registrarlo antes de load_cache(): la huella de la caché incluye los
+    visitors y el código de su módulo, así que una caché creada sin él (o con
+    otra versión de él) se descarta. Para extraer en
+    paralelo con spawn/forkserver el visitor debe poder serializarse con
+    pickle (función a nivel de módulo); si no, la extracción es en serie.
+    
+    Args:
+        key: Clave del registro por archivo
+        visitor: Función visitor(ctx) -> salida del archivo
+    """
+    for i, (existing, _) in enumerate(FILE_VISITORS):
+        if existing == key:
+            FILE_VISITORS[i] = (key, visitor)
+            return
+    FILE_VISITORS.append((key, visitor))
+
+
+def extra_file_visitors():
+    """
+    Visitors registrados con register_file_visitor() (nuevos o que reemplazan
+    a uno del motor), en el orden de FILE_VISITORS.
+    
+    Returns:
+        Lista [(key, visitor)]
+    """
+    return [entry for entry in FILE_VISITORS if entry not in _BUILTIN_VISITORS]
+
+
+def extract_file_record(filepath, info):
+    """
+    Ejecuta todos los extractores registrados sobre un solo archivo.
+    
+    El registro resultante es serializable a JSON, por lo que puede guardarse en
+    la caché incremental (.ai/.cache.json) y combinarse después con
+    merge_file_records() sin volver a leer el archivo.
+    
+    Args:
+        filepath: Ruta relativa del archivo
+        info: Dict {'type': 'py', 'lines': N, 'content': [lineas]}
+    
+    Returns:
+        Dict {'functions', 'endpoints', 'components', 'imports', 'calls',
+              'types', 'docstrings', 'env_vars', 'patterns'} más las claves de
+        los visitors registrados con register_file_visitor()
+    """
+    content_lines = info.get('content', [])
+    content = ''.join(content_lines)
+    record = {}
+    ctx = {
+        'filepath': filepath,
+        'ext': info['type'],
+        'lines': content_lines,
+        'content': content,
+        'offsets': line_offsets(content),
+        'record': record,
+    }
+    if is_profiling():
+        # --profile: tiempo acumulado por visitor (ver utils.profiler)
+        if ctx['ext'] == 'py' and PYTHON_BACKEND == 'ast':
+            ctx['py_ast'] = count_extractor('python_ast', extract_python_ast, filepath, content)
+        for key, visitor in FILE_VISITORS:
+            record[key] = count_extractor(key, visitor, ctx)
+        return record
+
+    if ctx['ext'] == 'py' and PYTHON_BACKEND == 'ast':
+        ctx['py_ast'] = extract_python_ast(filepath, content)
+    for key, visitor in FILE_VISITORS:
+        record[key] = visitor(ctx)
+    return record
+
+
+def extract_all(files_map, project_path):
+    """
+    Extrae todo en una sola pasada sobre files_map.
+    
+    Equivale a llamar a los nueve extract_* por separado, pero cada archivo se
+    recorre y se une una sola vez.
+    
+    Args:
+        files_map: Dict {filepath: {'type': 'py', 'lines': N, 'content': [lines]}}
+        project_path: Ruta del proyecto
+    
+    Returns:
+        Mismo dict que merge_file_records()
+    """
+    records = {fpath: extract_file_record(fpath, info) for fpath, info in files_map.items()}
+    return merge_file_records(records, project_path)
+
+
+def _group_by_file(entries):
+    """(clave, {'file': ...}) → {archivo: [claves]} en orden de aparición"""
+    by_file = {}
+    for key, info in entries:
+        keys = by_file.get(info['file'])
+        if keys is None:
+            keys = by_file[info['file']] = []
+        keys.append(key)
+    return by_file
+
+
+@profiled('merge', name='file_index', items=lambda index: sum(len(v) for v in index.values()))
+def build_file_index(endpoints=None, components=None, types=None, env_vars=None):
+    """
+    Construye una sola vez los índices inversos por archivo que usan los
+    generadores, para no recorrer todos los endpoints/componentes por cada
+    archivo del proyecto (O(archivos × endpoints) en proyectos con muchas rutas).
+
+    Args:
+        endpoints: Dict {endpoint_key: {'file': str, ...}}
+        components: Dict {component_name: {'file': str, ...}}
+        types: Dict {type_name: {'file': str, ...}}
+        env_vars: Lista [{'name': str, 'file': str, ...}] (config_map['env_vars'])
+
+    Returns:
+        Dict {'endpoints', 'components', 'types', 'env_vars'}, cada uno
+        {filepath: [claves o nombres]} en el orden de los dicts originales
+    """
+    return {
+        'endpoints': _group_by_file((endpoints or {}).items()),
+        'components': _group_by_file((components or {}).items()),
+        'types': _group_by_file((types or {}).items()),
+        'env_vars': _group_by_file((var['name'], var) for var in env_vars or []),
+    }
+
+
+@profiled('merge', name='dependencies', items=len)
+def _resolve_dependencies(records):
+    """Resuelve los imports de cada registro a archivos del proyecto (tablas construidas una vez)"""
+    import_index = build_import_index(list(records))
+    dependencies = {}
+    for filepath, record in records.items():
+        file_deps = _resolve_file_imports(filepath, record['imports'], import_index)
+        if file_deps:
+            dependencies[filepath] = file_deps
+    return dependencies
+
+
+@profiled('merge', items=lambda results: sum(len(f) for f in results['functions'].values()))
+def merge_file_records(records, project_path, manifest=None):
+    """
+    Combina registros por archivo en las estructuras globales del proyecto.
+    
+    Produce exactamente el mismo resultado que llamar a cada extract_* sobre
+    el files_map completo, pero sin necesitar el contenido de los archivos.
+    
+    Args:
+        records: Dict {filepath: record} en orden de escaneo (ver extract_file_record)
+        project_path: Ruta del proyecto (para detectar archivos de configuración)
+        manifest: Manifiesto de build_manifest() (evita sondear el disco)
+    
+    Returns:
+        Dict {'functions', 'endpoints', 'components', 'dependencies', 'call_graph',
+              'types', 'docstrings', 'config_map', 'patterns', 'file_index', 'extra'};
+        'extra' es {key: {filepath: record[key]}} con la salida de cada visitor
+        registrado con register_file_visitor() que no reemplaza a uno del motor
+    """
+    vprint("Combinando registros por archivo...", level=1)
+    
+    functions = {}
+    endpoints = {}
+    components = {}
+    dependencies = _resolve_dependencies(records)
+    types = {}
+    docstrings = {}
+    env_vars = []
+    seen_vars = set()
+    
+    for filepath, record in records.items():
+        if record['functions']:
+            functions[filepath] = record['functions']
+        endpoints.update(record['endpoints'])
+        _merge_components(components, record['components'])
+        types.update(record['types'])
+        docstrings.update(record['docstrings'])
+        for var in record['env_vars']:
+            if var['name'] not in seen_vars:
+                seen_vars.add(var['name'])
+                env_vars.append(var)
+    
+    call_graph = _resolve_call_graph(
+        {fpath: records[fpath]['calls'] for fpath in functions}, functions, dependencies
+    )
+    patterns = _merge_pattern_facts(
+        {fpath: record['patterns'] for fpath, record in records.items()}, functions
+    )
+    config_map = {'env_vars': env_vars, 'config_files': _detect_config_files(project_path, manifest)}
+    builtin_keys = {key for key, _ in _BUILTIN_VISITORS}
+    extra = {
+        key: {fpath: record[key] for fpath, record in records.items() if key in record}
+        for key, _ in extra_file_visitors() if key not in builtin_keys
+    }
+    
+    vprint(f"Registros combinados: {len(records)} archivos, {len(functions)} con funciones", level=1)
+    return {
+        'functions': functions,
+        'endpoints': endpoints,
+        'components': components,
+        'dependencies': dependencies,
+        'call_graph': call_graph,
+        'types': types,
+        'docstrings': docstrings,
+        'config_map': config_map,
+        'patterns': patterns,
+        'file_index': build_file_index(endpoints, components, types, env_vars),
+        'extra': extra,
+    }
@@ -0,0 +1,308 @@
+"""
+Índice binario compacto (.ai/index.db) junto a los YAML.
+Guarda archivos, símbolos, llamadas, imports, endpoints, tipos, componentes y
+variables de entorno en SQLite con índices, de modo que una consulta puntual
+no requiere parsear PROJECT_INDEX.yaml ni CALL_GRAPH.yaml completos.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+from array import array
+from pathlib import Path
+
+try:
+    import sqlite3
+except ImportError:
+    # Python compilado sin sqlite3: se siguen generando los YAML
+    sqlite3 = None
+
+try:
+    from utils.warnings import warn, vprint
+    from utils.profiler import profiled
+except ImportError:
+    def warn(msg, ctx=""): pass
+    def vprint(msg, level=1): pass
+    def profiled(kind, name=None, items=None): return lambda func: func
+
+from utils.fuzzy import normalize_name, name_trigrams
+from .extractors import _split_func_name
+
+INDEX_DB_FILE = 'index.db'
+
+# Incrementar cuando cambie el esquema (los lectores rechazan otras versiones).
+# scripts/query.py tiene una copia (no importa core): incrementarla a la vez
+INDEX_DB_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID;
+CREATE TABLE files (id INTEGER PRIMARY KEY, path TEXT NOT NULL, type TEXT, lines INTEGER, hash TEXT);
+CREATE TABLE symbols (id INTEGER PRIMARY KEY, file_id INTEGER NOT NULL, name TEXT NOT NULL,
+                      short_name TEXT NOT NULL, owner TEXT, line INTEGER);
+CREATE TABLE calls (caller INTEGER NOT NULL, callee INTEGER NOT NULL,
+                    PRIMARY KEY (caller, callee)) WITHOUT ROWID;
+CREATE TABLE imports (file_id INTEGER NOT NULL, dep_id INTEGER NOT NULL,
+                      PRIMARY KEY (file_id, dep_id)) WITHOUT ROWID;
+CREATE TABLE endpoints (method TEXT NOT NULL, path TEXT NOT NULL, handler TEXT,
+                        file_id INTEGER, line INTEGER);
+CREATE TABLE types (name TEXT NOT NULL, kind TEXT, file_id INTEGER, line INTEGER,
+                    extends TEXT, fields TEXT);
+CREATE TABLE components (name TEXT NOT NULL, type TEXT, file_id INTEGER, props TEXT, emits TEXT);
+CREATE TABLE env_vars (name TEXT NOT NULL, file_id INTEGER, line INTEGER, default_value TEXT);
+CREATE TABLE search_names (term_id INTEGER NOT NULL, kind TEXT NOT NULL, name TEXT NOT NULL,
+                           file_id INTEGER, line INTEGER);
+CREATE TABLE search_postings (trigram TEXT PRIMARY KEY, term_ids BLOB NOT NULL) WITHOUT ROWID;
+"""
+
+# Los índices se crean después de insertar (más rápido que mantenerlos fila a fila)
+_INDEXES = """
+CREATE UNIQUE INDEX files_path ON files(path);
+CREATE INDEX symbols_name ON symbols(name);
+CREATE INDEX symbols_short_name ON symbols(short_name);
+CREATE INDEX symbols_file ON symbols(file_id, line);
+CREATE INDEX calls_callee ON calls(callee, caller);
+CREATE INDEX imports_dep ON imports(dep_id, file_id);
+CREATE INDEX endpoints_path ON endpoints(path, method);
+CREATE INDEX types_name ON types(name);
+CREATE INDEX components_name ON components(name);
+CREATE INDEX env_vars_name ON env_vars(name);
+CREATE INDEX search_names_term ON search_names(term_id);
+"""
+
+
+def _index_digest(files_map, results):
+    """Huella de todo lo que se guarda en el índice: si no cambió, no se reescribe"""
+    payload = json.dumps([
+        INDEX_DB_VERSION,
+        {f: [info.get('type'), info.get('lines'), info.get('hash')] for f, info in files_map.items()},
+        results['functions'], results['call_graph']['calls'], results['dependencies'],
+        results['endpoints'], results['types'], results['components'],
+        results['config_map'].get('env_vars', []),
+    ], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _stored_digest(db_path):
+    """Huella guardada en un index.db existente (None si no existe o es de otra versión)"""
+    conn = open_index_db(os.path.dirname(db_path))
+    if conn is None:
+        return None
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'digest'").fetchone()
+        return row[0] if row else None
+    except sqlite3.DatabaseError:
+        return None
+    finally:
+        conn.close()
+
+
+def _populate(conn, files_map, results):
+    """Inserta todas las tablas. Los símbolos y archivos se referencian por ID entero"""
+    file_ids = {}
+
+    def file_id(path):
+        # Endpoints/tipos pueden referenciar archivos fuera de files_map
+        fid = file_ids.get(path)
+        if fid is None:
+            info = files_map.get(path, {})
+            fid = len(file_ids) + 1
+            file_ids[path] = fid
+            conn.execute("INSERT INTO files VALUES (?, ?, ?, ?, ?)",
+                         (fid, path, info.get('type'), info.get('lines'), info.get('hash')))
+        return fid
+
+    for path in files_map:
+        file_id(path)
+
+    symbol_ids = {}  # "filepath::func_name" → id
+    symbol_rows = []
+    for fpath, funcs in results['functions'].items():
+        fid = file_id(fpath)
+        for fname, line in funcs.items():
+            sid = len(symbol_rows) + 1
+            owner, short_name = _split_func_name(fname)
+            symbol_ids[f"{fpath}::{fname}"] = sid
+            symbol_rows.append((sid, fid, fname, short_name, owner, line))
+    conn.executemany("INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?)", symbol_rows)
+
+    conn.executemany("INSERT OR IGNORE INTO calls VALUES (?, ?)", (
+        (symbol_ids[caller], symbol_ids[callee])
+        for caller, callees in results['call_graph']['calls'].items() if caller in symbol_ids
+        for callee in callees if callee in symbol_ids
+    ))
+
+    import_rows = [(file_id(fpath), file_id(dep))
+                   for fpath, deps in results['dependencies'].items() for dep in deps]
+    conn.executemany("INSERT OR IGNORE INTO imports VALUES (?, ?)", import_rows)
+
+    endpoint_rows = []
+    for key, ep in results['endpoints'].items():
+        method, _, route = key.partition(' ')
+        endpoint_rows.append((method, route, ep.get('handler'), file_id(ep['file']), ep.get('line')))
+    conn.executemany("INSERT INTO endpoints VALUES (?, ?, ?, ?, ?)", endpoint_rows)
+
+    type_rows = [(name, info.get('kind'), file_id(info['file']), info.get('line'),
+                  json.dumps(info.get('extends', [])), json.dumps(info.get('fields', [])))
+                 for name, info in results['types'].items()]
+    conn.executemany("INSERT INTO types VALUES (?, ?, ?, ?, ?, ?)", type_rows)
+
+    component_rows = [(name, comp.get('type'), file_id(comp['file']),
+                       json.dumps(comp.get('props', [])), json.dumps(comp.get('emits', [])))
+                      for name, comp in results['components'].items()]
+    conn.executemany("INSERT INTO components VALUES (?, ?, ?, ?, ?)", component_rows)
+
+    env_rows = [(var['name'], file_id(var['file']), var.get('line'), var.get('default'))
+                for var in results['config_map'].get('env_vars', [])]
+    conn.executemany("INSERT INTO env_vars VALUES (?, ?, ?, ?)", env_rows)
+
+    _populate_search(conn, symbol_rows, endpoint_rows, type_rows, component_rows)
+    return len(symbol_rows)
+
+
+def _populate_search(conn, symbol_rows, endpoint_rows, type_rows, component_rows):
+    """
+    Índice invertido de trigramas para la búsqueda aproximada de nombres.
+
+    Los nombres buscables (función/método por su nombre simple, tipo,
+    componente y ruta de endpoint) se agrupan por texto normalizado
+    ("término"): un nombre repetido en 200 archivos es un solo término.
+    - search_names: cada aparición (término, tipo, nombre, archivo, línea)
+    - search_postings: trigrama → IDs de término, empaquetados como
+      array('I') en un BLOB (una fila por trigrama, no una por par)
+    - meta 'search_ntri': número de trigramas de cada término, un byte por ID
+
+    query.py suma las coincidencias leyendo solo las filas de los trigramas
+    del texto buscado.
+    """
+    entries = []  # (kind, nombre mostrado, texto indexado, file_id, línea)
+    entries.extend(('function', name, short_name, fid, line)
+                   for _, fid, name, short_name, _, line in symbol_rows)
+    entries.extend(('type', name, name, fid, line) for name, _, fid, line, _, _ in type_rows)
+    entries.extend(('component', name, name, fid, None) for name, _, fid, _, _ in component_rows)
+    entries.extend(('endpoint', f"{method} {route}", route, fid, line)
+                   for method, route, _, fid, line in endpoint_rows)
+
+    term_ids = {}      # texto normalizado → id
+    ntri = bytearray()
+    postings = {}      # trigrama → array('I') de ids de término (ascendentes)
+    name_rows = []
+    for kind, name, text, fid, line in entries:
+        norm = normalize_name(text)
+        if not norm:
+            continue
+        tid = term_ids.get(norm)
+        if tid is None:
+            tid = term_ids[norm] = len(ntri)
+            trigrams = name_trigrams(norm)
+            ntri.append(min(len(trigrams), 255))
+            for tri in trigrams:
+                ids = postings.get(tri)
+                if ids is None:
+                    ids = postings[tri] = array('I')
+                ids.append(tid)
+        name_rows.append((tid, kind, name, fid, line))
+
+    conn.executemany("INSERT INTO search_names VALUES (?, ?, ?, ?, ?)", name_rows)
+    conn.executemany("INSERT INTO search_postings VALUES (?, ?)",
+                     ((tri, ids.tobytes()) for tri, ids in sorted(postings.items())))
+    conn.execute("INSERT INTO meta VALUES ('search_ntri', ?)", (bytes(ntri),))
+
+
+def _target_mode(db_path):
+    """Permisos del índice existente, o los de un archivo nuevo (0666 & ~umask)"""
+    try:
+        return os.stat(db_path).st_mode & 0o777
+    except OSError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+@profiled('write', name='index.db')
+def write_index_db(ai_dir, files_map, results):
+    """
+    Genera .ai/index.db a partir de los resultados de merge_file_records().
+
+    El índice se construye en un archivo temporal y se reemplaza con
+    os.replace(): un lector con el índice abierto sigue viendo la versión
+    anterior completa. Si los datos no cambiaron (misma huella guardada en
+    meta), el archivo no se toca.
+
+    Args:
+        ai_dir: Directorio .ai/
+        files_map: Dict {filepath: {'type', 'lines', 'hash'}}
+        results: Dict retornado por merge_file_records()
+
+    Returns:
+        True si se escribió el índice, False si no cambió o no hay sqlite3
+    """
+    if sqlite3 is None:
+        warn("sqlite3 no disponible, se omite index.db", "write_index_db")
+        return False
+
+    ai_dir = str(ai_dir)
+    db_path = os.path.join(ai_dir, INDEX_DB_FILE)
+    digest = _index_digest(files_map, results)
+    if os.path.exists(db_path) and _stored_digest(db_path) == digest:
+        vprint("index.db sin cambios", level=1)
+        return False
+
+    os.makedirs(ai_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=ai_dir, prefix='.' + INDEX_DB_FILE + '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(tmp_path)
+        try:
+            # Archivo temporal: sin journal ni fsync por transacción
+            conn.execute("PRAGMA journal_mode = OFF")
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.executescript(_SCHEMA)
+            n_symbols = _populate(conn, files_map, results)
+            conn.executescript(_INDEXES)
+            conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ('digest', digest), ('files', str(len(files_map))), ('symbols', str(n_symbols)),
+            ])
+            conn.execute(f"PRAGMA user_version = {INDEX_DB_VERSION}")
+            conn.commit()
+        finally:
+            conn.close()
+        os.chmod(tmp_path, _target_mode(db_path))
+        os.replace(tmp_path, db_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    vprint(f"index.db: {len(files_map)} archivos, {n_symbols} símbolos", level=1)
+    return True
+
+
+def open_index_db(ai_dir):
+    """
+    Abre .ai/index.db en modo solo lectura.
+
+    Solo se leen las páginas que tocan las consultas: abrir el índice no
+    carga el proyecto en memoria.
+
+    Returns:
+        sqlite3.Connection, o None si no existe, no hay sqlite3 o el
+        índice es de otra versión del esquema
+    """
+    if sqlite3 is None:
+        return None
+    db_path = os.path.join(str(ai_dir), INDEX_DB_FILE)
+    if not os.path.exists(db_path):
+        return None
+    conn = None
+    try:
+        conn = sqlite3.connect(Path(os.path.abspath(db_path)).as_uri() + '?mode=ro', uri=True)
+        if conn.execute("PRAGMA user_version").fetchone()[0] == INDEX_DB_VERSION:
+            return conn
+    except sqlite3.DatabaseError as e:
+        warn(f"index.db ilegible: {e}", "open_index_db")
+    if conn is not None:
+        conn.close()
+    return None
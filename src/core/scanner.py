@@ -5,16 +5,27 @@ Construye el índice base para acceso directo sin navegación manual.
 """
 
 import os
+import re
 import sys
+import subprocess
+import time
 from pathlib import Path
 
+try:
+    import resource
+except ImportError:
+    # Windows: sin getrusage, la medición de memoria no está disponible
+    resource = None
+
 # Import condicional para warnings
 try:
     from utils.warnings import warn, vprint
+    from utils.profiler import profiled
 except ImportError:
     # Fallback si no se puede importar
     def warn(msg, ctx=""): pass
     def vprint(msg, level=1): pass
+    def profiled(kind, name=None, items=None): return lambda func: func
 
 # Directorios a excluir del escaneo
 EXCLUDE_DIRS = {
@@ -43,76 +54,431 @@ SOURCE_EXTENSIONS = {
 }
 
 
-def iter_source_files(project_path):
+def _is_source_file(name):
+    """True si el nombre de archivo es fuente indexable"""
+    return name not in EXCLUDE_FILES and Path(name).suffix.lower() in SOURCE_EXTENSIONS
+
+
+def _is_excluded_dir(name):
+    """True si el directorio se excluye del escaneo (dependencias, builds, ocultos)"""
+    return name in EXCLUDE_DIRS or name.startswith('.')
+
+
+# Entrada versionada de git ls-files --stage: "<modo> <hash> <etapa>\t<ruta>"
+_STAGE_ENTRY_RE = re.compile(r'(\d{6}) [0-9a-f]+ \d\t')
+
+# Modo de git de un submódulo (gitlink)
+_GITLINK_MODE = '160000'
+
+
+def _git_ls_files(project_path, *args):
+    """
+    Ejecuta git ls-files -z en project_path.
+    
+    Returns:
+        Lista de rutas relativas (con '/'), o None si git no está disponible o
+        project_path no está dentro de un repositorio
+    """
+    try:
+        result = subprocess.run(
+            ['git', 'ls-files', '-z', *args],
+            cwd=project_path, capture_output=True, timeout=60
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if result.returncode != 0:
+        return None
+    return [p for p in result.stdout.decode('utf-8', errors='surrogateescape').split('\0') if p]
+
+
+def _iter_git_files(project_path):
+    """
+    Archivos versionados y no versionados-no-ignorados según git.
+    
+    git ls-files no entra en los submódulos (los lista como una entrada
+    gitlink, modo 160000): cada submódulo inicializado se enumera por separado
+    con git, o con el recorrido de scandir si git no puede usarse en él.
+    
+    Returns:
+        Lista de rutas absolutas, o None si git no puede usarse
+    """
+    # --stage antepone "modo hash etapa\t" a las entradas versionadas (no a las --others)
+    listed = _git_ls_files(project_path, '--cached', '--others', '--exclude-standard', '--stage')
+    if listed is None:
+        return None
+    # --cached incluye archivos versionados borrados del working tree
+    deleted = set(_git_ls_files(project_path, '--deleted') or ())
+
+    files, submodules = [], []
+    for entry in listed:
+        match = _STAGE_ENTRY_RE.match(entry)
+        rel = entry[match.end():] if match else entry
+        if rel in deleted:
+            continue
+        parts = rel.split('/')
+        if match and match.group(1) == _GITLINK_MODE:
+            if not any(_is_excluded_dir(d) for d in parts):
+                submodules.append(os.path.join(project_path, *parts))
+            continue
+        if not _is_source_file(parts[-1]) or any(_is_excluded_dir(d) for d in parts[:-1]):
+            continue
+        files.append(os.path.join(project_path, *parts))
+    files = list(dict.fromkeys(files))  # un archivo en conflicto aparece una vez por etapa
+
+    for submodule in submodules:
+        if not os.path.exists(os.path.join(submodule, '.git')):
+            continue  # submódulo sin inicializar: no hay archivos en disco
+        sub_files = _iter_git_files(submodule)
+        files.extend(_iter_walk_files(submodule) if sub_files is None else sub_files)
+    return files
+
+
+@profiled('scan')
+def staged_source_files(project_path):
+    """
+    Archivos fuente en el índice de git (staged), incluyendo los eliminados.
+    
+    Usa --no-renames para que un renombre aparezca como eliminado + agregado.
+    
+    Returns:
+        Lista de rutas relativas a project_path (con '/'), o None si git no
+        está disponible o project_path no está en un repositorio
+    """
+    try:
+        result = subprocess.run(
+            ['git', 'diff', '--cached', '--name-only', '--no-renames', '--relative', '-z'],
+            cwd=project_path, capture_output=True, timeout=60
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if result.returncode != 0:
+        return None
+    staged = []
+    for rel in result.stdout.decode('utf-8', errors='surrogateescape').split('\0'):
+        parts = rel.split('/')
+        if rel and _is_source_file(parts[-1]) and not any(_is_excluded_dir(d) for d in parts[:-1]):
+            staged.append(rel)
+    return staged
+
+
+def _gitignore_regex(pattern):
+    """Convierte un patrón glob de .gitignore a regex"""
+    out = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith('**/', i):
+            out.append('(?:.*/)?')
+            i += 3
+            continue
+        if pattern.startswith('**', i):
+            out.append('.*')
+            i += 2
+            continue
+        if c == '*':
+            out.append('[^/]*')
+        elif c == '?':
+            out.append('[^/]')
+        elif c == '[':
+            end = pattern.find(']', i + 1)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                out.append('[' + pattern[i + 1:end].replace('!', '^', 1) + ']')
+                i = end
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return re.compile(''.join(out) + r'\Z')
+
+
+def _read_gitignore(dir_path, rel_dir):
+    """
+    Lee las reglas del .gitignore de un directorio.
+    
+    Returns:
+        Lista de (rel_dir, regex, negado, solo_directorios, anclado)
+    """
+    rules = []
+    try:
+        with open(os.path.join(dir_path, '.gitignore'), 'r', encoding='utf-8', errors='ignore') as f:
+            raw_lines = f.read().splitlines()
+    except (IOError, OSError):
+        return rules
+
+    for line in raw_lines:
+        line = line.rstrip()
+        if not line or line.startswith('#'):
+            continue
+        negate = line.startswith('!')
+        if negate:
+            line = line[1:]
+        dir_only = line.endswith('/')
+        line = line.rstrip('/')
+        anchored = '/' in line
+        line = line.lstrip('/')
+        if line:
+            rules.append((rel_dir, _gitignore_regex(line), negate, dir_only, anchored))
+    return rules
+
+
+def _is_ignored(rel_path, is_dir, rules):
+    """Aplica las reglas .gitignore en orden (la última que coincide gana)"""
+    ignored = False
+    for base, regex, negate, dir_only, anchored in rules:
+        if dir_only and not is_dir:
+            continue
+        if base:
+            if not rel_path.startswith(base + '/'):
+                continue
+            target = rel_path[len(base) + 1:]
+        else:
+            target = rel_path
+        subject = target if anchored else target.rsplit('/', 1)[-1]
+        if regex.match(subject):
+            ignored = not negate
+    return ignored
+
+
+def _iter_walk_files(project_path):
+    """
+    Recorre el proyecto con os.scandir respetando los .gitignore de cada nivel.
+    
+    scandir da el tipo de entrada sin stat adicional, y los directorios
+    ignorados se podan sin entrar en ellos.
+    """
+    stack = [('', project_path, _read_gitignore(project_path, ''))]
+    while stack:
+        rel_dir, dir_path, rules = stack.pop()
+        try:
+            with os.scandir(dir_path) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError as e:
+            warn(f"No se pudo listar {rel_dir or '.'}: {e}", "iter_source_files")
+            continue
+
+        subdirs = []
+        for entry in entries:
+            rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                if not _is_excluded_dir(entry.name) and not _is_ignored(rel, True, rules):
+                    subdirs.append((rel, entry.path))
+            elif _is_source_file(entry.name) and not _is_ignored(rel, False, rules):
+                yield entry.path
+
+        # Orden depth-first alfabético (pila: se apilan al revés)
+        for rel, path in reversed(subdirs):
+            stack.append((rel, path, rules + _read_gitignore(path, rel)))
+
+
+def iter_source_files(project_path, use_git=True):
     """
     Itera todos los archivos fuente excluyendo dependencias.
     
+    Si use_git es True y el proyecto está en un repositorio git, enumera los
+    archivos desde git (versionados + no versionados que no estén ignorados).
+    Si no, recorre el árbol respetando los .gitignore. En ambos casos se aplican
+    además EXCLUDE_DIRS, EXCLUDE_FILES y SOURCE_EXTENSIONS.
+    
     Args:
         project_path: Ruta absoluta del proyecto
+        use_git: Si True, intenta usar git ls-files
         
     Yields:
         Rutas absolutas de archivos fuente
     """
-    for root, dirs, files in os.walk(project_path):
-        # Filtrar directorios excluidos
-        dirs[:] = [d for d in dirs if d not in EXCLUDE_DIRS and not d.startswith('.')]
-        
-        for f in files:
-            if f in EXCLUDE_FILES:
-                continue
-            if Path(f).suffix.lower() in SOURCE_EXTENSIONS:
-                yield os.path.join(root, f)
+    if use_git:
+        files = _iter_git_files(project_path)
+        if files is not None:
+            vprint(f"Archivos enumerados desde git: {len(files)}", level=2)
+            yield from files
+            return
 
+    yield from _iter_walk_files(project_path)
 
-def scan_files(project_path, show_progress=False):
+
+@profiled('scan', items=lambda manifest: len(manifest['files']))
+def build_manifest(project_path, use_git=True, files=None):
     """
-    Escanea archivos y retorna mapa con metadata.
+    Recorre el proyecto una sola vez y retorna el manifiesto de archivos.
+    
+    El manifiesto se pasa a scan_incremental(), a los detectores y a
+    extract_config_map() para que ninguno vuelva a recorrer el árbol ni a
+    sondear la raíz con os.path.exists().
     
     Args:
         project_path: Ruta absoluta del proyecto
-        show_progress: Si True, muestra progreso de escaneo
-        
+        use_git: Si True, intenta enumerar con git ls-files
+        files: Rutas absolutas ya conocidas (ej: caché + archivos staged);
+            si se dan, no se enumera el proyecto
+    
     Returns:
-        Dict {filepath_relativo: {'type': 'py', 'lines': N, 'content': [lineas]}}
+        Dict {
+            'root': project_path,
+            'files': [rutas absolutas de archivos fuente],
+            'root_names': set de nombres (archivos y directorios) en la raíz,
+        }
     """
-    vprint("Iniciando escaneo de archivos...", level=1)
-    
-    files_map = {}
-    all_files = list(iter_source_files(project_path))
-    total = len(all_files)
+    try:
+        root_names = set(os.listdir(project_path))
+    except OSError as e:
+        warn(f"No se pudo listar {project_path}: {e}", "build_manifest")
+        root_names = set()
+
+    if files is None:
+        files = list(iter_source_files(project_path, use_git=use_git))
+    vprint(f"Manifiesto: {len(files)} archivos fuente, {len(root_names)} entradas en raíz", level=1)
+    return {'root': project_path, 'files': files, 'root_names': root_names}
+
+
+def root_has(project_path, name, manifest=None):
+    """True si existe name en la raíz del proyecto (usa el manifiesto si se da)"""
+    if manifest is not None:
+        return name in manifest['root_names']
+    return os.path.exists(os.path.join(project_path, name))
+
+
+def stat_snapshot(files):
+    """
+    Firma de stat de cada archivo, para detectar cambios sin leerlos.
+
+    Returns:
+        Dict {ruta: (mtime_ns, tamaño)}; los archivos que desaparecieron
+        entre el listado y el stat se omiten
+    """
+    snapshot = {}
+    for filepath in files:
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            continue
+        snapshot[filepath] = (st.st_mtime_ns, st.st_size)
+    return snapshot
+
+
+def wait_for_changes(project_path, snapshot, interval=1.0, debounce=0.5, use_git=True):
+    """
+    Espera (sondeando) hasta que cambie algún archivo fuente del proyecto.
+
+    Cada interval segundos se vuelve a listar el proyecto y se compara el stat
+    de los archivos con snapshot. Al detectar un cambio se espera a que el
+    árbol deje de cambiar durante debounce segundos, así una ráfaga (ej: un
+    git checkout de miles de archivos) produce una sola regeneración.
+
+    Args:
+        project_path: Ruta absoluta del proyecto
+        snapshot: stat_snapshot() del último estado indexado
+        interval: Segundos entre sondeos
+        debounce: Segundos sin cambios antes de retornar
+        use_git: Si True, enumera con git ls-files
+
+    Returns:
+        Tupla (manifest, snapshot, cambiados): manifiesto y snapshot del
+        estado estable, y número de archivos nuevos, modificados o eliminados
+    """
+    while True:
+        time.sleep(interval)
+        manifest = build_manifest(project_path, use_git=use_git)
+        current = stat_snapshot(manifest['files'])
+        if current != snapshot:
+            break
+
+    while True:
+        time.sleep(debounce)
+        settled_manifest = build_manifest(project_path, use_git=use_git)
+        settled = stat_snapshot(settled_manifest['files'])
+        if settled == current:
+            break
+        current = settled
+
+    changed = sum(1 for f, sig in current.items() if snapshot.get(f) != sig)
+    changed += sum(1 for f in snapshot if f not in current)
+    vprint(f"Cambios detectados: {changed} archivos", level=1)
+    return settled_manifest, current, changed
+
+
+def iter_scanned_files(project_path):
+    """
+    Lee los archivos fuente uno a uno, sin acumularlos.
     
-    vprint(f"Total de archivos a escanear: {total}", level=1)
+    Cada archivo se retorna con su contenido y el llamador decide qué conservar:
+    al avanzar el iterador, el contenido anterior puede liberarse. Así la memoria
+    depende del archivo más grande, no del tamaño del repositorio.
     
-    for i, filepath in enumerate(all_files, 1):
-        if show_progress and (i % 10 == 0 or i == total):
-            percent = int(100 * i / total)
-            print(f"\r         Escaneando... {i}/{total} ({percent}%)", end="", flush=True)
+    Args:
+        project_path: Ruta absoluta del proyecto
         
+    Yields:
+        Tuplas (filepath_relativo, {'type': 'py', 'lines': N, 'content': [lineas]})
+    """
+    for filepath in iter_source_files(project_path):
         rel_path = os.path.relpath(filepath, project_path)
         
         try:
             with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
                 lines = f.readlines()
-            
-            ext = Path(filepath).suffix.lstrip('.')
-            files_map[rel_path] = {
-                'type': ext,
-                'lines': len(lines),
-                'content': lines
-            }
-            
-            vprint(f"Archivo escaneado: {rel_path} ({len(lines)} lineas)", level=2)
-            
         except (IOError, UnicodeDecodeError) as e:
             warn(f"No se pudo leer {rel_path}: {e}", "scan_files")
+            continue
+        
+        vprint(f"Archivo escaneado: {rel_path} ({len(lines)} lineas)", level=2)
+        yield rel_path, {
+            'type': Path(filepath).suffix.lstrip('.'),
+            'lines': len(lines),
+            'content': lines
+        }
+
+
+@profiled('scan')
+def scan_files(project_path, show_progress=False):
+    """
+    Escanea archivos y retorna mapa con metadata.
+    
+    Mantiene todo el contenido en memoria; para repositorios grandes usar
+    iter_scanned_files() o core.cache.scan_incremental(), que solo conservan
+    un resumen por archivo.
+    
+    Args:
+        project_path: Ruta absoluta del proyecto
+        show_progress: Si True, muestra progreso de escaneo
+        
+    Returns:
+        Dict {filepath_relativo: {'type': 'py', 'lines': N, 'content': [lineas]}}
+    """
+    vprint("Iniciando escaneo de archivos...", level=1)
+    
+    files_map = {}
+    for i, (rel_path, info) in enumerate(iter_scanned_files(project_path), 1):
+        if show_progress and i % 10 == 0:
+            print(f"\r         Escaneando... {i} archivos", end="", flush=True)
+        files_map[rel_path] = info
     
     if show_progress:
-        print()  # Nueva linea al terminar
+        print(f"\r         Escaneando... {len(files_map)} archivos")
     
     vprint(f"Escaneo completado: {len(files_map)} archivos", level=1)
     return files_map
 
 
+def peak_memory_mb():
+    """
+    Memoria residente máxima (MB) del proceso actual.
+    
+    No incluye los workers de un ProcessPoolExecutor: getrusage solo cuenta
+    los hijos ya terminados, y como el máximo de uno solo. scan_incremental()
+    mide cada worker por separado (stats['workers_peak_mb']).
+    
+    Returns:
+        float, o None si la plataforma no soporta getrusage
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB, macOS bytes
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return peak / divisor
+
+
 def is_empty_project(project_path):
     """Verifica si el directorio esta vacio o solo tiene archivos ocultos/git"""
     for item in os.listdir(project_path):
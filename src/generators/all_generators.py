@@ -8,98 +8,131 @@ import datetime
 import os
 from pathlib import Path
 
+try:
+    from utils.profiler import profiled
+except ImportError:
+    def profiled(kind, name=None, items=None): return lambda func: func
 
-def generate_project_index(project_path, project_name, languages, frameworks, files_map,
-                           functions, endpoints, components, dependencies):
+from core.extractors import build_file_index
+
+
+# Los índices grandes se generan con emisores (emit_*): funciones generadoras
+# que producen el YAML línea a línea (sin '\n'), para escribirlo a disco a
+# medida que se genera con utils.files.write_lines_if_changed() sin tener el
+# archivo completo en memoria. generate_*() retorna el mismo texto completo.
+
+def _joined(emitter):
+    """generate_*() equivalente a un emisor: retorna todas sus líneas como texto"""
+    def generate(*args, **kwargs):
+        return ''.join(line + '\n' for line in emitter(*args, **kwargs))
+    generate.__name__ = emitter.__name__.replace('emit_', 'generate_', 1)
+    generate.__qualname__ = generate.__name__
+    generate.__doc__ = emitter.__doc__
+    return generate
+
+
+@profiled('generate')
+def emit_project_index(project_path, project_name, languages, frameworks, files_map,
+                       functions, endpoints, components, dependencies):
     """Genera PROJECT_INDEX.yaml"""
+    yield from emit_index_header(project_path, project_name, languages, frameworks)
+    yield from emit_index_sections(files_map, functions, endpoints, components, dependencies)
+
+
+def emit_index_header(project_path, project_name, languages, frameworks):
+    """Encabezado y meta de PROJECT_INDEX.yaml (índice completo o manifiesto de shards)"""
     today = datetime.date.today().isoformat()
 
-    lines = []
-    lines.append("# " + "=" * 76)
-    lines.append(f"# {project_name.upper()} - AI PROJECT INDEX")
-    lines.append("# " + "=" * 76)
-    lines.append(f"# LAST_UPDATED: {today}")
-    lines.append("# " + "=" * 76)
-    lines.append("")
-    lines.append("meta:")
-    lines.append(f"  name: {project_name}")
-    lines.append(f"  desc: Proyecto con sistema .ai/ de AI Agent Wizard")
-    lines.append(f"  lang: [{', '.join(languages)}]")
-    lines.append("  stack:")
+    yield "# " + "=" * 76
+    yield f"# {project_name.upper()} - AI PROJECT INDEX"
+    yield "# " + "=" * 76
+    yield f"# LAST_UPDATED: {today}"
+    yield "# " + "=" * 76
+    yield ""
+    yield "meta:"
+    yield f"  name: {project_name}"
+    yield f"  desc: Proyecto con sistema .ai/ de AI Agent Wizard"
+    yield f"  lang: [{', '.join(languages)}]"
+    yield "  stack:"
     if frameworks.get('backend'):
-        lines.append(f"    backend: {', '.join(frameworks['backend'])}")
+        yield f"    backend: {', '.join(frameworks['backend'])}"
     if frameworks.get('frontend'):
-        lines.append(f"    frontend: {', '.join(frameworks['frontend'])}")
+        yield f"    frontend: {', '.join(frameworks['frontend'])}"
     if frameworks.get('db'):
-        lines.append(f"    db: [{', '.join(frameworks['db'])}]")
-    lines.append(f"  root: {project_path}")
-    lines.append("")
+        yield f"    db: [{', '.join(frameworks['db'])}]"
+    yield f"  root: {project_path}"
+    yield ""
+
 
+def emit_index_sections(files_map, functions, endpoints, components, dependencies):
+    """Secciones files, functions, endpoints, components y dependencies (índice completo o un shard)"""
     # Files
-    lines.append("# " + "=" * 76)
-    lines.append("# FILE MAP")
-    lines.append("# " + "=" * 76)
-    lines.append("files:")
+    yield "# " + "=" * 76
+    yield "# FILE MAP"
+    yield "# " + "=" * 76
+    yield "files:"
     for fpath in sorted(files_map.keys()):
         info = files_map[fpath]
-        lines.append(f"  {fpath}:")
-        lines.append(f"    type: {info['type']}")
-        lines.append(f"    lines: ~{info['lines']}")
-    lines.append("")
+        yield f"  {fpath}:"
+        yield f"    type: {info['type']}"
+        yield f"    lines: ~{info['lines']}"
+    yield ""
 
     # Functions
     if functions:
-        lines.append("# " + "=" * 76)
-        lines.append("# FUNCTIONS - name: line")
-        lines.append("# " + "=" * 76)
-        lines.append("functions:")
+        yield "# " + "=" * 76
+        yield "# FUNCTIONS - name: line"
+        yield "# " + "=" * 76
+        yield "functions:"
         for fpath in sorted(functions.keys()):
-            lines.append(f"  {fpath}:")
+            yield f"  {fpath}:"
             for func_name, line_num in sorted(functions[fpath].items(), key=lambda x: x[1]):
-                lines.append(f"    {func_name}: {line_num}")
-        lines.append("")
+                yield f"    {func_name}: {line_num}"
+        yield ""
 
     # Endpoints
     if endpoints:
-        lines.append("# " + "=" * 76)
-        lines.append("# API ENDPOINTS")
-        lines.append("# " + "=" * 76)
-        lines.append("endpoints:")
+        yield "# " + "=" * 76
+        yield "# API ENDPOINTS"
+        yield "# " + "=" * 76
+        yield "endpoints:"
         for ep_key in sorted(endpoints.keys()):
             ep = endpoints[ep_key]
-            lines.append(f'  "{ep_key}": {{handler: {ep["handler"]}, file: {ep["file"]}, line: {ep["line"]}}}')
-        lines.append("")
+            yield f'  "{ep_key}": {{handler: {ep["handler"]}, file: {ep["file"]}, line: {ep["line"]}}}'
+        yield ""
 
     # Components
     if components:
-        lines.append("# " + "=" * 76)
-        lines.append("# UI COMPONENTS")
-        lines.append("# " + "=" * 76)
-        lines.append("components:")
+        yield "# " + "=" * 76
+        yield "# UI COMPONENTS"
+        yield "# " + "=" * 76
+        yield "components:"
         for comp_name in sorted(components.keys()):
             comp = components[comp_name]
-            lines.append(f"  {comp_name}:")
-            lines.append(f"    file: {comp['file']}")
+            yield f"  {comp_name}:"
+            yield f"    file: {comp['file']}"
             if comp.get('props'):
-                lines.append(f"    props: [{', '.join(comp['props'])}]")
+                yield f"    props: [{', '.join(comp['props'])}]"
             if comp.get('emits'):
-                lines.append(f"    emits: [{', '.join(comp['emits'])}]")
-        lines.append("")
+                yield f"    emits: [{', '.join(comp['emits'])}]"
+        yield ""
 
     # Dependencies
     if dependencies:
-        lines.append("# " + "=" * 76)
-        lines.append("# DEPENDENCIES")
-        lines.append(" # " + "=" * 76)
-        lines.append("dependencies:")
+        yield "# " + "=" * 76
+        yield "# DEPENDENCIES"
+        yield " # " + "=" * 76
+        yield "dependencies:"
         for fpath in sorted(dependencies.keys()):
             deps_list = ', '.join(dependencies[fpath])
-            lines.append(f"  {fpath}: [{deps_list}]")
-        lines.append("")
-    
-    return '\n'.join(lines) + '\n'
+            yield f"  {fpath}: [{deps_list}]"
+        yield ""
+
 
+generate_project_index = _joined(emit_project_index)
 
+
+@profiled('generate')
 def generate_all_yamls(project_name, languages, frameworks, project_path=None, files_map=None):
     """Genera todos los YAMLs necesarios con información dinámica del proyecto"""
     today = datetime.date.today().isoformat()
@@ -269,30 +302,30 @@ commit_policy:
     return yamls
 
 
-def generate_architecture_yaml(project_path, languages=None, frameworks=None, 
-                               files_map=None, functions=None, dependencies=None):
+@profiled('generate')
+def emit_architecture_yaml(project_path, languages=None, frameworks=None, 
+                           files_map=None, functions=None, dependencies=None):
     """Genera ARCHITECTURE.yaml dinámico analizando la estructura real del proyecto"""
     project_name = os.path.basename(project_path)
     today = datetime.date.today().isoformat()
     
-    lines = []
-    lines.append(f"# {project_name.upper()} - PROJECT ARCHITECTURE")
-    lines.append(f"# Generated: {today}")
-    lines.append(f"# Understand the project structure and execution flow")
-    lines.append("")
+    yield f"# {project_name.upper()} - PROJECT ARCHITECTURE"
+    yield f"# Generated: {today}"
+    yield f"# Understand the project structure and execution flow"
+    yield ""
     
     # Propósito del sistema .ai/
-    lines.append("optimizer_purpose: |")
-    lines.append("  This .ai/ system was created to help AI agents understand your project efficiently.")
-    lines.append("  It maps code structure so every function, endpoint, and component is immediately accessible.")
-    lines.append("  Read PROJECT_INDEX.yaml for the complete map. Read FLOW.yaml for usage instructions.")
-    lines.append("")
+    yield "optimizer_purpose: |"
+    yield "  This .ai/ system was created to help AI agents understand your project efficiently."
+    yield "  It maps code structure so every function, endpoint, and component is immediately accessible."
+    yield "  Read PROJECT_INDEX.yaml for the complete map. Read FLOW.yaml for usage instructions."
+    yield ""
     
     # Detectar estructura de directorios principales
-    lines.append("# " + "=" * 60)
-    lines.append("# DIRECTORY STRUCTURE")
-    lines.append("# " + "=" * 60)
-    lines.append("directories:")
+    yield "# " + "=" * 60
+    yield "# DIRECTORY STRUCTURE"
+    yield "# " + "=" * 60
+    yield "directories:"
     
     if files_map:
         # Extraer directorios únicos de primer y segundo nivel
@@ -310,7 +343,7 @@ def generate_architecture_yaml(project_path, languages=None, frameworks=None,
         for d in sorted(dirs_count.keys()):
             info = dirs_count[d]
             subdirs_str = f", subdirs: [{', '.join(sorted(info['subdirs']))}]" if info['subdirs'] else ""
-            lines.append(f"  {d}/: {{files: {info['files']}{subdirs_str}}}")
+            yield f"  {d}/: {{files: {info['files']}{subdirs_str}}}"
     else:
         # Fallback: escanear directorio
         try:
@@ -320,36 +353,36 @@ def generate_architecture_yaml(project_path, languages=None, frameworks=None,
                     'node_modules', '__pycache__', '.git', 'venv', '.venv', 'dist', 'build'
                 }:
                     file_count = sum(1 for _ in Path(item_path).rglob('*') if _.is_file())
-                    lines.append(f"  {item}/: {{files: ~{file_count}}}")
+                    yield f"  {item}/: {{files: ~{file_count}}}"
         except Exception:
-            lines.append("  # No se pudo analizar la estructura")
-    lines.append("")
+            yield "  # No se pudo analizar la estructura"
+    yield ""
     
     # Stack tecnológico
     if languages or frameworks:
-        lines.append("# " + "=" * 60)
-        lines.append("# TECHNOLOGY STACK")
-        lines.append("# " + "=" * 60)
-        lines.append("stack:")
+        yield "# " + "=" * 60
+        yield "# TECHNOLOGY STACK"
+        yield "# " + "=" * 60
+        yield "stack:"
         if languages:
-            lines.append(f"  languages: [{', '.join(languages)}]")
+            yield f"  languages: [{', '.join(languages)}]"
         if frameworks:
             if frameworks.get('backend'):
-                lines.append(f"  backend: [{', '.join(frameworks['backend'])}]")
+                yield f"  backend: [{', '.join(frameworks['backend'])}]"
             if frameworks.get('frontend'):
-                lines.append(f"  frontend: [{', '.join(frameworks['frontend'])}]")
+                yield f"  frontend: [{', '.join(frameworks['frontend'])}]"
             if frameworks.get('db'):
-                lines.append(f"  database: [{', '.join(frameworks['db'])}]")
+                yield f"  database: [{', '.join(frameworks['db'])}]"
             if frameworks.get('other'):
-                lines.append(f"  infrastructure: [{', '.join(frameworks['other'])}]")
-        lines.append("")
+                yield f"  infrastructure: [{', '.join(frameworks['other'])}]"
+        yield ""
     
     # Módulos principales con sus funciones
     if functions:
-        lines.append("# " + "=" * 60)
-        lines.append("# MODULE MAP - Key modules and their roles")
-        lines.append("# " + "=" * 60)
-        lines.append("modules:")
+        yield "# " + "=" * 60
+        yield "# MODULE MAP - Key modules and their roles"
+        yield "# " + "=" * 60
+        yield "modules:"
         
         # Agrupar por directorio de primer nivel
         module_groups = {}
@@ -361,32 +394,32 @@ def generate_architecture_yaml(project_path, languages=None, frameworks=None,
             module_groups[group][fpath] = funcs
         
         for group in sorted(module_groups.keys()):
-            lines.append(f"  # --- {group}/ ---")
+            yield f"  # --- {group}/ ---"
             for fpath in sorted(module_groups[group].keys()):
                 funcs = module_groups[group][fpath]
                 func_names = sorted(funcs.keys())
                 preview = func_names[:5]
                 extra = f" (+{len(func_names)-5} more)" if len(func_names) > 5 else ""
-                lines.append(f"  {fpath}:")
-                lines.append(f"    functions: [{', '.join(preview)}{extra}]")
-            lines.append("")
+                yield f"  {fpath}:"
+                yield f"    functions: [{', '.join(preview)}{extra}]"
+            yield ""
     
     # Dependencias entre módulos
     if dependencies:
-        lines.append("# " + "=" * 60)
-        lines.append("# MODULE DEPENDENCIES")
-        lines.append("# " + "=" * 60)
-        lines.append("dependencies:")
+        yield "# " + "=" * 60
+        yield "# MODULE DEPENDENCIES"
+        yield "# " + "=" * 60
+        yield "dependencies:"
         for fpath in sorted(dependencies.keys()):
             deps_list = ', '.join(sorted(dependencies[fpath]))
-            lines.append(f"  {fpath}: [{deps_list}]")
-        lines.append("")
+            yield f"  {fpath}: [{deps_list}]"
+        yield ""
     
     # Detección de entry points
-    lines.append("# " + "=" * 60)
-    lines.append("# ENTRY POINTS & KEY CONCEPTS")
-    lines.append("# " + "=" * 60)
-    lines.append("entry_points:")
+    yield "# " + "=" * 60
+    yield "# ENTRY POINTS & KEY CONCEPTS"
+    yield "# " + "=" * 60
+    yield "entry_points:"
     
     # Buscar archivos comunes de entry point
     entry_files = []
@@ -400,28 +433,30 @@ def generate_architecture_yaml(project_path, languages=None, frameworks=None,
     
     if entry_files:
         for ef in sorted(entry_files):
-            lines.append(f"  - {ef}")
+            yield f"  - {ef}"
     else:
-        lines.append("  - # No entry points detected automatically")
-    lines.append("")
+        yield "  - # No entry points detected automatically"
+    yield ""
     
     # Instrucciones de regeneración
-    lines.append("# " + "=" * 60)
-    lines.append("# REGENERATING INDEXES")
-    lines.append("# " + "=" * 60)
-    lines.append("regenerate: |")
-    lines.append("  After you modify code locally:")
-    lines.append("    python .ai/update_index.py")
-    lines.append("  ")
-    lines.append("  When you want latest features from GitHub:")
-    lines.append("    python .ai/update.py --auto")
-    lines.append("  ")
-    lines.append("  Both automatically regenerate all indexes.")
-    lines.append("")
-    
-    return '\n'.join(lines) + '\n'
+    yield "# " + "=" * 60
+    yield "# REGENERATING INDEXES"
+    yield "# " + "=" * 60
+    yield "regenerate: |"
+    yield "  After you modify code locally:"
+    yield "    python .ai/update_index.py"
+    yield "  "
+    yield "  When you want latest features from GitHub:"
+    yield "    python .ai/update.py --auto"
+    yield "  "
+    yield "  Both automatically regenerate all indexes."
+    yield ""
+
 
+generate_architecture_yaml = _joined(emit_architecture_yaml)
 
+
+@profiled('generate')
 def generate_flow_yaml():
     """Genera FLOW.yaml con instrucciones para agentes IA sobre cómo usar los índices"""
     return """# AI AGENT EXECUTION FLOW
@@ -576,7 +611,8 @@ example: |
     → 20 lines read, 90% fewer tokens
 """
 
-def generate_graph_yaml(dependencies, functions, endpoints, components):
+@profiled('generate')
+def emit_graph_yaml(dependencies, functions, endpoints, components):
     """Genera GRAPH.yaml - mapa comprimido de dependencias y relaciones reales del proyecto"""
     today = datetime.date.today().isoformat()
     total_funcs = sum(len(v) for v in functions.values()) if functions else 0
@@ -584,26 +620,25 @@ def generate_graph_yaml(dependencies, functions, endpoints, components):
     total_eps = len(endpoints) if endpoints else 0
     total_comps = len(components) if components else 0
     
-    lines = []
-    lines.append("# DEPENDENCY GRAPH - Compressed module relationships")
-    lines.append(f"# Generated: {today}")
-    lines.append("# Quick visual reference for understanding code flow")
-    lines.append("")
+    yield "# DEPENDENCY GRAPH - Compressed module relationships"
+    yield f"# Generated: {today}"
+    yield "# Quick visual reference for understanding code flow"
+    yield ""
     
     # Estadísticas
-    lines.append("statistics:")
-    lines.append(f"  total_functions: {total_funcs}")
-    lines.append(f"  total_endpoints: {total_eps}")
-    lines.append(f"  total_components: {total_comps}")
-    lines.append(f"  files_with_dependencies: {total_deps}")
-    lines.append("")
+    yield "statistics:"
+    yield f"  total_functions: {total_funcs}"
+    yield f"  total_endpoints: {total_eps}"
+    yield f"  total_components: {total_comps}"
+    yield f"  files_with_dependencies: {total_deps}"
+    yield ""
     
     # Grafo de dependencias real
     if dependencies:
-        lines.append("# " + "=" * 60)
-        lines.append("# MODULE DEPENDENCIES (who imports whom)")
-        lines.append("# " + "=" * 60)
-        lines.append("module_graph:")
+        yield "# " + "=" * 60
+        yield "# MODULE DEPENDENCIES (who imports whom)"
+        yield "# " + "=" * 60
+        yield "module_graph:"
         
         # Construir grafo simplificado por módulo (directorio)
         module_deps = {}
@@ -620,76 +655,79 @@ def generate_graph_yaml(dependencies, functions, endpoints, components):
         for mod in sorted(module_deps.keys()):
             targets = sorted(module_deps[mod])
             if targets:
-                lines.append(f"  {mod}: [{', '.join(targets)}]")
+                yield f"  {mod}: [{', '.join(targets)}]"
             else:
-                lines.append(f"  {mod}: []")
-        lines.append("")
+                yield f"  {mod}: []"
+        yield ""
         
         # Dependencias detalladas archivo a archivo
-        lines.append("# " + "=" * 60)
-        lines.append("# FILE-LEVEL DEPENDENCIES (detailed)")
-        lines.append("# " + "=" * 60)
-        lines.append("file_dependencies:")
+        yield "# " + "=" * 60
+        yield "# FILE-LEVEL DEPENDENCIES (detailed)"
+        yield "# " + "=" * 60
+        yield "file_dependencies:"
         for fpath in sorted(dependencies.keys()):
             deps_list = ', '.join(sorted(dependencies[fpath]))
-            lines.append(f"  {fpath}: [{deps_list}]")
-        lines.append("")
+            yield f"  {fpath}: [{deps_list}]"
+        yield ""
     
     # Endpoints como puntos de entrada
     if endpoints:
-        lines.append("# " + "=" * 60)
-        lines.append("# API ENTRY POINTS")
-        lines.append("# " + "=" * 60)
-        lines.append("api_routes:")
+        yield "# " + "=" * 60
+        yield "# API ENTRY POINTS"
+        yield "# " + "=" * 60
+        yield "api_routes:"
         for ep_key in sorted(endpoints.keys()):
             ep = endpoints[ep_key]
-            lines.append(f'  "{ep_key}": {{handler: {ep["handler"]}, file: {ep["file"]}, line: {ep["line"]}}}')
-        lines.append("")
+            yield f'  "{ep_key}": {{handler: {ep["handler"]}, file: {ep["file"]}, line: {ep["line"]}}}'
+        yield ""
     
     # Componentes como nodos UI
     if components:
-        lines.append("# " + "=" * 60)
-        lines.append("# UI COMPONENT TREE")
-        lines.append("# " + "=" * 60)
-        lines.append("component_graph:")
+        yield "# " + "=" * 60
+        yield "# UI COMPONENT TREE"
+        yield "# " + "=" * 60
+        yield "component_graph:"
         for comp_name in sorted(components.keys()):
             comp = components[comp_name]
             props_str = f", props: [{', '.join(comp['props'])}]" if comp.get('props') else ""
             emits_str = f", emits: [{', '.join(comp['emits'])}]" if comp.get('emits') else ""
-            lines.append(f"  {comp_name}: {{file: {comp['file']}{props_str}{emits_str}}}")
-        lines.append("")
+            yield f"  {comp_name}: {{file: {comp['file']}{props_str}{emits_str}}}"
+        yield ""
     
     # Archivos más conectados (hubs)
     if functions:
-        lines.append("# " + "=" * 60)
-        lines.append("# KEY FILES (most functions)")
-        lines.append("# " + "=" * 60)
-        lines.append("key_files:")
+        yield "# " + "=" * 60
+        yield "# KEY FILES (most functions)"
+        yield "# " + "=" * 60
+        yield "key_files:"
         sorted_files = sorted(functions.items(), key=lambda x: len(x[1]), reverse=True)
         for fpath, funcs in sorted_files[:10]:
-            lines.append(f"  {fpath}: {len(funcs)} functions")
-        lines.append("")
+            yield f"  {fpath}: {len(funcs)} functions"
+        yield ""
     
     # Instrucciones de uso
-    lines.append("# " + "=" * 60)
-    lines.append("# HOW TO USE THIS GRAPH")
-    lines.append("# " + "=" * 60)
-    lines.append("usage: |")
-    lines.append("  1. Check module_graph for high-level module relationships")
-    lines.append("  2. Check file_dependencies for specific file imports")
-    lines.append("  3. Check api_routes for endpoint entry points")
-    lines.append("  4. Check key_files for the most important files")
-    lines.append("  5. Use PROJECT_INDEX.yaml to jump to specific functions by line number")
-    lines.append("")
-    
-    return '\n'.join(lines) + '\n'
+    yield "# " + "=" * 60
+    yield "# HOW TO USE THIS GRAPH"
+    yield "# " + "=" * 60
+    yield "usage: |"
+    yield "  1. Check module_graph for high-level module relationships"
+    yield "  2. Check file_dependencies for specific file imports"
+    yield "  3. Check api_routes for endpoint entry points"
+    yield "  4. Check key_files for the most important files"
+    yield "  5. Use PROJECT_INDEX.yaml to jump to specific functions by line number"
+    yield ""
+
+
+generate_graph_yaml = _joined(emit_graph_yaml)
 
 
-def generate_changes_yaml(project_path, files_map):
+@profiled('generate')
+def emit_changes_yaml(project_path, files_map):
     """
     Genera CHANGES.yaml — indexación sensible a cambios.
-    Calcula hash MD5 de cada archivo fuente y lo compara con el estado anterior
-    guardado en .ai/.state.json para identificar archivos modificados.
+    Usa el hash BLAKE2b calculado por el escáner (info['hash']) y lo compara con
+    el estado anterior guardado en .ai/.state.json para identificar archivos
+    modificados. Solo si falta el hash lo calcula desde el contenido o el disco.
     """
     import hashlib
     import json as _json
@@ -714,19 +752,20 @@ def generate_changes_yaml(project_path, files_map):
     unchanged = []
     
     for fpath, info in files_map.items():
-        # Calcular hash del contenido
-        if 'content' in info and info['content']:
-            content_str = ''.join(info['content'])
-        else:
-            # Si content ya fue liberado, leer archivo
-            full_path = os.path.join(project_path, fpath)
-            try:
-                with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content_str = f.read()
-            except Exception:
-                continue
-        
-        file_hash = hashlib.md5(content_str.encode('utf-8', errors='ignore')).hexdigest()
+        file_hash = info.get('hash')
+        if file_hash is None:
+            if 'content' in info and info['content']:
+                data = ''.join(info['content']).encode('utf-8', errors='ignore')
+            else:
+                # Sin hash ni contenido: leer archivo
+                full_path = os.path.join(project_path, fpath)
+                try:
+                    with open(full_path, 'rb') as f:
+                        data = f.read()
+                except Exception:
+                    continue
+            # Mismo algoritmo que core.cache.content_digest
+            file_hash = hashlib.blake2b(data, digest_size=16).hexdigest()
         current_state[fpath] = file_hash
         
         if fpath not in prev_state:
@@ -748,48 +787,49 @@ def generate_changes_yaml(project_path, files_map):
         pass
     
     # Generar YAML
-    lines = []
-    lines.append("# CHANGES - Change-Aware Index")
-    lines.append(f"# Generated: {today}")
-    lines.append("# Tracks which files have changed since last indexing")
-    lines.append("")
-    lines.append("summary:")
-    lines.append(f"  total_files: {len(current_state)}")
-    lines.append(f"  changed: {len(changed)}")
-    lines.append(f"  added: {len(added)}")
-    lines.append(f"  removed: {len(removed)}")
-    lines.append(f"  unchanged: {len(unchanged)}")
-    lines.append("")
+    yield "# CHANGES - Change-Aware Index"
+    yield f"# Generated: {today}"
+    yield "# Tracks which files have changed since last indexing"
+    yield ""
+    yield "summary:"
+    yield f"  total_files: {len(current_state)}"
+    yield f"  changed: {len(changed)}"
+    yield f"  added: {len(added)}"
+    yield f"  removed: {len(removed)}"
+    yield f"  unchanged: {len(unchanged)}"
+    yield ""
     
     if changed:
-        lines.append("# Files modified since last index")
-        lines.append("changed_files:")
+        yield "# Files modified since last index"
+        yield "changed_files:"
         for f in sorted(changed):
-            lines.append(f"  - {f}")
-        lines.append("")
+            yield f"  - {f}"
+        yield ""
     
     if added:
-        lines.append("# New files since last index")
-        lines.append("added_files:")
+        yield "# New files since last index"
+        yield "added_files:"
         for f in sorted(added):
-            lines.append(f"  - {f}")
-        lines.append("")
+            yield f"  - {f}"
+        yield ""
     
     if removed:
-        lines.append("# Files removed since last index")
-        lines.append("removed_files:")
+        yield "# Files removed since last index"
+        yield "removed_files:"
         for f in sorted(removed):
-            lines.append(f"  - {f}")
-        lines.append("")
+            yield f"  - {f}"
+        yield ""
     
-    lines.append("# USAGE: Focus attention on changed_files and added_files")
-    lines.append("# These are the files most likely needing review")
-    lines.append("")
-    
-    return '\n'.join(lines) + '\n'
+    yield "# USAGE: Focus attention on changed_files and added_files"
+    yield "# These are the files most likely needing review"
+    yield ""
 
 
-def generate_summaries_yaml(files_map, functions):
+generate_changes_yaml = _joined(emit_changes_yaml)
+
+
+@profiled('generate')
+def emit_summaries_yaml(files_map, functions):
     """
     Genera SUMMARIES.yaml — resúmenes semánticos de 1-2 líneas por archivo.
     Extrae docstrings, comentarios iniciales y nombres de funciones
@@ -798,20 +838,21 @@ def generate_summaries_yaml(files_map, functions):
     import re as _re
     today = datetime.date.today().isoformat()
     
-    lines = []
-    lines.append("# SUMMARIES - Semantic File Descriptions")
-    lines.append(f"# Generated: {today}")
-    lines.append("# One-line summary per file for quick project understanding")
-    lines.append("")
-    lines.append("files:")
+    yield "# SUMMARIES - Semantic File Descriptions"
+    yield f"# Generated: {today}"
+    yield "# One-line summary per file for quick project understanding"
+    yield ""
+    yield "files:"
     
     for fpath in sorted(files_map.keys()):
         info = files_map[fpath]
         summary = _extract_file_summary(fpath, info, functions)
-        lines.append(f"  {fpath}: \"{summary}\"")
+        yield f"  {fpath}: \"{summary}\""
     
-    lines.append("")
-    return '\n'.join(lines) + '\n'
+    yield ""
+
+
+generate_summaries_yaml = _joined(emit_summaries_yaml)
 
 
 def _extract_file_summary(fpath, info, functions):
@@ -886,12 +927,19 @@ def _extract_file_summary(fpath, info, functions):
     return summary
 
 
-def generate_context_budget_yaml(files_map, functions, endpoints, components):
+@profiled('generate')
+def emit_context_budget_yaml(files_map, functions, endpoints, components, file_index=None):
     """
     Genera CONTEXT_BUDGET.yaml — jerarquía de 3 niveles para optimización de tokens.
     Clasifica archivos en niveles de prioridad para lectura eficiente.
+    
+    file_index: índices inversos de build_file_index() (se construyen si no se pasan)
     """
     today = datetime.date.today().isoformat()
+    if file_index is None:
+        file_index = build_file_index(endpoints, components)
+    endpoint_files = file_index['endpoints']
+    component_files = file_index['components']
     
     # Clasificar archivos por importancia
     critical = []   # Entry points, rutas principales, configs
@@ -902,8 +950,8 @@ def generate_context_budget_yaml(files_map, functions, endpoints, components):
         basename = os.path.basename(fpath).lower()
         ext = info['type']
         func_count = len(functions.get(fpath, {}))
-        has_endpoints = any(ep['file'] == fpath for ep in endpoints.values()) if endpoints else False
-        has_components = any(comp['file'] == fpath for comp in components.values()) if components else False
+        has_endpoints = fpath in endpoint_files
+        has_components = fpath in component_files
         
         # Level 1: Critical (entry points, routes, main configs)
         if basename in ('main.py', 'app.py', 'index.js', 'index.ts', 'server.js', 'server.ts',
@@ -921,42 +969,43 @@ def generate_context_budget_yaml(files_map, functions, endpoints, components):
         else:
             reference.append((fpath, func_count, info.get('lines', 0)))
     
-    lines = []
-    lines.append("# CONTEXT BUDGET - Token Optimization Hierarchy")
-    lines.append(f"# Generated: {today}")
-    lines.append("# Read files in priority order to minimize token usage")
-    lines.append("")
-    lines.append("# Level 1: CRITICAL - Read these first (entry points, routes)")
-    lines.append(f"# {len(critical)} files - read full context")
-    lines.append("critical:")
+    yield "# CONTEXT BUDGET - Token Optimization Hierarchy"
+    yield f"# Generated: {today}"
+    yield "# Read files in priority order to minimize token usage"
+    yield ""
+    yield "# Level 1: CRITICAL - Read these first (entry points, routes)"
+    yield f"# {len(critical)} files - read full context"
+    yield "critical:"
     for fpath, fc, lc in sorted(critical, key=lambda x: -x[1]):
-        lines.append(f"  - {{file: \"{fpath}\", functions: {fc}, lines: {lc}}}")
-    lines.append("")
+        yield f"  - {{file: \"{fpath}\", functions: {fc}, lines: {lc}}}"
+    yield ""
     
-    lines.append("# Level 2: IMPORTANT - Read when relevant (core modules)")
-    lines.append(f"# {len(important)} files - read key sections only")
-    lines.append("important:")
+    yield "# Level 2: IMPORTANT - Read when relevant (core modules)"
+    yield f"# {len(important)} files - read key sections only"
+    yield "important:"
     for fpath, fc, lc in sorted(important, key=lambda x: -x[1]):
-        lines.append(f"  - {{file: \"{fpath}\", functions: {fc}, lines: {lc}}}")
-    lines.append("")
+        yield f"  - {{file: \"{fpath}\", functions: {fc}, lines: {lc}}}"
+    yield ""
     
-    lines.append("# Level 3: REFERENCE - Read only when needed (utils, tests)")
-    lines.append(f"# {len(reference)} files - scan briefly or skip")
-    lines.append("reference:")
+    yield "# Level 3: REFERENCE - Read only when needed (utils, tests)"
+    yield f"# {len(reference)} files - scan briefly or skip"
+    yield "reference:"
     for fpath, fc, lc in sorted(reference, key=lambda x: -x[1]):
-        lines.append(f"  - {{file: \"{fpath}\", functions: {fc}, lines: {lc}}}")
-    lines.append("")
+        yield f"  - {{file: \"{fpath}\", functions: {fc}, lines: {lc}}}"
+    yield ""
     
-    lines.append("# STRATEGY:")
-    lines.append("# 1. Always read CRITICAL files first")
-    lines.append("# 2. Read IMPORTANT files when working on related features")
-    lines.append("# 3. Only read REFERENCE files when specifically needed")
-    lines.append("# 4. Use PROJECT_INDEX.yaml line numbers to read specific sections, not whole files")
-    lines.append("")
-    
-    return '\n'.join(lines) + '\n'
+    yield "# STRATEGY:"
+    yield "# 1. Always read CRITICAL files first"
+    yield "# 2. Read IMPORTANT files when working on related features"
+    yield "# 3. Only read REFERENCE files when specifically needed"
+    yield "# 4. Use PROJECT_INDEX.yaml line numbers to read specific sections, not whole files"
+    yield ""
+
+
+generate_context_budget_yaml = _joined(emit_context_budget_yaml)
 
 
+@profiled('generate')
 def generate_protocol_yaml():
     """
     Genera PROTOCOL.yaml — reglas de comportamiento para agentes IA.
@@ -1120,6 +1169,7 @@ context_check: |
 """
 
 
+@profiled('generate')
 def generate_ai_instructions(project_path, languages, frameworks, files_map, functions, endpoints, components):
     """
     Genera AI_INSTRUCTIONS.yaml — instrucciones dinámicas para agentes IA.
@@ -1603,6 +1653,7 @@ def _parse_yaml_sections(content):
     return sections, order
 
 
+@profiled('generate')
 def merge_ai_instructions(ai_dir, new_instructions):
     """
     Hace merge inteligente de AI_INSTRUCTIONS.yaml preservando consideraciones antiguas.
@@ -1814,6 +1865,7 @@ custom_considerations:
 # NEW v5.0 GENERATORS
 # ============================================================================
 
+@profiled('generate')
 def generate_context_anchor_yaml(project_name, languages, frameworks, functions, 
                                   endpoints, components, files_map):
     """
@@ -1865,7 +1917,8 @@ def generate_context_anchor_yaml(project_name, languages, frameworks, functions,
     return '\n'.join(lines)
 
 
-def generate_call_graph_yaml(call_graph):
+@profiled('generate')
+def emit_call_graph_yaml(call_graph):
     """
     Genera CALL_GRAPH.yaml — grafo de llamadas entre funciones.
     Muestra qué funciones llaman a qué otras y quién las llama.
@@ -1875,68 +1928,68 @@ def generate_call_graph_yaml(call_graph):
     calls = call_graph.get('calls', {})
     called_by = call_graph.get('called_by', {})
     
-    lines = []
-    lines.append("# CALL GRAPH - Function call relationships")
-    lines.append(f"# Generated: {today}")
-    lines.append("# Shows who calls whom across the codebase")
-    lines.append("")
-    lines.append(f"statistics:")
-    lines.append(f"  functions_making_calls: {len(calls)}")
-    lines.append(f"  functions_being_called: {len(called_by)}")
-    lines.append("")
+    yield "# CALL GRAPH - Function call relationships"
+    yield f"# Generated: {today}"
+    yield "# Shows who calls whom across the codebase"
+    yield ""
+    yield f"statistics:"
+    yield f"  functions_making_calls: {len(calls)}"
+    yield f"  functions_being_called: {len(called_by)}"
+    yield ""
     
     if calls:
-        lines.append("# CALLS: function → [functions it calls]")
-        lines.append("calls:")
+        yield "# CALLS: function → [functions it calls]"
+        yield "calls:"
         for caller in sorted(calls.keys()):
             callees = calls[caller]
             if len(callees) <= 3:
-                lines.append(f"  \"{caller}\": [{', '.join(callees)}]")
+                yield f"  \"{caller}\": [{', '.join(callees)}]"
             else:
-                lines.append(f"  \"{caller}\":")
+                yield f"  \"{caller}\":"
                 for callee in callees:
-                    lines.append(f"    - {callee}")
-        lines.append("")
+                    yield f"    - {callee}"
+        yield ""
     
     if called_by:
-        lines.append("# CALLED_BY: function → [functions that call it]")
-        lines.append("# Use this to find impact of changing a function")
-        lines.append("called_by:")
+        yield "# CALLED_BY: function → [functions that call it]"
+        yield "# Use this to find impact of changing a function"
+        yield "called_by:"
         # Mostrar solo las más referenciadas (top 50)
         sorted_by_refs = sorted(called_by.items(), key=lambda x: len(x[1]), reverse=True)
         for callee, callers in sorted_by_refs[:50]:
             if len(callers) <= 3:
-                lines.append(f"  \"{callee}\": [{', '.join(callers)}]")
+                yield f"  \"{callee}\": [{', '.join(callers)}]"
             else:
-                lines.append(f"  \"{callee}\": # {len(callers)} callers")
+                yield f"  \"{callee}\": # {len(callers)} callers"
                 for caller in callers[:10]:
-                    lines.append(f"    - {caller}")
+                    yield f"    - {caller}"
                 if len(callers) > 10:
-                    lines.append(f"    # ... +{len(callers) - 10} more")
-        lines.append("")
+                    yield f"    # ... +{len(callers) - 10} more"
+        yield ""
     
-    lines.append("# USAGE:")
-    lines.append("# - Before modifying a function, check called_by to see impact")
-    lines.append("# - To trace execution flow, follow calls chain")
-    lines.append("# - Format: \"filepath::function_name\"")
-    lines.append("")
-    
-    return '\n'.join(lines) + '\n'
+    yield "# USAGE:"
+    yield "# - Before modifying a function, check called_by to see impact"
+    yield "# - To trace execution flow, follow calls chain"
+    yield "# - Format: \"filepath::function_name\""
+    yield ""
+
+
+generate_call_graph_yaml = _joined(emit_call_graph_yaml)
 
 
-def generate_types_yaml(types):
+@profiled('generate')
+def emit_types_yaml(types):
     """
     Genera TYPES.yaml — índice de tipos, interfaces, modelos y sus campos.
     """
     today = datetime.date.today().isoformat()
     
-    lines = []
-    lines.append("# TYPES - Data Models, Interfaces, and Structs")
-    lines.append(f"# Generated: {today}")
-    lines.append("# All type definitions with their fields for quick reference")
-    lines.append("")
-    lines.append(f"total_types: {len(types)}")
-    lines.append("")
+    yield "# TYPES - Data Models, Interfaces, and Structs"
+    yield f"# Generated: {today}"
+    yield "# All type definitions with their fields for quick reference"
+    yield ""
+    yield f"total_types: {len(types)}"
+    yield ""
     
     if types:
         # Agrupar por kind
@@ -1948,42 +2001,43 @@ def generate_types_yaml(types):
             by_kind[kind][name] = info
         
         for kind in sorted(by_kind.keys()):
-            lines.append(f"# --- {kind.upper()} ---")
-            lines.append(f"{kind}:")
+            yield f"# --- {kind.upper()} ---"
+            yield f"{kind}:"
             for name in sorted(by_kind[kind].keys()):
                 info = by_kind[kind][name]
-                lines.append(f"  {name}:")
-                lines.append(f"    file: {info['file']}")
-                lines.append(f"    line: {info['line']}")
+                yield f"  {name}:"
+                yield f"    file: {info['file']}"
+                yield f"    line: {info['line']}"
                 if info.get('extends'):
-                    lines.append(f"    extends: [{', '.join(info['extends'])}]")
+                    yield f"    extends: [{', '.join(info['extends'])}]"
                 if info.get('fields'):
-                    lines.append(f"    fields:")
+                    yield f"    fields:"
                     for field in info['fields'][:20]:  # Max 20 fields
-                        lines.append(f"      - {{name: {field['name']}, type: \"{field['type']}\"}}")
+                        yield f"      - {{name: {field['name']}, type: \"{field['type']}\"}}"
                     if len(info['fields']) > 20:
-                        lines.append(f"      # ... +{len(info['fields']) - 20} more fields")
-            lines.append("")
-    
-    lines.append("# USAGE: Check field names/types before making API calls or creating instances")
-    lines.append("")
+                        yield f"      # ... +{len(info['fields']) - 20} more fields"
+            yield ""
     
-    return '\n'.join(lines) + '\n'
+    yield "# USAGE: Check field names/types before making API calls or creating instances"
+    yield ""
+
+
+generate_types_yaml = _joined(emit_types_yaml)
 
 
-def generate_docstrings_yaml(docstrings):
+@profiled('generate')
+def emit_docstrings_yaml(docstrings):
     """
     Genera DOCSTRINGS.yaml — documentación inline enriquecida por función.
     """
     today = datetime.date.today().isoformat()
     
-    lines = []
-    lines.append("# DOCSTRINGS - Function Documentation Index")
-    lines.append(f"# Generated: {today}")
-    lines.append("# Documented functions with params and return types")
-    lines.append("")
-    lines.append(f"documented_functions: {len(docstrings)}")
-    lines.append("")
+    yield "# DOCSTRINGS - Function Documentation Index"
+    yield f"# Generated: {today}"
+    yield "# Documented functions with params and return types"
+    yield ""
+    yield f"documented_functions: {len(docstrings)}"
+    yield ""
     
     if docstrings:
         # Agrupar por archivo
@@ -1994,32 +2048,34 @@ def generate_docstrings_yaml(docstrings):
                 by_file[fpath] = {}
             by_file[fpath][func_key] = info
         
-        lines.append("functions:")
+        yield "functions:"
         for fpath in sorted(by_file.keys()):
-            lines.append(f"  # --- {fpath} ---")
+            yield f"  # --- {fpath} ---"
             for func_key in sorted(by_file[fpath].keys()):
                 info = by_file[fpath][func_key]
                 fname = func_key.split('::')[1] if '::' in func_key else func_key
-                lines.append(f"  \"{fname}\":")
-                lines.append(f"    file: {info['file']}")
-                lines.append(f"    line: {info['line']}")
-                lines.append(f"    desc: \"{info['description']}\"")
+                yield f"  \"{fname}\":"
+                yield f"    file: {info['file']}"
+                yield f"    line: {info['line']}"
+                yield f"    desc: \"{info['description']}\""
                 if info.get('params'):
-                    lines.append(f"    params:")
+                    yield f"    params:"
                     for p in info['params']:
-                        lines.append(f"      - {{name: {p['name']}, type: \"{p.get('type', '')}\", desc: \"{p.get('desc', '')}\"}}")
+                        yield f"      - {{name: {p['name']}, type: \"{p.get('type', '')}\", desc: \"{p.get('desc', '')}\"}}"
                 if info.get('returns'):
                     ret = info['returns']
-                    lines.append(f"    returns: {{type: \"{ret.get('type', '')}\", desc: \"{ret.get('desc', '')}\"}}")
-            lines.append("")
-    
-    lines.append("# USAGE: Check function signatures before calling them")
-    lines.append("")
+                    yield f"    returns: {{type: \"{ret.get('type', '')}\", desc: \"{ret.get('desc', '')}\"}}"
+            yield ""
     
-    return '\n'.join(lines) + '\n'
+    yield "# USAGE: Check function signatures before calling them"
+    yield ""
+
 
+generate_docstrings_yaml = _joined(emit_docstrings_yaml)
 
-def generate_config_map_yaml(config_map):
+
+@profiled('generate')
+def emit_config_map_yaml(config_map):
     """
     Genera CONFIG_MAP.yaml — mapa de variables de entorno y configuración.
     """
@@ -2028,52 +2084,57 @@ def generate_config_map_yaml(config_map):
     env_vars = config_map.get('env_vars', [])
     config_files = config_map.get('config_files', [])
     
-    lines = []
-    lines.append("# CONFIG MAP - Environment Variables and Configuration")
-    lines.append(f"# Generated: {today}")
-    lines.append("# All configuration points in the project")
-    lines.append("")
+    yield "# CONFIG MAP - Environment Variables and Configuration"
+    yield f"# Generated: {today}"
+    yield "# All configuration points in the project"
+    yield ""
     
     if env_vars:
-        lines.append(f"# {len(env_vars)} environment variables found")
-        lines.append("env_vars:")
+        yield f"# {len(env_vars)} environment variables found"
+        yield "env_vars:"
         for var in sorted(env_vars, key=lambda x: x['name']):
             default_str = f", default: \"{var['default']}\"" if var.get('default') else ""
-            lines.append(f"  - {{name: {var['name']}, file: {var['file']}, line: {var['line']}{default_str}}}")
-        lines.append("")
+            yield f"  - {{name: {var['name']}, file: {var['file']}, line: {var['line']}{default_str}}}"
+        yield ""
     
     if config_files:
-        lines.append(f"# {len(config_files)} configuration files found")
-        lines.append("config_files:")
+        yield f"# {len(config_files)} configuration files found"
+        yield "config_files:"
         for cf in config_files:
-            lines.append(f"  - {{path: \"{cf['path']}\", type: {cf['type']}}}")
-        lines.append("")
+            yield f"  - {{path: \"{cf['path']}\", type: {cf['type']}}}"
+        yield ""
     
     if not env_vars and not config_files:
-        lines.append("# No configuration points detected")
-        lines.append("")
-    
-    lines.append("# USAGE: Check required env vars before deployment or setup")
-    lines.append("")
+        yield "# No configuration points detected"
+        yield ""
     
-    return '\n'.join(lines) + '\n'
+    yield "# USAGE: Check required env vars before deployment or setup"
+    yield ""
 
 
-def generate_entry_points_yaml(files_map, functions, endpoints, components, dependencies, call_graph):
+generate_config_map_yaml = _joined(emit_config_map_yaml)
+
+
+@profiled('generate')
+def emit_entry_points_yaml(files_map, functions, endpoints, components, dependencies, call_graph,
+                           file_index=None):
     """
     Genera ENTRY_POINTS.yaml — tour del proyecto con boot sequence, 
     request lifecycle y orden de lectura óptimo.
+    
+    file_index: índices inversos de build_file_index() (se construyen si no se pasan)
     """
     today = datetime.date.today().isoformat()
+    if file_index is None:
+        file_index = build_file_index(endpoints, components)
     
-    lines = []
-    lines.append("# ENTRY POINTS - Project Navigation Guide")
-    lines.append(f"# Generated: {today}")
-    lines.append("# Optimal reading order and key abstractions")
-    lines.append("")
+    yield "# ENTRY POINTS - Project Navigation Guide"
+    yield f"# Generated: {today}"
+    yield "# Optimal reading order and key abstractions"
+    yield ""
     
     # Boot sequence
-    lines.append("boot_sequence:")
+    yield "boot_sequence:"
     entry_files = []
     for fpath in files_map:
         basename = os.path.basename(fpath).lower()
@@ -2082,33 +2143,33 @@ def generate_entry_points_yaml(files_map, functions, endpoints, components, depe
                        'main.rs', 'program.cs', 'main.java'):
             entry_files.append(fpath)
     for i, ef in enumerate(sorted(entry_files), 1):
-        lines.append(f"  {i}: {ef}")
+        yield f"  {i}: {ef}"
     if not entry_files:
-        lines.append("  1: # No standard entry points detected — check ARCHITECTURE.yaml")
-    lines.append("")
+        yield "  1: # No standard entry points detected — check ARCHITECTURE.yaml"
+    yield ""
     
     # Request lifecycle (for web apps)
     if endpoints:
-        lines.append("request_lifecycle:")
-        lines.append("  1_receive: \"HTTP request arrives at server\"")
-        lines.append("  2_route: \"Router matches URL pattern (see endpoints in PROJECT_INDEX.yaml)\"")
-        lines.append("  3_handler: \"Handler function processes request\"")
-        lines.append("  4_response: \"Response returned to client\"")
-        lines.append("")
+        yield "request_lifecycle:"
+        yield "  1_receive: \"HTTP request arrives at server\""
+        yield "  2_route: \"Router matches URL pattern (see endpoints in PROJECT_INDEX.yaml)\""
+        yield "  3_handler: \"Handler function processes request\""
+        yield "  4_response: \"Response returned to client\""
+        yield ""
     
     # Key abstractions — functions with most callers
     called_by = call_graph.get('called_by', {}) if call_graph else {}
     if called_by:
-        lines.append("key_abstractions:")
-        lines.append("  # Functions referenced most by other functions")
+        yield "key_abstractions:"
+        yield "  # Functions referenced most by other functions"
         sorted_by_refs = sorted(called_by.items(), key=lambda x: len(x[1]), reverse=True)
         for func_key, callers in sorted_by_refs[:10]:
-            lines.append(f"  - \"{func_key}\": {len(callers)} references")
-        lines.append("")
+            yield f"  - \"{func_key}\": {len(callers)} references"
+        yield ""
     
     # Optimal read order
-    lines.append("read_order:")
-    lines.append("  # Recommended sequence for a new agent to understand the project")
+    yield "read_order:"
+    yield "  # Recommended sequence for a new agent to understand the project"
     
     # 1. Entry points
     read_order = []
@@ -2122,93 +2183,97 @@ def generate_entry_points_yaml(files_map, functions, endpoints, components, depe
             if fpath not in read_order:
                 read_order.append(fpath)
     
-    # 3. Files with endpoints
-    if endpoints:
-        for ep in endpoints.values():
-            if ep['file'] not in read_order:
-                read_order.append(ep['file'])
+    # 3. Files with endpoints (en orden de primera ruta; solo se muestran 10)
+    for fpath in file_index['endpoints']:
+        if len(read_order) >= 10:
+            break
+        if fpath not in read_order:
+            read_order.append(fpath)
     
     for i, fpath in enumerate(read_order[:10], 1):
-        lines.append(f"  {i}: {fpath}")
-    lines.append("")
-    
-    return '\n'.join(lines) + '\n'
+        yield f"  {i}: {fpath}"
+    yield ""
+
 
+generate_entry_points_yaml = _joined(emit_entry_points_yaml)
 
-def generate_patterns_yaml(patterns):
+
+@profiled('generate')
+def emit_patterns_yaml(patterns):
     """
     Genera PATTERNS.yaml — patrones de diseño y convenciones detectadas.
     """
     today = datetime.date.today().isoformat()
     
-    lines = []
-    lines.append("# PATTERNS - Design Patterns and Conventions Detected")
-    lines.append(f"# Generated: {today}")
-    lines.append("# Follow these patterns when modifying or extending the codebase")
-    lines.append("")
+    yield "# PATTERNS - Design Patterns and Conventions Detected"
+    yield f"# Generated: {today}"
+    yield "# Follow these patterns when modifying or extending the codebase"
+    yield ""
     
     # Naming conventions
     naming = patterns.get('naming', {})
-    lines.append("naming_convention:")
-    lines.append(f"  dominant_style: {naming.get('style', 'unknown')}")
+    yield "naming_convention:"
+    yield f"  dominant_style: {naming.get('style', 'unknown')}"
     samples = naming.get('samples', {})
     if samples:
         for style, count in samples.items():
-            lines.append(f"  {style}: {count} occurrences")
-    lines.append("")
+            yield f"  {style}: {count} occurrences"
+    yield ""
     
     # Design patterns
     dp = patterns.get('design_patterns', [])
     if dp:
-        lines.append("design_patterns:")
+        yield "design_patterns:"
         for p in dp:
-            lines.append(f"  - {p}")
-        lines.append("")
+            yield f"  - {p}"
+        yield ""
     
     # Middleware
     mw = patterns.get('middleware', [])
     if mw:
-        lines.append("middleware:")
+        yield "middleware:"
         for m in mw[:20]:
             name = m.get('name', m.get('type', 'unknown'))
-            lines.append(f"  - {{type: {m['type']}, name: \"{name}\", file: {m['file']}, line: {m['line']}}}")
-        lines.append("")
+            yield f"  - {{type: {m['type']}, name: \"{name}\", file: {m['file']}, line: {m['line']}}}"
+        yield ""
     
     # Decorators
     decorators = patterns.get('decorators', {})
     if decorators:
-        lines.append("decorators_used:")
+        yield "decorators_used:"
         for dec, count in decorators.items():
-            lines.append(f"  {dec}: {count}")
-        lines.append("")
+            yield f"  {dec}: {count}"
+        yield ""
     
     # Auth
     auth = patterns.get('auth', [])
     if auth:
-        lines.append("auth_patterns:")
+        yield "auth_patterns:"
         for a in auth:
-            lines.append(f"  - {a}")
-        lines.append("")
+            yield f"  - {a}"
+        yield ""
     
     # Error handling
     eh = patterns.get('error_handling', {})
-    lines.append("error_handling:")
-    lines.append(f"  strategy: {eh.get('strategy', 'unknown')}")
+    yield "error_handling:"
+    yield f"  strategy: {eh.get('strategy', 'unknown')}"
     custom_exc = eh.get('custom_exceptions', [])
     if custom_exc:
-        lines.append("  custom_exceptions:")
+        yield "  custom_exceptions:"
         for exc in custom_exc:
-            lines.append(f"    - {exc}")
-    lines.append("")
-    
-    lines.append("# USAGE: Follow these patterns when writing new code to maintain consistency")
-    lines.append("")
+            yield f"    - {exc}"
+    yield ""
     
-    return '\n'.join(lines) + '\n'
+    yield "# USAGE: Follow these patterns when writing new code to maintain consistency"
+    yield ""
+
+
+generate_patterns_yaml = _joined(emit_patterns_yaml)
 
 
-def generate_quick_context_yaml(project_name, languages, frameworks, functions, 
-                                 endpoints, components, files_map, config_map=None):
+@profiled('generate')
+def emit_quick_context_yaml(project_name, languages, frameworks, functions, 
+                             endpoints, components, files_map, config_map=None):
     """
     Genera QUICK_CONTEXT.yaml — respuestas pre-calculadas para tareas comunes.
     Permite que un agente sepa inmediatamente cómo agregar un endpoint,
@@ -2222,51 +2287,50 @@ def generate_quick_context_yaml(project_name, languages, frameworks, functions,
     has_js = any(l in languages for l in ['JavaScript', 'TypeScript'])
     has_php = 'PHP' in languages
     
-    lines = []
-    lines.append(f"# QUICK CONTEXT - Pre-computed Guidance for {project_name}")
-    lines.append(f"# Generated: {today}")
-    lines.append("# Check here FIRST before exploring code for common tasks")
-    lines.append("")
+    yield f"# QUICK CONTEXT - Pre-computed Guidance for {project_name}"
+    yield f"# Generated: {today}"
+    yield "# Check here FIRST before exploring code for common tasks"
+    yield ""
     
     # --- Add endpoint ---
-    lines.append("add_endpoint:")
+    yield "add_endpoint:"
     if endpoints:
         # Find example endpoint
         first_ep = next(iter(endpoints.values()))
-        lines.append(f"  example_file: \"{first_ep['file']}\"")
-        lines.append(f"  example_line: {first_ep['line']}")
-        lines.append(f"  example_handler: \"{first_ep['handler']}\"")
+        yield f"  example_file: \"{first_ep['file']}\""
+        yield f"  example_line: {first_ep['line']}"
+        yield f"  example_handler: \"{first_ep['handler']}\""
     
     if any('flask' in f.lower() for f in backend_fw):
-        lines.append("  pattern: |")
-        lines.append("    @app.route('/your-route', methods=['GET'])")
-        lines.append("    def your_handler():")
-        lines.append("        return jsonify(result)")
+        yield "  pattern: |"
+        yield "    @app.route('/your-route', methods=['GET'])"
+        yield "    def your_handler():"
+        yield "        return jsonify(result)"
     elif any('fastapi' in f.lower() for f in backend_fw):
-        lines.append("  pattern: |")
-        lines.append("    @app.get('/your-route')")
-        lines.append("    async def your_handler():")
-        lines.append("        return {\"result\": data}")
+        yield "  pattern: |"
+        yield "    @app.get('/your-route')"
+        yield "    async def your_handler():"
+        yield "        return {\"result\": data}"
     elif any('express' in f.lower() for f in backend_fw):
-        lines.append("  pattern: |")
-        lines.append("    router.get('/your-route', async (req, res) => {")
-        lines.append("      res.json(result);")
-        lines.append("    });")
+        yield "  pattern: |"
+        yield "    router.get('/your-route', async (req, res) => {"
+        yield "      res.json(result);"
+        yield "    });"
     elif any('django' in f.lower() for f in backend_fw):
-        lines.append("  pattern: |")
-        lines.append("    # In urls.py: path('your-route/', views.your_view)")
-        lines.append("    # In views.py:")
-        lines.append("    def your_view(request):")
-        lines.append("        return JsonResponse(result)")
+        yield "  pattern: |"
+        yield "    # In urls.py: path('your-route/', views.your_view)"
+        yield "    # In views.py:"
+        yield "    def your_view(request):"
+        yield "        return JsonResponse(result)"
     elif any('laravel' in f.lower() for f in backend_fw):
-        lines.append("  pattern: |")
-        lines.append("    Route::get('/your-route', [YourController::class, 'method']);")
+        yield "  pattern: |"
+        yield "    Route::get('/your-route', [YourController::class, 'method']);"
     else:
-        lines.append("  pattern: \"See existing endpoints in PROJECT_INDEX.yaml\"")
-    lines.append("")
+        yield "  pattern: \"See existing endpoints in PROJECT_INDEX.yaml\""
+    yield ""
     
     # --- Add test ---
-    lines.append("add_test:")
+    yield "add_test:"
     test_dirs = []
     for fpath in files_map:
         if 'test' in fpath.lower():
@@ -2274,81 +2338,82 @@ def generate_quick_context_yaml(project_name, languages, frameworks, functions,
             if dir_name and dir_name not in test_dirs:
                 test_dirs.append(dir_name)
     if test_dirs:
-        lines.append(f"  directory: \"{test_dirs[0]}\"")
+        yield f"  directory: \"{test_dirs[0]}\""
     
     if has_python:
-        lines.append("  command: \"pytest tests/ -v\"")
-        lines.append("  pattern: |")
-        lines.append("    def test_your_feature():")
-        lines.append("        result = your_function()")
-        lines.append("        assert result == expected")
+        yield "  command: \"pytest tests/ -v\""
+        yield "  pattern: |"
+        yield "    def test_your_feature():"
+        yield "        result = your_function()"
+        yield "        assert result == expected"
     elif has_js:
-        lines.append("  command: \"npm test\"")
-        lines.append("  pattern: |")
-        lines.append("    describe('Feature', () => {")
-        lines.append("      test('should work', () => {")
-        lines.append("        expect(result).toBe(expected);")
-        lines.append("      });")
-        lines.append("    });")
+        yield "  command: \"npm test\""
+        yield "  pattern: |"
+        yield "    describe('Feature', () => {"
+        yield "      test('should work', () => {"
+        yield "        expect(result).toBe(expected);"
+        yield "      });"
+        yield "    });"
     elif has_php:
-        lines.append("  command: \"vendor/bin/phpunit\"")
-        lines.append("  pattern: |")
-        lines.append("    public function test_your_feature(): void {")
-        lines.append("        $this->assertEquals($expected, $result);")
-        lines.append("    }")
-    lines.append("")
+        yield "  command: \"vendor/bin/phpunit\""
+        yield "  pattern: |"
+        yield "    public function test_your_feature(): void {"
+        yield "        $this->assertEquals($expected, $result);"
+        yield "    }"
+    yield ""
     
     # --- Add dependency ---
-    lines.append("add_dependency:")
+    yield "add_dependency:"
     if has_python:
-        lines.append("  file: \"requirements.txt\"")
-        lines.append("  command: \"pip install <package>\"")
+        yield "  file: \"requirements.txt\""
+        yield "  command: \"pip install <package>\""
     elif has_js:
-        lines.append("  file: \"package.json\"")
-        lines.append("  command: \"npm install <package>\"")
+        yield "  file: \"package.json\""
+        yield "  command: \"npm install <package>\""
     elif has_php:
-        lines.append("  file: \"composer.json\"")
-        lines.append("  command: \"composer require <package>\"")
-    lines.append("")
+        yield "  file: \"composer.json\""
+        yield "  command: \"composer require <package>\""
+    yield ""
     
     # --- Add component ---
     if components or frontend_fw:
-        lines.append("add_component:")
+        yield "add_component:"
         comp_dirs = set()
         for comp in components.values():
             comp_dir = os.path.dirname(comp['file'])
             if comp_dir:
                 comp_dirs.add(comp_dir)
         if comp_dirs:
-            lines.append(f"  directory: \"{sorted(comp_dirs)[0]}\"")
+            yield f"  directory: \"{sorted(comp_dirs)[0]}\""
         
         if any('react' in f.lower() for f in frontend_fw):
-            lines.append("  pattern: |")
-            lines.append("    export default function YourComponent({ props }) {")
-            lines.append("      return <div>content</div>;")
-            lines.append("    }")
+            yield "  pattern: |"
+            yield "    export default function YourComponent({ props }) {"
+            yield "      return <div>content</div>;"
+            yield "    }"
         elif any('vue' in f.lower() for f in frontend_fw):
-            lines.append("  pattern: |")
-            lines.append("    <template><div>content</div></template>")
-            lines.append("    <script setup>")
-            lines.append("    const props = defineProps(['prop1'])")
-            lines.append("    </script>")
-        lines.append("")
+            yield "  pattern: |"
+            yield "    <template><div>content</div></template>"
+            yield "    <script setup>"
+            yield "    const props = defineProps(['prop1'])"
+            yield "    </script>"
+        yield ""
     
     # --- Fix bug ---
-    lines.append("fix_bug:")
-    lines.append("  steps:")
-    lines.append("    1: \"Check ERRORS.yaml for known issues\"")
-    lines.append("    2: \"Check CALL_GRAPH.yaml to trace the function\"")
-    lines.append("    3: \"Check CHANGES.yaml for recently modified files\"")
-    lines.append("    4: \"Use PROJECT_INDEX.yaml to find the function by name\"")
-    lines.append("    5: \"Read only the relevant lines, not the full file\"")
-    lines.append("")
+    yield "fix_bug:"
+    yield "  steps:"
+    yield "    1: \"Check ERRORS.yaml for known issues\""
+    yield "    2: \"Check CALL_GRAPH.yaml to trace the function\""
+    yield "    3: \"Check CHANGES.yaml for recently modified files\""
+    yield "    4: \"Use PROJECT_INDEX.yaml to find the function by name\""
+    yield "    5: \"Read only the relevant lines, not the full file\""
+    yield ""
     
     # --- Update indexes ---
-    lines.append("update_indexes:")
-    lines.append("  command: \"python .ai/update_index.py\"")
-    lines.append("  when: \"After any code modification\"")
-    lines.append("")
-    
-    return '\n'.join(lines) + '\n'
\ No newline at end of file
+    yield "update_indexes:"
+    yield "  command: \"python .ai/update_index.py\""
+    yield "  when: \"After any code modification\""
+    yield ""
+
+
+generate_quick_context_yaml = _joined(emit_quick_context_yaml)
\ No newline at end of file
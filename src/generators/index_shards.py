@@ -0,0 +1,264 @@
+"""
+PROJECT_INDEX fragmentado para repositorios grandes.
+
+Con SHARDED_INDEX_MIN_FILES archivos o más, PROJECT_INDEX.yaml pasa a ser un
+manifiesto pequeño (meta y lista de shards) y el detalle (files, functions,
+endpoints, components, dependencies) se reparte en .ai/index/, un shard por
+directorio. Un directorio con más de SHARD_MAX_FILES archivos se divide: sus
+subdirectorios tienen su propio shard y sus archivos directos otro.
+
+Cada shard guarda la huella de sus datos en el encabezado: si el subárbol no
+cambió, el shard ni se genera ni se toca. Los shards de directorios que ya no
+existen se eliminan.
+"""
+
+import os
+import json
+import hashlib
+from urllib.parse import quote
+
+try:
+    from utils.warnings import warn, vprint
+    from utils.profiler import profiled
+except ImportError:
+    def warn(msg, ctx=""): pass
+    def vprint(msg, level=1): pass
+    def profiled(kind, name=None, items=None): return lambda func: func
+
+from utils.files import write_lines_if_changed
+from .all_generators import emit_index_header, emit_index_sections
+
+# Desde este número de archivos PROJECT_INDEX.yaml se fragmenta en .ai/index/
+SHARDED_INDEX_MIN_FILES = 5000
+
+# Máximo de archivos por shard antes de dividir el directorio en subdirectorios
+SHARD_MAX_FILES = 500
+
+# Subdirectorio de .ai/ con los shards
+SHARDS_DIR = 'index'
+
+# Incrementar cuando cambie el formato de los shards (fuerza regenerarlos)
+SHARD_FORMAT_VERSION = 2
+
+_ROOT = '.'
+_DIGEST_PREFIX = '# DIGEST: '
+
+
+def plan_shards(paths, max_files=SHARD_MAX_FILES):
+    """
+    Reparte los archivos del proyecto en shards por directorio.
+
+    Un directorio (con sus subdirectorios) es un shard si tiene hasta
+    max_files archivos. Si tiene más, se divide: un shard con sus archivos
+    directos (scope 'files') y el reparto recursivo de cada subdirectorio. Un
+    directorio sin subdirectorios no se divide aunque supere el máximo.
+
+    Args:
+        paths: Rutas relativas de los archivos (claves de files_map)
+        max_files: Máximo de archivos por shard
+
+    Returns:
+        Lista [(directorio, scope, [archivos])] ordenada por directorio;
+        scope es 'subtree' (incluye subdirectorios) o 'files' (solo directos).
+        Los directorios usan '/' en cualquier sistema; la raíz del proyecto es '.'
+    """
+    shards = []
+    pending = [(_ROOT, 0, list(paths))]
+    while pending:
+        directory, depth, files = pending.pop()
+        if len(files) <= max_files:
+            shards.append((directory, 'subtree', files))
+            continue
+        direct, children = [], {}
+        for path in files:
+            parts = path.replace(os.sep, '/').split('/')
+            if len(parts) == depth + 1:
+                direct.append(path)
+            else:
+                children.setdefault('/'.join(parts[:depth + 1]), []).append(path)
+        if not children:
+            shards.append((directory, 'subtree', files))
+            continue
+        if direct:
+            shards.append((directory, 'files', direct))
+        pending.extend((child, depth + 1, child_files) for child, child_files in children.items())
+    shards.sort(key=lambda shard: () if shard[0] == _ROOT else tuple(shard[0].split('/')))
+    return shards
+
+
+def _shard_filename(directory):
+    """
+    Nombre de archivo del shard de un directorio (con '/', como en plan_shards).
+
+    Codificación por porcentajes, también del punto: 'src/api' -> 'src%2Fapi.yaml',
+    la raíz -> '%2E.yaml'. Es inyectiva, así que el nombre de un shard depende solo
+    de su directorio y no cambia al aparecer o desaparecer otros.
+    """
+    return quote(directory, safe='').replace('.', '%2E') + '.yaml'
+
+
+def _shard_data(files, files_map, results):
+    """Sub-dicts del proyecto con solo los datos de los archivos del shard"""
+    functions, dependencies = results['functions'], results['dependencies']
+    file_index = results['file_index']
+    endpoints, components = {}, {}
+    for path in files:
+        for key in file_index['endpoints'].get(path, ()):
+            endpoints[key] = results['endpoints'][key]
+        for name in file_index['components'].get(path, ()):
+            components[name] = results['components'][name]
+    return {
+        'files_map': {path: files_map[path] for path in files},
+        'functions': {path: functions[path] for path in files if path in functions},
+        'endpoints': endpoints,
+        'components': components,
+        'dependencies': {path: dependencies[path] for path in files if path in dependencies},
+    }
+
+
+def _shard_digest(directory, scope, data):
+    """Huella de todo lo que se escribe en un shard (sin fecha: no cambia si el subárbol no cambia)"""
+    files = {path: [info.get('type'), info.get('lines')] for path, info in data['files_map'].items()}
+    payload = json.dumps([
+        SHARD_FORMAT_VERSION, directory, scope, files, data['functions'],
+        data['endpoints'], data['components'], data['dependencies'],
+    ], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _stored_digest(path):
+    """Huella guardada en el encabezado de un shard existente (None si no existe)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for _ in range(5):
+                line = f.readline()
+                if line.startswith(_DIGEST_PREFIX):
+                    return line[len(_DIGEST_PREFIX):].strip()
+    except (IOError, OSError, UnicodeDecodeError):
+        pass
+    return None
+
+
+def emit_index_shard(directory, scope, digest, data):
+    """Genera un shard de .ai/index/ (mismas secciones que PROJECT_INDEX.yaml, solo de su directorio)"""
+    covers = "subdirectorios incluidos" if scope == 'subtree' else "solo archivos directos"
+    yield "# " + "=" * 76
+    yield f"# AI PROJECT INDEX - SHARD {directory} ({covers})"
+    yield f"{_DIGEST_PREFIX}{digest}"
+    yield "# " + "=" * 76
+    yield ""
+    yield "shard:"
+    yield f'  dir: "{directory}"'
+    yield f"  scope: {scope}"
+    yield "  manifest: ../PROJECT_INDEX.yaml"
+    yield ""
+    yield from emit_index_sections(data['files_map'], data['functions'], data['endpoints'],
+                                   data['components'], data['dependencies'])
+
+
+def emit_index_manifest(project_path, project_name, languages, frameworks, shards):
+    """
+    Genera PROJECT_INDEX.yaml en modo fragmentado: meta y lista de shards.
+
+    Args:
+        shards: Lista [(directorio, scope, archivo, {'files', 'functions', 'endpoints'})]
+    """
+    yield from emit_index_header(project_path, project_name, languages, frameworks)
+    totals = {key: sum(counts[key] for *_, counts in shards) for key in ('files', 'functions', 'endpoints')}
+    yield "# " + "=" * 76
+    yield "# SHARDS - índice fragmentado por directorio"
+    yield f"# Lee solo el shard del directorio que necesitas ({SHARDS_DIR}/<archivo>);"
+    yield "# scope files = solo archivos directos (los subdirectorios tienen su propio shard)"
+    yield "# " + "=" * 76
+    yield "index:"
+    yield "  sharded: true"
+    yield f"  dir: {SHARDS_DIR}/"
+    yield f"  shards: {len(shards)}"
+    yield f"  files: {totals['files']}"
+    yield f"  functions: {totals['functions']}"
+    yield f"  endpoints: {totals['endpoints']}"
+    yield ""
+    yield "shards:"
+    for directory, scope, filename, counts in shards:
+        yield (f'  "{directory}": {{file: {SHARDS_DIR}/{filename}, scope: {scope}, '
+               f"files: {counts['files']}, functions: {counts['functions']}, endpoints: {counts['endpoints']}}}")
+    yield ""
+
+
+def prune_shards(ai_dir, keep=()):
+    """
+    Elimina de .ai/index/ los shards que no están en keep (directorios que ya
+    no existen, o todos si el índice dejó de estar fragmentado).
+
+    Returns:
+        Número de shards eliminados
+    """
+    shards_dir = os.path.join(str(ai_dir), SHARDS_DIR)
+    try:
+        existing = os.listdir(shards_dir)
+    except OSError:
+        return 0
+    removed = 0
+    for name in existing:
+        if name.endswith('.yaml') and name not in keep:
+            try:
+                os.remove(os.path.join(shards_dir, name))
+                removed += 1
+            except OSError as e:
+                warn(f"No se pudo eliminar el shard {name}: {e}", "prune_shards")
+    if not keep:
+        try:
+            os.rmdir(shards_dir)
+        except OSError:
+            pass  # no vacío: contiene archivos que no son shards
+    return removed
+
+
+@profiled('generate', items=len)
+def write_sharded_index(ai_dir, project_path, project_name, languages, frameworks, files_map, results,
+                        max_files=None):
+    """
+    Escribe el manifiesto PROJECT_INDEX.yaml y los shards de .ai/index/.
+
+    Solo se generan los shards cuya huella cambió; el resto no se toca.
+
+    Args:
+        ai_dir: Directorio .ai/
+        max_files: Máximo de archivos por shard (default: SHARD_MAX_FILES)
+        (el resto como emit_project_index; results de merge_file_records())
+
+    Returns:
+        Lista [(archivo, True si se reescribió)]: PROJECT_INDEX.yaml y luego
+        cada shard ('index/<archivo>') en orden de directorio
+    """
+    ai_dir = str(ai_dir)
+    shards_dir = os.path.join(ai_dir, SHARDS_DIR)
+    os.makedirs(shards_dir, exist_ok=True)
+
+    plan = plan_shards(files_map, SHARD_MAX_FILES if max_files is None else max_files)
+    manifest, written = [], []
+    for directory, scope, files in plan:
+        filename = _shard_filename(directory)
+        path = os.path.join(shards_dir, filename)
+        data = _shard_data(files, files_map, results)
+        digest = _shard_digest(directory, scope, data)
+        if _stored_digest(path) == digest:
+            changed = False
+        else:
+            changed = write_lines_if_changed(path, emit_index_shard(directory, scope, digest, data))
+        written.append((f"{SHARDS_DIR}/{filename}", changed))
+        manifest.append((directory, scope, filename, {
+            'files': len(files),
+            'functions': sum(len(funcs) for funcs in data['functions'].values()),
+            'endpoints': len(data['endpoints']),
+        }))
+
+    removed = prune_shards(ai_dir, keep={_shard_filename(directory) for directory, _, _ in plan})
+    changed = sum(flag for _, flag in written)
+    vprint(f"PROJECT_INDEX: {len(plan)} shards ({changed} actualizados, {removed} eliminados)", level=1)
+
+    index_written = write_lines_if_changed(
+        os.path.join(ai_dir, 'PROJECT_INDEX.yaml'),
+        emit_index_manifest(project_path, project_name, languages, frameworks, manifest)
+    )
+    return [('PROJECT_INDEX.yaml', index_written)] + written
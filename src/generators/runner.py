@@ -0,0 +1,236 @@
+"""
+Etapa de generación: produce todos los archivos de .ai/ (YAML e index.db) a
+partir de las estructuras ya extraídas.
+
+Cada trabajo solo lee esas estructuras y escribe sus propios archivos, así
+que son independientes entre sí. Con jobs > 1 se reparten en un
+ProcessPoolExecutor, los más pesados primero, y cada worker escribe su
+salida apenas termina. El contenido no depende del orden ni del modo, y el
+resultado se reporta siempre en el orden de GENERATION_JOBS.
+
+El pool usa siempre fork: los workers heredan files_map y los resultados
+sin copiarlos. Con spawn/forkserver cada worker recibiría una copia
+serializada completa (memoria pico × jobs), así que donde fork no existe
+(Windows) la generación es en serie.
+"""
+
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    from utils.warnings import get_warnings, extend_warnings, vprint
+    from utils.profiler import (
+        profiled, is_profiling, enable_profiling, disable_profiling, profile_origin, take_stages, merge_stages
+    )
+except ImportError:
+    def get_warnings(): return []
+    def extend_warnings(warnings): pass
+    def vprint(msg, level=1): pass
+    def profiled(kind, name=None, items=None): return lambda func: func
+    def is_profiling(): return False
+    def enable_profiling(trace_memory=False, origin=None): pass
+    def disable_profiling(): pass
+    def profile_origin(): return None
+    def take_stages(): return []
+    def merge_stages(stages): pass
+
+from utils.files import write_if_changed, write_lines_if_changed
+from core.index_db import write_index_db, INDEX_DB_FILE
+from . import index_shards
+from .all_generators import (
+    emit_project_index, generate_all_yamls,
+    emit_architecture_yaml, generate_flow_yaml, emit_graph_yaml,
+    emit_changes_yaml, emit_summaries_yaml,
+    emit_context_budget_yaml, generate_protocol_yaml,
+    generate_ai_instructions, merge_ai_instructions,
+    generate_context_anchor_yaml, emit_call_graph_yaml,
+    emit_types_yaml, emit_docstrings_yaml, emit_config_map_yaml,
+    emit_entry_points_yaml, emit_patterns_yaml, emit_quick_context_yaml
+)
+
+# Con menos archivos, arrancar el pool cuesta más que generar todo en serie
+MIN_PARALLEL_GENERATION_FILES = 1000
+
+# Trabajos más costosos: se envían primero al pool para que no queden al final
+HEAVY_JOBS = (INDEX_DB_FILE, 'PROJECT_INDEX.yaml', 'CALL_GRAPH.yaml', 'SUMMARIES.yaml',
+              'TYPES.yaml', 'ARCHITECTURE.yaml', 'DOCSTRINGS.yaml', 'GRAPH.yaml')
+
+
+def _project_index(ctx, r):
+    """PROJECT_INDEX.yaml completo, o manifiesto y shards en .ai/index/ en proyectos grandes"""
+    if len(ctx['files_map']) >= index_shards.SHARDED_INDEX_MIN_FILES:
+        return index_shards.write_sharded_index(
+            ctx['ai_dir'], ctx['project_path'], ctx['project_name'], ctx['languages'],
+            ctx['frameworks'], ctx['files_map'], r)
+    index_shards.prune_shards(ctx['ai_dir'])
+    return [_write(ctx['ai_dir'], 'PROJECT_INDEX.yaml', emit_project_index(
+        ctx['project_path'], ctx['project_name'], ctx['languages'], ctx['frameworks'],
+        ctx['files_map'], r['functions'], r['endpoints'], r['components'], r['dependencies']))]
+
+
+def _ai_instructions(ctx, r):
+    """AI_INSTRUCTIONS.yaml con merge inteligente para preservar consideraciones"""
+    content = generate_ai_instructions(
+        ctx['project_path'], ctx['languages'], ctx['frameworks'], ctx['files_map'],
+        r['functions'], r['endpoints'], r['components']
+    )
+    return merge_ai_instructions(ctx['ai_dir'], content)
+
+
+# (trabajo, constructor) en orden de salida. El constructor recibe el
+# contexto y los resultados de merge_file_records(), y retorna el contenido
+# (texto o emisor emit_*()), un dict {archivo: contenido} o None si el
+# archivo no aplica. Los trabajos de _WRITERS escriben sus archivos ellos
+# mismos y retornan [(archivo, reescrito)].
+GENERATION_JOBS = (
+    ('PROJECT_INDEX.yaml', None),
+    # CONVENTIONS, TESTING, ERRORS, GIT_WORKFLOW
+    ('project_yamls', lambda ctx, r: generate_all_yamls(
+        ctx['project_name'], ctx['languages'], ctx['frameworks'], ctx['project_path'], ctx['files_map'])),
+    ('ARCHITECTURE.yaml', lambda ctx, r: emit_architecture_yaml(
+        ctx['project_path'], ctx['languages'], ctx['frameworks'], ctx['files_map'],
+        r['functions'], r['dependencies'])),
+    ('FLOW.yaml', lambda ctx, r: generate_flow_yaml()),
+    ('GRAPH.yaml', lambda ctx, r: emit_graph_yaml(
+        r['dependencies'], r['functions'], r['endpoints'], r['components'])),
+    ('CHANGES.yaml', lambda ctx, r: emit_changes_yaml(ctx['project_path'], ctx['files_map'])),
+    ('SUMMARIES.yaml', lambda ctx, r: emit_summaries_yaml(ctx['files_map'], r['functions'])),
+    ('CONTEXT_BUDGET.yaml', lambda ctx, r: emit_context_budget_yaml(
+        ctx['files_map'], r['functions'], r['endpoints'], r['components'], r['file_index'])),
+    ('PROTOCOL.yaml', lambda ctx, r: generate_protocol_yaml()),
+    ('AI_INSTRUCTIONS.yaml', _ai_instructions),
+    ('CONTEXT_ANCHOR.yaml', lambda ctx, r: generate_context_anchor_yaml(
+        ctx['project_name'], ctx['languages'], ctx['frameworks'], r['functions'],
+        r['endpoints'], r['components'], ctx['files_map'])),
+    ('CALL_GRAPH.yaml', lambda ctx, r: emit_call_graph_yaml(r['call_graph'])),
+    ('TYPES.yaml', lambda ctx, r: emit_types_yaml(r['types']) if r['types'] else None),
+    ('DOCSTRINGS.yaml', lambda ctx, r: emit_docstrings_yaml(r['docstrings']) if r['docstrings'] else None),
+    ('CONFIG_MAP.yaml', lambda ctx, r: emit_config_map_yaml(r['config_map'])),
+    ('ENTRY_POINTS.yaml', lambda ctx, r: emit_entry_points_yaml(
+        ctx['files_map'], r['functions'], r['endpoints'], r['components'],
+        r['dependencies'], r['call_graph'], r['file_index'])),
+    ('PATTERNS.yaml', lambda ctx, r: emit_patterns_yaml(r['patterns'])),
+    ('QUICK_CONTEXT.yaml', lambda ctx, r: emit_quick_context_yaml(
+        ctx['project_name'], ctx['languages'], ctx['frameworks'], r['functions'],
+        r['endpoints'], r['components'], ctx['files_map'], r['config_map'])),
+    (INDEX_DB_FILE, None),
+)
+
+_BUILDERS = dict(GENERATION_JOBS)
+
+_WRITERS = {
+    'PROJECT_INDEX.yaml': _project_index,
+    INDEX_DB_FILE: lambda ctx, r: [(INDEX_DB_FILE, write_index_db(ctx['ai_dir'], ctx['files_map'], r))],
+}
+
+# Contexto de generación en cada worker del pool (ver _init_worker)
+_WORKER_CTX = None
+
+
+def _write(ai_dir, filename, content):
+    """Escribe texto o las líneas de un emisor (streaming). Retorna (archivo, reescrito)"""
+    path = os.path.join(ai_dir, filename)
+    if isinstance(content, str):
+        return filename, write_if_changed(path, content)
+    return filename, write_lines_if_changed(path, content)
+
+
+def _run_job(name, ctx):
+    """Ejecuta un trabajo y escribe su salida. Retorna [(archivo, reescrito)]"""
+    results = ctx['results']
+    if name in _WRITERS:
+        return _WRITERS[name](ctx, results)
+    content = _BUILDERS[name](ctx, results)
+    if content is None:
+        return []
+    if isinstance(content, dict):
+        return [_write(ctx['ai_dir'], filename, text) for filename, text in content.items()]
+    return [_write(ctx['ai_dir'], name, content)]
+
+
+def _init_worker(ctx, origin):
+    """Configura un worker del pool: contexto compartido y perfilado (sin tracemalloc)"""
+    global _WORKER_CTX
+    _WORKER_CTX = ctx
+    # Con fork el worker hereda las etapas ya medidas por el proceso principal
+    disable_profiling()
+    if origin is not None:
+        enable_profiling(trace_memory=False, origin=origin)
+
+
+def _run_job_in_worker(name):
+    """_run_job() en un worker: más sus advertencias y etapas medidas (--profile)"""
+    known = len(get_warnings())
+    written = _run_job(name, _WORKER_CTX)
+    stages = take_stages() if is_profiling() else []
+    return written, get_warnings()[known:], stages
+
+
+def _fork_context():
+    """Contexto 'fork' de multiprocessing, o None si la plataforma no lo soporta"""
+    try:
+        return multiprocessing.get_context('fork')
+    except ValueError:
+        return None
+
+
+def _run_parallel(names, ctx, jobs, mp_context):
+    """Ejecuta los trabajos en un ProcessPoolExecutor. Retorna {trabajo: [(archivo, reescrito)]}"""
+    order = sorted(names, key=lambda name: HEAVY_JOBS.index(name) if name in HEAVY_JOBS else len(HEAVY_JOBS))
+    vprint(f"Generando {len(names)} índices con {jobs} procesos", level=1)
+    outputs = {}
+    # Con fork los workers heredan ctx (initargs) sin serializarlo
+    with ProcessPoolExecutor(max_workers=min(jobs, len(names)), mp_context=mp_context, initializer=_init_worker,
+                             initargs=(ctx, profile_origin() if is_profiling() else None)) as executor:
+        futures = {executor.submit(_run_job_in_worker, name): name for name in order}
+        try:
+            for future in as_completed(futures):
+                written, warnings, stages = future.result()
+                outputs[futures[future]] = written
+                extend_warnings(warnings)
+                merge_stages(stages)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    return outputs
+
+
+@profiled('generate', name='generation')
+def run_generation(ai_dir, project_path, project_name, languages, frameworks, files_map, results, jobs=1):
+    """
+    Genera y escribe todos los índices de .ai/ (solo reescribe los que cambian).
+
+    Args:
+        ai_dir: Directorio .ai/ de destino
+        project_path: Ruta del proyecto
+        project_name: Nombre del proyecto
+        languages: Lenguajes detectados
+        frameworks: Frameworks detectados
+        files_map: Dict {filepath: {'type', 'lines', ...}}
+        results: Dict de merge_file_records()
+        jobs: Procesos en paralelo; 1 (o proyectos con menos de
+            MIN_PARALLEL_GENERATION_FILES archivos, o plataformas sin fork)
+            genera todo en serie en este proceso
+
+    Returns:
+        Lista [(archivo, True si se reescribió)] en el orden de GENERATION_JOBS,
+        igual en serie y en paralelo
+    """
+    ctx = {
+        'ai_dir': str(ai_dir),
+        'project_path': str(project_path),
+        'project_name': project_name,
+        'languages': languages,
+        'frameworks': frameworks,
+        'files_map': files_map,
+        'results': results,
+    }
+    names = [name for name, _ in GENERATION_JOBS]
+    mp_context = _fork_context() if jobs > 1 and len(files_map) >= MIN_PARALLEL_GENERATION_FILES else None
+    if mp_context is None:
+        outputs = {name: _run_job(name, ctx) for name in names}
+    else:
+        outputs = _run_parallel(names, ctx, jobs, mp_context)
+    return [entry for name in names for entry in outputs[name]]
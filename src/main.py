@@ -14,25 +14,16 @@ src_dir = os.path.dirname(os.path.abspath(__file__))
 if src_dir not in sys.path:
     sys.path.insert(0, src_dir)
 
-from core.scanner import scan_files, iter_source_files
+from core.scanner import build_manifest
 from core.detectors import detect_languages, detect_frameworks
-from core.extractors import (
-    extract_functions, extract_endpoints, extract_vue_components, extract_dependencies,
-    extract_call_graph, extract_types_and_models, extract_docstrings,
-    extract_config_map, extract_patterns
-)
+from core.extractors import merge_file_records
+from core.cache import new_cache, save_cache, scan_incremental, default_jobs
 from core.validators import validate_environment
-from generators.all_generators import (
-    generate_project_index, generate_all_yamls,
-    generate_architecture_yaml, generate_flow_yaml, generate_graph_yaml,
-    generate_changes_yaml, generate_summaries_yaml,
-    generate_context_budget_yaml, generate_protocol_yaml,
-    generate_ai_instructions, merge_ai_instructions,
-    generate_context_anchor_yaml, generate_call_graph_yaml,
-    generate_types_yaml, generate_docstrings_yaml, generate_config_map_yaml,
-    generate_entry_points_yaml, generate_patterns_yaml, generate_quick_context_yaml
-)
+from generators.runner import run_generation
 from utils.warnings import set_verbose, warn, show_warnings_summary, vprint
+from utils.profiler import (
+    enable_profiling, disable_profiling, profile_report, format_profile, write_profile
+)
 
 VERSION = "5.0.0"
 
@@ -170,6 +161,7 @@ Antes de leer o modificar cualquier archivo del proyecto, lee estos archivos (ya
 - Consulta `.ai/TYPES.yaml` para conocer estructuras de datos sin buscarlas.
 - Consulta `.ai/DOCSTRINGS.yaml` para entender funciones sin leer su código.
 - Consulta `.ai/CONFIG_MAP.yaml` para ver variables de entorno y configuración.
+- Para ubicar un símbolo sin leer los YAML: `python .ai/query.py where <símbolo>` (también `callers`, `callees`, `endpoint`, `type`, `env`, y `search` si no conoces el nombre exacto).
 - Consulta `.ai/CHANGES.yaml` para ver qué archivos cambiaron recientemente.
 - Consulta `.ai/SUMMARIES.yaml` para un resumen rápido de cada archivo.
 - Consulta `.ai/AI_INSTRUCTIONS.yaml` sección `custom_considerations` para notas importantes.
@@ -219,6 +211,8 @@ Antes de leer o modificar cualquier archivo del proyecto, lee estos archivos (ya
 | `TESTING.yaml` | Cómo ejecutar tests |
 | `ERRORS.yaml` | Errores conocidos |
 | `GIT_WORKFLOW.yaml` | Política de commits y ramas |
+| `index.db` | Índice SQLite para consultas puntuales (lo usa `query.py`) |
+| `query.py` | Consultas rápidas: `where`, `callers`, `callees`, `endpoint`, `type`, `env`, `search` |
 | `update_index.py` | Regenera índices (NO durante fixes) |
 | `update.py` | Actualiza el motor desde GitHub |
 | `src/` | Motor interno de indexación (NUNCA modificar) |
@@ -418,12 +412,15 @@ def upgrade_project_files(project_path):
 # INSTALL
 # ============================================================================
 
-def install(project_path, auto_mode=False, verbose=False):
+def install(project_path, auto_mode=False, verbose=False, profile=False):
     """
     Instala el sistema .ai/ en un proyecto.
     
     Crea índices YAML, copia el motor de indexación a .ai/src/,
     instala scripts de actualización y configura git hook automático.
+    Con profile=True mide cada etapa del escaneo, la extracción y la
+    generación, y guarda el informe en .ai/.profile.json ('memory' mide
+    también las asignaciones con tracemalloc).
     """
     set_verbose(verbose)
 
@@ -482,107 +479,80 @@ def install(project_path, auto_mode=False, verbose=False):
     # ── [2/5] Detección ───────────────────────────────────────────────
     print(f"\n  [2/5] Detectando stack tecnológico...")
 
-    files_map = scan_files(project_path, show_progress=not verbose)
+    if profile:
+        enable_profiling(trace_memory=profile == 'memory')
+
+    # Un solo recorrido del árbol y una sola pasada: cada archivo se lee y se extrae una vez
+    manifest = build_manifest(project_path)
+    cache = new_cache()
+    files_map, records, _ = scan_incremental(
+        project_path, cache, show_progress=not verbose, jobs=default_jobs(), manifest=manifest
+    )
     vprint(f"Archivos escaneados: {len(files_map)}", level=1)
 
-    languages = detect_languages(project_path, iter_source_files(project_path))
+    languages = detect_languages(project_path, manifest['files'])
     print(f"         Lenguajes: {', '.join(languages) if languages else 'ninguno'}")
 
-    frameworks = detect_frameworks(project_path)
+    frameworks = detect_frameworks(project_path, manifest)
     print(f"         Backend: {', '.join(frameworks['backend']) if frameworks['backend'] else '-'}")
     print(f"         Frontend: {', '.join(frameworks['frontend']) if frameworks['frontend'] else '-'}")
 
     # ── [3/5] Extracción ──────────────────────────────────────────────
     print(f"\n  [3/5] Extrayendo información del código...")
 
-    functions = extract_functions(files_map)
+    results = merge_file_records(records, project_path, manifest)
+
+    functions = results['functions']
     total_funcs = sum(len(v) for v in functions.values())
     print(f"         {total_funcs} funciones/clases")
 
-    endpoints = extract_endpoints(files_map)
+    endpoints = results['endpoints']
     print(f"         {len(endpoints)} endpoints API")
 
-    components = extract_vue_components(files_map)
+    components = results['components']
     print(f"         {len(components)} componentes UI")
 
-    dependencies = extract_dependencies(files_map)
+    dependencies = results['dependencies']
     print(f"         {len(dependencies)} archivos con dependencias")
 
     # v5.0: Nuevos extractores
-    call_graph = extract_call_graph(files_map, functions)
+    call_graph = results['call_graph']
     print(f"         {len(call_graph.get('calls', {}))} funciones con llamadas mapeadas")
 
-    types = extract_types_and_models(files_map)
+    types = results['types']
     print(f"         {len(types)} tipos/modelos de datos")
 
-    docstrings = extract_docstrings(files_map, functions)
+    docstrings = results['docstrings']
     print(f"         {len(docstrings)} funciones documentadas")
 
-    config_map = extract_config_map(files_map, project_path)
+    config_map = results['config_map']
     print(f"         {len(config_map.get('env_vars', []))} variables de entorno")
 
-    patterns = extract_patterns(files_map, functions, frameworks)
+    patterns = results['patterns']
     print(f"         {len(patterns.get('design_patterns', []))} patrones de diseño")
 
-    # Liberar contenido de memoria
-    for fpath in files_map:
-        if 'content' in files_map[fpath]:
-            del files_map[fpath]['content']
-
     # ── [4/5] Crear sistema .ai/ ──────────────────────────────────────
     print(f"\n  [4/5] Creando sistema .ai/...")
     ai_dir = os.path.join(project_path, '.ai')
     os.makedirs(ai_dir, exist_ok=True)
-
-    def _safe_write(filename, content):
-        """Helper para escribir YAML y reportar"""
-        with open(os.path.join(ai_dir, filename), 'w', encoding='utf-8') as f:
-            f.write(content)
-        print(f"         {filename}")
-
-    # — Índices YAML (originales) —
-    _safe_write('PROJECT_INDEX.yaml', generate_project_index(
-        project_path, project_name, languages, frameworks,
-        files_map, functions, endpoints, components, dependencies
-    ))
-
-    yamls = generate_all_yamls(project_name, languages, frameworks, project_path, files_map)
-    for filename, content in yamls.items():
-        _safe_write(filename, content)
-
-    _safe_write('ARCHITECTURE.yaml', generate_architecture_yaml(
-        project_path, languages, frameworks, files_map, functions, dependencies
-    ))
-    _safe_write('FLOW.yaml', generate_flow_yaml())
-    _safe_write('GRAPH.yaml', generate_graph_yaml(dependencies, functions, endpoints, components))
-    _safe_write('CHANGES.yaml', generate_changes_yaml(project_path, files_map))
-    _safe_write('SUMMARIES.yaml', generate_summaries_yaml(files_map, functions))
-    _safe_write('CONTEXT_BUDGET.yaml', generate_context_budget_yaml(files_map, functions, endpoints, components))
-    _safe_write('PROTOCOL.yaml', generate_protocol_yaml())
-
-    ai_instr_content = generate_ai_instructions(
-        project_path, languages, frameworks, files_map, functions, endpoints, components
-    )
-    ai_instr_merged = merge_ai_instructions(ai_dir, ai_instr_content)
-    _safe_write('AI_INSTRUCTIONS.yaml', ai_instr_merged)
-
-    # — v5.0: Nuevos índices YAML —
-    _safe_write('CONTEXT_ANCHOR.yaml', generate_context_anchor_yaml(
-        project_name, languages, frameworks, functions, endpoints, components, files_map
-    ))
-    _safe_write('CALL_GRAPH.yaml', generate_call_graph_yaml(call_graph))
-    if types:
-        _safe_write('TYPES.yaml', generate_types_yaml(types))
-    if docstrings:
-        _safe_write('DOCSTRINGS.yaml', generate_docstrings_yaml(docstrings))
-    _safe_write('CONFIG_MAP.yaml', generate_config_map_yaml(config_map))
-    _safe_write('ENTRY_POINTS.yaml', generate_entry_points_yaml(
-        files_map, functions, endpoints, components, dependencies, call_graph
-    ))
-    _safe_write('PATTERNS.yaml', generate_patterns_yaml(patterns))
-    _safe_write('QUICK_CONTEXT.yaml', generate_quick_context_yaml(
-        project_name, languages, frameworks, functions, endpoints, components, files_map, config_map
-    ))
+    # Caché por archivo: el primer update_index.py --incremental ya la reutiliza
+    save_cache(ai_dir, cache)
+
+    # — Índices YAML e índice binario (en paralelo en proyectos grandes) —
+    for filename, written in run_generation(ai_dir, project_path, project_name, languages,
+                                            frameworks, files_map, results, jobs=default_jobs()):
+        print(f"         {filename}" if written else f"         {filename} (sin cambios)")
+
+    if profile:
+        report = profile_report({
+            'project': project_name,
+            'mode': 'install',
+            'jobs': default_jobs(),
+            'trace_memory': profile == 'memory',
+            'files': len(files_map),
+        })
+        profile_lines = format_profile(report) + [f"  → {write_profile(ai_dir, report)}"]
+        disable_profiling()
 
     # — Motor de indexación (.ai/src/) —
     _copy_tree_clean(src_dir, os.path.join(ai_dir, 'src'))
@@ -590,7 +560,7 @@ def install(project_path, auto_mode=False, verbose=False):
 
     # — Scripts de actualización —
     scripts_dir = os.path.join(src_dir, 'scripts')
-    for script in ['update.py', 'update_index.py', 'pre-commit.hook']:
+    for script in ['update.py', 'update_index.py', 'query.py', 'pre-commit.hook']:
         if _copy_file_safe(os.path.join(scripts_dir, script), os.path.join(ai_dir, script)):
             print(f"         {script}")
 
@@ -646,6 +616,9 @@ Generado por **AI Agent Wizard v{VERSION}**
     print(f"     Lee .ai/FLOW.yaml para usar el sistema de indices")
     print(f"  {'=' * 60}\n")
 
+    if profile:
+        print('\n'.join(profile_lines) + '\n')
+
     return True
 
 
@@ -671,6 +644,9 @@ def main():
   OPCIONES:
     --auto          Modo no interactivo
     --verbose, -v   Modo debug detallado
+    --profile       Mide cada etapa (tiempo, CPU, memoria) y guarda
+                    .ai/.profile.json
+    --profile-memory  Como --profile, más asignaciones por etapa (más lento)
     --help, -h      Muestra esta ayuda
   
   EJEMPLOS:
@@ -683,7 +659,8 @@ def main():
     args = [a for a in sys.argv[1:] if not a.startswith('--') and not a.startswith('-')]
     project_path = args[0] if args else os.getcwd()
 
-    success = install(project_path, auto_mode=auto_mode, verbose=verbose)
+    profile = 'memory' if '--profile-memory' in sys.argv else '--profile' in sys.argv
+    success = install(project_path, auto_mode=auto_mode, verbose=verbose, profile=profile)
     sys.exit(0 if success else 1)
 
 
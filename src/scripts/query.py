@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+AI Agent Wizard - Consultas puntuales al índice
+Responde dónde está un símbolo, quién lo llama, etc. desde .ai/index.db,
+sin leer los YAML. La salida es breve para pegarla en un prompt.
+
+USO:
+    python .ai/query.py <comando> <argumento> [opciones]
+
+COMANDOS:
+    where <símbolo>           Archivo:línea de una función, método o clase
+                              (ej: save, UserService.save)
+    callers <símbolo>         Funciones que llaman al símbolo
+    callees <símbolo>         Funciones que el símbolo llama
+    endpoint [MÉTODO] <ruta>  Handler de un endpoint (ej: endpoint POST /users)
+    type <Nombre>             Modelo/interfaz/struct con sus campos
+    env <VARIABLE>            Dónde se lee una variable de entorno
+    search <texto>            Búsqueda aproximada en funciones, tipos,
+                              componentes y endpoints (ej: search userSvc)
+
+OPCIONES:
+    --limit N       Máximo de resultados por consulta (default: 20)
+    --help, -h      Mostrar esta ayuda
+
+Regenera el índice con: python .ai/update_index.py
+"""
+
+import os
+import sys
+import json
+import heapq
+from array import array
+from collections import Counter
+from pathlib import Path
+
+try:
+    import sqlite3
+except ImportError:  # Python compilado sin sqlite3
+    sqlite3 = None
+
+# Solo stdlib + utils.fuzzy: no importa el motor (core) para arrancar en pocos ms
+
+ai_dir = Path(__file__).parent
+engine_dir = ai_dir / 'src'
+if engine_dir.is_dir():
+    sys.path.insert(0, str(engine_dir))
+
+from utils.fuzzy import name_trigrams
+
+INDEX_DB_FILE = 'index.db'
+
+# Debe coincidir con core.index_db.INDEX_DB_VERSION
+INDEX_DB_VERSION = 2
+
+DEFAULT_LIMIT = 20
+
+
+def open_index(directory):
+    """
+    Abre index.db en solo lectura.
+
+    Returns:
+        sqlite3.Connection, o None si no existe o es de otra versión del esquema
+    """
+    db_path = os.path.join(str(directory), INDEX_DB_FILE)
+    if not os.path.exists(db_path):
+        return None
+    conn = sqlite3.connect(Path(os.path.abspath(db_path)).as_uri() + '?mode=ro', uri=True)
+    if conn.execute("PRAGMA user_version").fetchone()[0] != INDEX_DB_VERSION:
+        conn.close()
+        return None
+    return conn
+
+
+def _symbol_filter(symbol):
+    """
+    Condición SQL para un símbolo: 'Clase.metodo' busca por clase y nombre,
+    'nombre' busca por nombre simple o nombre completo (usa los índices).
+    """
+    owner, _, short_name = symbol.rpartition('.')
+    if owner:
+        return "(s.short_name = ? AND s.owner = ?) OR s.name = ?", (short_name, owner, symbol)
+    return "s.short_name = ? OR s.name = ?", (symbol, symbol)
+
+
+def find_symbol(conn, symbol, limit=DEFAULT_LIMIT):
+    """Retorna [(archivo, línea, nombre)] de las definiciones del símbolo"""
+    where, params = _symbol_filter(symbol)
+    return conn.execute(
+        f"SELECT f.path, s.line, s.name FROM symbols s JOIN files f ON f.id = s.file_id "
+        f"WHERE {where} ORDER BY f.path, s.line LIMIT ?", (*params, limit)
+    ).fetchall()
+
+
+def find_callers(conn, symbol, limit=DEFAULT_LIMIT):
+    """Retorna [(archivo, línea, nombre)] de las funciones que llaman al símbolo"""
+    where, params = _symbol_filter(symbol)
+    return conn.execute(
+        f"SELECT DISTINCT f.path, c.line, c.name FROM symbols s "
+        f"JOIN calls e ON e.callee = s.id JOIN symbols c ON c.id = e.caller "
+        f"JOIN files f ON f.id = c.file_id "
+        f"WHERE {where} ORDER BY f.path, c.line LIMIT ?", (*params, limit)
+    ).fetchall()
+
+
+def find_callees(conn, symbol, limit=DEFAULT_LIMIT):
+    """Retorna [(archivo, línea, nombre)] de las funciones que el símbolo llama"""
+    where, params = _symbol_filter(symbol)
+    return conn.execute(
+        f"SELECT DISTINCT f.path, c.line, c.name FROM symbols s "
+        f"JOIN calls e ON e.caller = s.id JOIN symbols c ON c.id = e.callee "
+        f"JOIN files f ON f.id = c.file_id "
+        f"WHERE {where} ORDER BY f.path, c.line LIMIT ?", (*params, limit)
+    ).fetchall()
+
+
+def find_endpoint(conn, route, method=None, limit=DEFAULT_LIMIT):
+    """Retorna [(método, ruta, handler, archivo, línea)]; sin método, todos los de la ruta"""
+    sql = ("SELECT e.method, e.path, e.handler, f.path, e.line FROM endpoints e "
+           "JOIN files f ON f.id = e.file_id WHERE e.path = ?")
+    params = [route]
+    if method:
+        sql += " AND e.method = ?"
+        params.append(method.upper())
+    return conn.execute(sql + " ORDER BY e.method LIMIT ?", (*params, limit)).fetchall()
+
+
+def find_type(conn, name, limit=DEFAULT_LIMIT):
+    """Retorna [(nombre, tipo, archivo, línea, extends, campos)]"""
+    rows = conn.execute(
+        "SELECT t.name, t.kind, f.path, t.line, t.extends, t.fields FROM types t "
+        "JOIN files f ON f.id = t.file_id WHERE t.name = ? LIMIT ?", (name, limit)
+    ).fetchall()
+    return [(n, kind, path, line, json.loads(extends), json.loads(fields))
+            for n, kind, path, line, extends, fields in rows]
+
+
+def find_env(conn, name, limit=DEFAULT_LIMIT):
+    """Retorna [(variable, archivo, línea, default)]"""
+    return conn.execute(
+        "SELECT v.name, f.path, v.line, v.default_value FROM env_vars v "
+        "JOIN files f ON f.id = v.file_id WHERE v.name = ? LIMIT ?", (name, limit)
+    ).fetchall()
+
+
+def find_fuzzy(conn, text, limit=DEFAULT_LIMIT):
+    """
+    Búsqueda aproximada por trigramas, ordenada por similitud.
+
+    La similitud es Jaccard sobre trigramas: compartidos / (del texto + del
+    término - compartidos). Solo se leen las listas de los trigramas del
+    texto, y solo puntúan los términos que comparten al menos un tercio de
+    ellos.
+
+    Returns:
+        [(similitud, tipo, nombre, archivo, línea)] de mayor a menor similitud
+    """
+    trigrams = sorted(name_trigrams(text))
+    if not trigrams:
+        return []
+
+    hits = Counter()
+    placeholders = ', '.join('?' * len(trigrams))
+    for (blob,) in conn.execute(
+            f"SELECT term_ids FROM search_postings WHERE trigram IN ({placeholders})", trigrams):
+        ids = array('I')
+        ids.frombytes(blob)
+        hits.update(ids)
+    if not hits:
+        return []
+
+    ntri = conn.execute("SELECT value FROM meta WHERE key = 'search_ntri'").fetchone()[0]
+    n = len(trigrams)
+    min_hits = max(1, n // 3)
+    # A igual similitud gana el término indexado primero (orden de escaneo)
+    best = heapq.nlargest(limit, (
+        (count / (n + ntri[tid] - count), -tid)
+        for tid, count in hits.items() if count >= min_hits
+    ))
+
+    results = []
+    for score, neg_tid in best:
+        rows = conn.execute(
+            "SELECT n.kind, n.name, f.path, n.line FROM search_names n "
+            "LEFT JOIN files f ON f.id = n.file_id WHERE n.term_id = ? "
+            "ORDER BY f.path, n.line LIMIT ?", (-neg_tid, limit - len(results))
+        ).fetchall()
+        results.extend((score, *row) for row in rows)
+        if len(results) >= limit:
+            break
+    return results
+
+
+def run_query(conn, command, args, limit=DEFAULT_LIMIT):
+    """
+    Ejecuta un comando y retorna las líneas de salida (vacía si no hay resultados).
+
+    Raises:
+        ValueError: comando desconocido o sin argumento
+    """
+    if not args:
+        raise ValueError(f"Falta el argumento de '{command}'")
+
+    if command in ('where', 'callers', 'callees'):
+        finder = {'where': find_symbol, 'callers': find_callers, 'callees': find_callees}[command]
+        return [f"{path}:{line}  {name}" for path, line, name in finder(conn, args[0], limit)]
+
+    if command == 'endpoint':
+        method, route = (args[0], args[1]) if len(args) > 1 else (None, args[0])
+        return [f"{m} {r} → {handler}  {path}:{line}"
+                for m, r, handler, path, line in find_endpoint(conn, route, method, limit)]
+
+    if command == 'type':
+        out = []
+        for name, kind, path, line, extends, fields in find_type(conn, args[0], limit):
+            head = f"{name} ({kind})  {path}:{line}"
+            if extends:
+                head += f"  extends {', '.join(extends)}"
+            out.append(head)
+            out.extend(f"  {field['name']}: {field['type']}" for field in fields)
+        return out
+
+    if command == 'env':
+        return [f"{name}  {path}:{line}" + (f"  default={default}" if default else "")
+                for name, path, line, default in find_env(conn, args[0], limit)]
+
+    if command == 'search':
+        out = []
+        for score, kind, name, path, line in find_fuzzy(conn, ' '.join(args), limit):
+            location = f"{path}:{line}" if line else (path or '')
+            out.append(f"{score:.2f}  {kind:<9}  {name}  {location}".rstrip())
+        return out
+
+    raise ValueError(f"Comando desconocido: {command}")
+
+
+def _parse_limit(argv):
+    """Lee --limit N / --limit=N y retorna (limit, argv sin la opción)"""
+    limit = DEFAULT_LIMIT
+    rest = []
+    skip = False
+    for i, arg in enumerate(argv):
+        if skip:
+            skip = False
+        elif arg.startswith('--limit='):
+            limit = max(1, int(arg.split('=', 1)[1]))
+        elif arg == '--limit' and i + 1 < len(argv):
+            limit = max(1, int(argv[i + 1]))
+            skip = True
+        else:
+            rest.append(arg)
+    return limit, rest
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or '--help' in sys.argv or '-h' in sys.argv:
+        print(__doc__)
+        sys.exit(0)
+
+    if sqlite3 is None:
+        print("ERROR: sqlite3 no disponible en este Python: index.db no se puede consultar")
+        sys.exit(2)
+
+    try:
+        limit, argv = _parse_limit(sys.argv[1:])
+        conn = open_index(ai_dir)
+        if conn is None:
+            print("ERROR: No se encontró .ai/index.db (o es de otra versión)")
+            print("Ejecuta: python .ai/update_index.py")
+            sys.exit(1)
+        try:
+            lines = run_query(conn, argv[0], argv[1:], limit)
+        finally:
+            conn.close()
+    except (ValueError, sqlite3.Error) as e:
+        print(f"ERROR: {e}")
+        sys.exit(2)
+
+    if not lines:
+        print(f"Sin resultados: {' '.join(argv)}")
+        sys.exit(1)
+    print('\n'.join(lines))
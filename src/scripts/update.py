@@ -15,8 +15,9 @@ OPCIONES:
 CARACTERÍSTICAS:
     ok Descarga última versión del core desde GitHub
     ok Actualiza .ai/src/ (motor de indexación)
-    ok Actualiza scripts (update.py, update_index.py, pre-commit.hook)
+    ok Actualiza scripts (update.py, update_index.py, query.py, pre-commit.hook)
     ok Regenera automáticamente todos los índices después de actualizar
+       (en el mismo proceso, incremental, cancelable con Ctrl+C)
     ok Reinstala git hook automáticamente
 """
 
@@ -27,8 +28,8 @@ import tempfile
 import urllib.request
 import zipfile
 import ssl
+import importlib.util
 from pathlib import Path
-import subprocess
 
 
 # ============================================================================
@@ -149,7 +150,7 @@ def update_core(extracted_path, ai_dir, verbose=False):
     try:
         wizard_ai = os.path.join(extracted_path, '.ai')
         
-        for script in ['update.py', 'update_index.py', 'pre-commit.hook']:
+        for script in ['update.py', 'update_index.py', 'query.py', 'pre-commit.hook']:
             src_script = os.path.join(wizard_ai, script)
             dst_script = os.path.join(ai_dir, script)
             
@@ -190,33 +191,57 @@ def update_core(extracted_path, ai_dir, verbose=False):
     return errors, updated
 
 
+# Paquetes del motor (.ai/src/): se descartan de sys.modules antes de cargar
+# el motor recién actualizado
+ENGINE_PACKAGES = ('core', 'generators', 'templates', 'utils', 'main')
+
+
+def load_index_updater(ai_dir):
+    """
+    Importa .ai/update_index.py (y con él el motor de .ai/src/) en este proceso.
+
+    Returns:
+        Módulo update_index (expone update_all)
+    """
+    update_script = Path(ai_dir) / 'update_index.py'
+    if not update_script.exists():
+        raise Exception("No se encontró update_index.py")
+
+    for name in list(sys.modules):
+        if name.split('.')[0] in ENGINE_PACKAGES:
+            del sys.modules[name]
+
+    spec = importlib.util.spec_from_file_location('update_index', str(update_script))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
 def regenerate_indices(ai_dir, verbose=False):
-    """Regenera todos los índices automáticamente"""
+    """
+    Regenera todos los índices en este mismo proceso.
+
+    Sin segundo intérprete ni timeout: el progreso de update_all() se muestra
+    a medida que avanza y Ctrl+C lo cancela. Es incremental: si el motor no
+    cambió, reutiliza .ai/.cache.json y solo re-extrae los archivos
+    modificados (si cambió, la caché se invalida sola).
+
+    Returns:
+        True si se regeneraron, False si falló o se canceló
+    """
     print()  # Línea en blanco
-    print("  Regenerando indices (automatico)...", end="", flush=True)
-    
+    print("  Regenerando indices (automatico)...\n")
+
     try:
-        update_script = Path(ai_dir) / 'update_index.py'
-        if not update_script.exists():
-            raise Exception("No se encontró update_index.py")
-        
-        args = ['--verbose'] if verbose else ['--quiet']
-        result = subprocess.run(
-            [sys.executable, str(update_script)] + args,
-            cwd=str(Path(ai_dir).parent),
-            capture_output=True,
-            text=True,
-            timeout=120
-        )
-        
-        if result.returncode != 0:
-            raise Exception(result.stderr or "update_index.py falló")
-        
-        print(" ok")
+        updater = load_index_updater(ai_dir)
+        updater.update_all(quiet=False, verbose=verbose, incremental=True)
         return True
-        
-    except Exception as e:
-        print(f" FAIL")
+    except KeyboardInterrupt:
+        # La caché se guarda al final: la próxima regeneración rehace lo pendiente
+        print("\n  Cancelado. Ejecuta: python .ai/update_index.py")
+        return False
+    except (Exception, SystemExit) as e:
+        print(f"  FAIL")
         print(f"  ERROR: {e}")
         return False
 
@@ -1,12 +1,34 @@
 #!/usr/bin/env python3
 """
 AI Agent Wizard - Regenerar índices localmente
-Regenera todos los archivos YAML en .ai/ después de cambios en el código.
+Regenera todos los archivos YAML en .ai/ (y el índice binario .ai/index.db)
+después de cambios en el código.
 
 USO:
     python .ai/update_index.py [opciones]
 
 OPCIONES:
+    --incremental   Reutiliza la caché por archivo (.ai/.cache.json) y solo
+                    re-extrae los archivos modificados
+    --staged        Como --incremental, pero solo revisa los archivos en el
+                    staging de git; sin archivos fuente staged no hace nada
+                    (lo usa el pre-commit hook)
+    --jobs N        Procesos para leer/extraer archivos y generar los
+                    índices (default: CPUs)
+    --serial        Genera los índices uno tras otro en este proceso aunque
+                    --jobs sea mayor que 1 (para depurar generadores)
+    --max-memory MB Avisa si la memoria pico del escaneo supera MB
+    --python-ast    Extrae los .py con el módulo ast (más preciso; usa regex
+                    si un archivo no parsea)
+    --watch         Queda en ejecución y regenera al detectar cambios
+                    (sondeo por stat; mantiene la caché en memoria y solo
+                    re-extrae lo modificado, pero regenera todos los índices)
+    --interval S    Segundos entre sondeos en --watch (default: 1)
+    --profile       Mide tiempo real, CPU, memoria pico (RSS) y elementos de
+                    cada etapa (scanner, extractores, generadores), muestra
+                    las más lentas y guarda el detalle en .ai/.profile.json
+    --profile-memory  Como --profile, y además el pico de asignaciones de
+                    cada etapa (tracemalloc; los tiempos salen inflados)
     --quiet         Solo errores (para hooks)
     --verbose, -v   Progreso detallado
     --help, -h      Mostrar esta ayuda
@@ -14,6 +36,7 @@ OPCIONES:
 
 import os
 import sys
+import time
 from pathlib import Path
 
 # Paths
@@ -30,191 +53,260 @@ if not engine_dir.is_dir():
 # Importar desde .ai/src/
 sys.path.insert(0, str(engine_dir))
 
-from core.scanner import scan_files, iter_source_files
-from core.detectors import detect_languages, detect_frameworks
-from core.extractors import (
-    extract_functions, extract_endpoints, extract_vue_components, extract_dependencies,
-    extract_call_graph, extract_types_and_models, extract_docstrings,
-    extract_config_map, extract_patterns
+from core.scanner import (
+    build_manifest, peak_memory_mb, stat_snapshot, wait_for_changes, staged_source_files
+)
+from utils.profiler import (
+    enable_profiling, disable_profiling, profile_report, format_profile, write_profile
 )
-from generators.all_generators import (
-    generate_project_index, generate_all_yamls,
-    generate_architecture_yaml, generate_flow_yaml, generate_graph_yaml,
-    generate_changes_yaml, generate_summaries_yaml,
-    generate_context_budget_yaml, generate_protocol_yaml,
-    generate_ai_instructions, merge_ai_instructions,
-    generate_context_anchor_yaml, generate_call_graph_yaml,
-    generate_types_yaml, generate_docstrings_yaml, generate_config_map_yaml,
-    generate_entry_points_yaml, generate_patterns_yaml, generate_quick_context_yaml
+from core.detectors import detect_languages, detect_frameworks
+from core.extractors import merge_file_records, set_python_backend
+from core.cache import (
+    load_cache, save_cache, new_cache, scan_incremental, default_jobs, cached_file_list, cache_matches_engine
 )
+from generators.runner import run_generation
+
 
+def update_all(quiet=False, verbose=False, incremental=False, jobs=None, max_memory=None,
+               python_backend='regex', cache=None, manifest=None, changed_paths=None,
+               profile=False, profile_memory=False, serial=False, skip_unchanged=False):
+    """
+    Regenera todos los índices YAML en .ai/
 
-def update_all(quiet=False, verbose=False):
-    """Regenera todos los índices YAML en .ai/"""
+    Con profile=True mide cada etapa, muestra las más lentas (salvo quiet) y
+    guarda el informe en .ai/.profile.json; profile_memory=True agrega el pico
+    de asignaciones por etapa (tracemalloc). El resto de los argumentos son
+    los de _regenerate().
+
+    Returns:
+        Dict stats de scan_incremental() ({'reused', 'extracted', 'removed', 'workers_peak_mb'})
+    """
+    if not profile:
+        return _regenerate(quiet, verbose, incremental, jobs, max_memory,
+                           python_backend, cache, manifest, changed_paths, serial, skip_unchanged)
+
+    enable_profiling(trace_memory=profile_memory)
+    try:
+        scan_stats = _regenerate(quiet, verbose, incremental, jobs, max_memory,
+                                 python_backend, cache, manifest, changed_paths, serial, skip_unchanged)
+        mode = 'staged' if changed_paths is not None else (
+            'incremental' if incremental or cache is not None else 'full')
+        report = profile_report({
+            'project': project_dir.name,
+            'mode': mode,
+            'jobs': jobs or default_jobs(),
+            'python_backend': python_backend,
+            'trace_memory': profile_memory,
+            'files': scan_stats['reused'] + scan_stats['extracted'],
+            **scan_stats,
+        })
+        profile_path = write_profile(ai_dir, report)
+        if not quiet:
+            print()
+            print('\n'.join(format_profile(report)))
+            print(f"  → {profile_path}")
+        return scan_stats
+    finally:
+        disable_profiling()
+
+
+def _regenerate(quiet=False, verbose=False, incremental=False, jobs=None, max_memory=None,
+                python_backend='regex', cache=None, manifest=None, changed_paths=None, serial=False,
+                skip_unchanged=False):
+    """
+    Regenera todos los índices YAML en .ai/ (ver update_all())
+
+    No es una actualización por secciones: con cualquier cambio se combinan
+    de nuevo todos los registros y se ejecutan todos los generadores; la
+    caché solo evita re-extraer los archivos sin cambios, y cada índice se
+    reescribe solo si su contenido cambió.
+
+    Args:
+        quiet: Solo errores
+        verbose: Progreso detallado
+        incremental: Si True, reutiliza .ai/.cache.json y solo re-extrae los
+            archivos cuyo stat/hash cambió. Si False, reconstruye la caché.
+        jobs: Procesos para leer/extraer archivos y generar los índices
+            (None = CPUs disponibles)
+        max_memory: Límite de memoria pico en MB; si se supera se reporta
+            aunque quiet sea True
+        python_backend: 'regex' o 'ast' para los archivos .py
+        cache: Caché ya cargada (--watch la mantiene en memoria entre
+            regeneraciones); si se da, ignora incremental
+        manifest: Manifiesto ya construido; si es None se recorre el proyecto
+        changed_paths: Rutas relativas que cambiaron (ej: staged). Si se dan y
+            hay caché, solo se revisan esas y el resto se toma de la caché
+            sin recorrer el proyecto
+        serial: Generar los índices uno tras otro en este proceso aunque
+            jobs > 1 (para depurar generadores)
+        skip_unchanged: Si ningún archivo se re-extrajo ni se eliminó, no
+            regenerar (--watch tras cambios que solo tocan el stat). Con
+            changed_paths siempre es así
+
+    Returns:
+        Dict stats de scan_incremental() ({'reused', 'extracted', 'removed', 'workers_peak_mb'})
+    """
     project_name = project_dir.name
 
     if not quiet:
         print("  Regenerando índices...\n")
 
-    # 1. Escanear
+    # 1. Escanear (un solo recorrido; extrae por archivo solo lo que no está en caché)
     if not quiet:
         print("  [1/4] Escaneando archivos...")
-    files_map = scan_files(str(project_dir), show_progress=False)
+    set_python_backend(python_backend)
+    if cache is None:
+        cache = load_cache(ai_dir) if incremental or changed_paths is not None else new_cache()
+    elif not cache_matches_engine(cache):
+        # Caché en memoria de otro backend o motor: se vacía en su lugar (--watch la conserva)
+        cache.clear()
+        cache.update(new_cache())
+    if changed_paths is not None and not cache['files']:
+        changed_paths = None  # Sin índice previo: escaneo completo
+    if manifest is None:
+        files = cached_file_list(str(project_dir), cache, changed_paths) if changed_paths is not None else None
+        manifest = build_manifest(str(project_dir), files=files)
+    if jobs is None:
+        jobs = default_jobs()
+    files_map, records, scan_stats = scan_incremental(
+        str(project_dir), cache, jobs=jobs, max_memory_mb=max_memory, manifest=manifest,
+        changed_paths=changed_paths
+    )
     if verbose:
         print(f"         {len(files_map)} archivos encontrados")
+        print(f"         {scan_stats['extracted']} extraídos, {scan_stats['reused']} desde caché")
+    peak = peak_memory_mb()
+    if peak is not None:
+        peak += scan_stats['workers_peak_mb']  # los workers del pool se miden aparte
+    if max_memory and peak is not None and peak > max_memory:
+        print(f"  AVISO: memoria pico {peak:.0f} MB supera --max-memory {max_memory} MB", file=sys.stderr)
+    elif verbose and peak is not None:
+        print(f"         memoria pico: {peak:.0f} MB")
+
+    if ((changed_paths is not None or skip_unchanged)
+            and not scan_stats['extracted'] and not scan_stats['removed']):
+        # Los archivos staged (o tocados) ya estaban indexados con este contenido
+        if not quiet:
+            print("\n  ok Índices al día (ningún archivo cambió de contenido)")
+        return scan_stats
 
     # 2. Detectar
     if not quiet:
         print("  [2/4] Detectando stack...")
-    languages = detect_languages(str(project_dir), iter_source_files(str(project_dir)))
-    frameworks = detect_frameworks(str(project_dir))
+    languages = detect_languages(str(project_dir), manifest['files'])
+    frameworks = detect_frameworks(str(project_dir), manifest)
 
-    # 3. Extraer
+    # 3. Extraer (combinar registros por archivo en estructuras globales)
     if not quiet:
         print("  [3/4] Extrayendo código...")
-    functions = extract_functions(files_map)
-    endpoints = extract_endpoints(files_map)
-    components = extract_vue_components(files_map)
-    dependencies = extract_dependencies(files_map)
-    call_graph = extract_call_graph(files_map, functions)
-    types = extract_types_and_models(files_map)
-    docstrings = extract_docstrings(files_map, functions)
-    config_map = extract_config_map(files_map, str(project_dir))
-    patterns = extract_patterns(files_map, functions, frameworks)
-
-    # Liberar contenido
-    for fpath in files_map:
-        if 'content' in files_map[fpath]:
-            del files_map[fpath]['content']
+    results = merge_file_records(records, str(project_dir), manifest)
+    functions = results['functions']
+    endpoints = results['endpoints']
 
     # 4. Generar todos los YAML
     if not quiet:
         print("  [4/4] Generando YAMLs...")
 
-    generated = []
-
-    # PROJECT_INDEX.yaml
-    content = generate_project_index(
-        str(project_dir), project_name, languages, frameworks,
-        files_map, functions, endpoints, components, dependencies
-    )
-    _write(ai_dir / 'PROJECT_INDEX.yaml', content)
-    generated.append('PROJECT_INDEX.yaml')
-
-    # CONVENTIONS, TESTING, ERRORS, GIT_WORKFLOW
-    yamls = generate_all_yamls(project_name, languages, frameworks, str(project_dir), files_map)
-    for filename, content in yamls.items():
-        _write(ai_dir / filename, content)
-        generated.append(filename)
-
-    # ARCHITECTURE.yaml
-    content = generate_architecture_yaml(
-        str(project_dir), languages, frameworks, files_map, functions, dependencies
-    )
-    _write(ai_dir / 'ARCHITECTURE.yaml', content)
-    generated.append('ARCHITECTURE.yaml')
-
-    # FLOW.yaml
-    content = generate_flow_yaml()
-    _write(ai_dir / 'FLOW.yaml', content)
-    generated.append('FLOW.yaml')
-
-    # GRAPH.yaml
-    content = generate_graph_yaml(dependencies, functions, endpoints, components)
-    _write(ai_dir / 'GRAPH.yaml', content)
-    generated.append('GRAPH.yaml')
-
-    # CHANGES.yaml
-    content = generate_changes_yaml(str(project_dir), files_map)
-    _write(ai_dir / 'CHANGES.yaml', content)
-    generated.append('CHANGES.yaml')
-
-    # SUMMARIES.yaml
-    content = generate_summaries_yaml(files_map, functions)
-    _write(ai_dir / 'SUMMARIES.yaml', content)
-    generated.append('SUMMARIES.yaml')
-
-    # CONTEXT_BUDGET.yaml
-    content = generate_context_budget_yaml(files_map, functions, endpoints, components)
-    _write(ai_dir / 'CONTEXT_BUDGET.yaml', content)
-    generated.append('CONTEXT_BUDGET.yaml')
-
-    # PROTOCOL.yaml
-    content = generate_protocol_yaml()
-    _write(ai_dir / 'PROTOCOL.yaml', content)
-    generated.append('PROTOCOL.yaml')
-
-    # AI_INSTRUCTIONS.yaml (con merge inteligente para preservar consideraciones)
-    ai_instr_content = generate_ai_instructions(
-        str(project_dir), languages, frameworks, files_map, functions, endpoints, components
-    )
-    ai_instr_merged = merge_ai_instructions(str(ai_dir), ai_instr_content)
-    _write(ai_dir / 'AI_INSTRUCTIONS.yaml', ai_instr_merged)
-    generated.append('AI_INSTRUCTIONS.yaml')
-
-    # CONTEXT_ANCHOR.yaml
-    content = generate_context_anchor_yaml(
-        project_name, languages, frameworks, functions, endpoints, components, files_map
-    )
-    _write(ai_dir / 'CONTEXT_ANCHOR.yaml', content)
-    generated.append('CONTEXT_ANCHOR.yaml')
-
-    # CALL_GRAPH.yaml
-    content = generate_call_graph_yaml(call_graph)
-    _write(ai_dir / 'CALL_GRAPH.yaml', content)
-    generated.append('CALL_GRAPH.yaml')
-
-    # TYPES.yaml (solo si hay tipos)
-    if types:
-        content = generate_types_yaml(types)
-        _write(ai_dir / 'TYPES.yaml', content)
-        generated.append('TYPES.yaml')
-
-    # DOCSTRINGS.yaml (solo si hay docstrings)
-    if docstrings:
-        content = generate_docstrings_yaml(docstrings)
-        _write(ai_dir / 'DOCSTRINGS.yaml', content)
-        generated.append('DOCSTRINGS.yaml')
-
-    # CONFIG_MAP.yaml
-    content = generate_config_map_yaml(config_map)
-    _write(ai_dir / 'CONFIG_MAP.yaml', content)
-    generated.append('CONFIG_MAP.yaml')
-
-    # ENTRY_POINTS.yaml
-    content = generate_entry_points_yaml(
-        files_map, functions, endpoints, components, dependencies, call_graph
-    )
-    _write(ai_dir / 'ENTRY_POINTS.yaml', content)
-    generated.append('ENTRY_POINTS.yaml')
+    # Cada índice se escribe al terminar; en paralelo si jobs > 1 (salvo serial)
+    outputs = run_generation(ai_dir, str(project_dir), project_name, languages, frameworks,
+                             files_map, results, jobs=1 if serial else jobs)
+    generated = [filename for filename, _ in outputs]
+    touched = sum(written for _, written in outputs)  # el resto no cambió
 
-    # PATTERNS.yaml
-    content = generate_patterns_yaml(patterns)
-    _write(ai_dir / 'PATTERNS.yaml', content)
-    generated.append('PATTERNS.yaml')
-
-    # QUICK_CONTEXT.yaml
-    content = generate_quick_context_yaml(
-        project_name, languages, frameworks, functions, endpoints, components, files_map, config_map
-    )
-    _write(ai_dir / 'QUICK_CONTEXT.yaml', content)
-    generated.append('QUICK_CONTEXT.yaml')
+    # La caché se guarda al final: si la generación falla, la próxima
+    # ejecución no la considera al día
+    save_cache(ai_dir, cache)
 
     # Resumen
     total_funcs = sum(len(v) for v in functions.values())
 
     if not quiet:
-        print(f"\n  ok {len(generated)} archivos regenerados")
+        print(f"\n  ok {len(generated)} archivos regenerados ({touched} actualizados, "
+              f"{len(generated) - touched} sin cambios)")
         print(f"    {len(files_map)} archivos | {total_funcs} funciones | {len(endpoints)} endpoints")
         if verbose:
             for f in generated:
                 print(f"    → {f}")
 
+    return scan_stats
+
+
+def watch(quiet=False, verbose=False, jobs=None, max_memory=None, python_backend='regex',
+          interval=1.0, debounce=0.5, profile=False, profile_memory=False, serial=False):
+    """
+    Regenera los índices cada vez que cambian archivos fuente (Ctrl+C para salir).
+
+    La caché por archivo queda en memoria: tras un cambio solo se re-extraen
+    los archivos cuyo contenido cambió, y si ninguno cambió (solo el stat) no
+    se regenera nada. Si alguno cambió, se combinan todos los registros y se
+    ejecutan todos los generadores (ver _regenerate()): el costo de cada
+    ciclo crece con el tamaño del proyecto, no con el del cambio, aunque
+    solo se reescriben los índices cuyo contenido cambió. Las ráfagas de
+    cambios (git checkout, rebase) se agrupan en una sola regeneración (ver
+    wait_for_changes()).
+
+    Args:
+        interval: Segundos entre sondeos
+        debounce: Segundos sin cambios antes de regenerar
+        profile: Perfilar cada regeneración (.ai/.profile.json queda con la última)
+        profile_memory: Perfilar también las asignaciones (ver update_all())
+        serial: Generar los índices en serie (ver _regenerate())
+    """
+    cache, manifest = _watch_state(python_backend)
+    update_all(quiet=quiet, verbose=verbose, jobs=jobs, max_memory=max_memory,
+               python_backend=python_backend, cache=cache, manifest=manifest,
+               profile=profile, profile_memory=profile_memory, serial=serial)
+    snapshot = stat_snapshot(manifest['files'])
+    if not quiet:
+        print(f"\n  Observando {len(snapshot)} archivos (Ctrl+C para salir)...")
+
+    try:
+        while True:
+            manifest, snapshot, changed = wait_for_changes(
+                str(project_dir), snapshot, interval=interval, debounce=debounce
+            )
+            started = time.time()
+            try:
+                stats = update_all(quiet=True, verbose=False, jobs=jobs, max_memory=max_memory,
+                                   python_backend=python_backend, cache=cache, manifest=manifest,
+                                   profile=profile, profile_memory=profile_memory, serial=serial,
+                                   skip_unchanged=True)
+            except Exception as e:
+                print(f"  ERROR: {e}")
+                continue
+            if not quiet:
+                print(f"  {time.strftime('%H:%M:%S')} {changed} archivos cambiados → "
+                      f"{stats['extracted']} re-extraídos, {stats['removed']} eliminados "
+                      f"({time.time() - started:.1f}s)")
+    except KeyboardInterrupt:
+        if not quiet:
+            print("\n  Observación detenida")
+
+
+def _watch_state(python_backend):
+    """Caché y manifiesto iniciales de --watch (la huella de la caché depende del backend)"""
+    set_python_backend(python_backend)
+    return load_cache(ai_dir), build_manifest(str(project_dir))
+
+
+def _parse_float_option(argv, name):
+    """Lee --name S / --name=S de argv. Retorna None si no se indicó"""
+    for i, arg in enumerate(argv):
+        if arg.startswith(name + '='):
+            return max(0.05, float(arg.split('=', 1)[1]))
+        if arg == name and i + 1 < len(argv):
+            return max(0.05, float(argv[i + 1]))
+    return None
+
 
-def _write(path, content):
-    """Escribe contenido a archivo"""
-    with open(str(path), 'w', encoding='utf-8') as f:
-        f.write(content)
+def _parse_int_option(argv, name):
+    """Lee --name N / --name=N de argv. Retorna None si no se indicó"""
+    for i, arg in enumerate(argv):
+        if arg.startswith(name + '='):
+            return max(1, int(arg.split('=', 1)[1]))
+        if arg == name and i + 1 < len(argv):
+            return max(1, int(argv[i + 1]))
+    return None
 
 
 if __name__ == '__main__':
@@ -224,9 +316,33 @@ if __name__ == '__main__':
 
     quiet = '--quiet' in sys.argv
     verbose = '--verbose' in sys.argv or '-v' in sys.argv
+    incremental = '--incremental' in sys.argv
+    python_backend = 'ast' if '--python-ast' in sys.argv else 'regex'
+    profile_memory = '--profile-memory' in sys.argv
+    profile = '--profile' in sys.argv or profile_memory
+    serial = '--serial' in sys.argv
 
     try:
-        update_all(quiet=quiet, verbose=verbose)
+        jobs = _parse_int_option(sys.argv, '--jobs')
+        max_memory = _parse_int_option(sys.argv, '--max-memory')
+        if '--watch' in sys.argv:
+            interval = _parse_float_option(sys.argv, '--interval') or 1.0
+            watch(quiet=quiet, verbose=verbose, jobs=jobs, max_memory=max_memory,
+                  python_backend=python_backend, interval=interval,
+                  profile=profile, profile_memory=profile_memory, serial=serial)
+        elif '--staged' in sys.argv:
+            if profile:
+                enable_profiling(trace_memory=profile_memory)  # Incluye la consulta a git
+            staged = staged_source_files(str(project_dir))
+            if staged == []:
+                sys.exit(0)  # Ningún archivo fuente staged: el índice no cambia
+            update_all(quiet=quiet, verbose=verbose, incremental=True, jobs=jobs,
+                       max_memory=max_memory, python_backend=python_backend, changed_paths=staged,
+                       profile=profile, profile_memory=profile_memory, serial=serial)
+        else:
+            update_all(quiet=quiet, verbose=verbose, incremental=incremental,
+                       jobs=jobs, max_memory=max_memory, python_backend=python_backend,
+                       profile=profile, profile_memory=profile_memory, serial=serial)
     except Exception as e:
         if not quiet:
             print(f"  ERROR: {e}")
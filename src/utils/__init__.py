@@ -1,6 +1,8 @@
 """Utils modules - Utilidades auxiliares"""
 
 from .warnings import warn, vprint, show_warnings_summary, set_verbose, get_warnings
+from .files import write_if_changed, write_lines_if_changed
+from .fuzzy import normalize_name, name_trigrams
 
 __all__ = [
     'warn',
@@ -8,4 +10,8 @@ __all__ = [
     'show_warnings_summary',
     'set_verbose',
     'get_warnings',
+    'write_if_changed',
+    'write_lines_if_changed',
+    'normalize_name',
+    'name_trigrams',
 ]
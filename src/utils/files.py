@@ -0,0 +1,151 @@
+"""
+Escritura de archivos generados en .ai/.
+Evita reescribir archivos sin cambios y escribe de forma atómica.
+"""
+
+import os
+import tempfile
+
+# Caracteres por bloque al escribir por streaming (write_lines_if_changed)
+STREAM_CHUNK_CHARS = 64 * 1024
+
+
+def _default_mode():
+    """Permisos que tendría un archivo nuevo creado con open() (0666 & ~umask)"""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def write_if_changed(path, content):
+    """
+    Escribe content en path solo si difiere del contenido actual.
+
+    La escritura es atómica: se escribe a un archivo temporal en el mismo
+    directorio y se renombra con os.replace(), por lo que un lector (editor,
+    git, otro agente) nunca ve un archivo a medio escribir. Si el contenido es
+    idéntico, el archivo no se toca y conserva su mtime.
+
+    Args:
+        path: Ruta del archivo destino
+        content: Texto a escribir (UTF-8)
+
+    Returns:
+        True si el archivo se escribió, False si ya tenía ese contenido
+    """
+    path = str(path)
+    mode = None
+    try:
+        st = os.stat(path)
+        mode = st.st_mode & 0o777
+        with open(path, 'r', encoding='utf-8', newline=None) as f:
+            if f.read() == content:
+                return False
+    except (IOError, OSError, UnicodeDecodeError):
+        pass
+
+    _replace_atomic(path, mode, lambda f: f.write(content))
+    return True
+
+
+def write_lines_if_changed(path, lines):
+    """
+    Como write_if_changed(), pero por streaming: recibe las líneas (sin '\n')
+    de un iterable, normalmente un emisor emit_*() de los generadores.
+
+    Las líneas se agrupan en bloques de STREAM_CHUNK_CHARS y cada bloque se
+    compara con el archivo actual a medida que se genera. En cuanto uno
+    difiere, se escribe un temporal con el prefijo ya comparado (copiado del
+    archivo actual) y el resto de los bloques según llegan, así que la memoria
+    usada no depende del tamaño del archivo. Mismas garantías que
+    write_if_changed(): atómico y sin tocar el archivo si no cambió.
+
+    Returns:
+        True si el archivo se escribió, False si ya tenía ese contenido
+    """
+    path = str(path)
+    chunks = _iter_chunks(lines)
+    matched = 0     # caracteres iguales al archivo actual
+    pending = None  # primer bloque distinto
+    try:
+        mode = os.stat(path).st_mode & 0o777
+        current = open(path, 'r', encoding='utf-8', newline=None)
+    except (IOError, OSError):
+        mode = current = None
+
+    if current is not None:
+        # Las excepciones del emisor se propagan; solo los errores de lectura
+        # del archivo actual cuentan como "distinto"
+        with current:
+            for chunk in chunks:
+                if _read_or_none(current, len(chunk)) != chunk:
+                    pending = chunk
+                    break
+                matched += len(chunk)
+            else:
+                if _read_or_none(current, 1) == '':
+                    return False
+
+    def fill(f):
+        if matched:
+            _copy_prefix(path, f, matched)
+        if pending is not None:
+            f.write(pending)
+        for chunk in chunks:
+            f.write(chunk)
+
+    _replace_atomic(path, mode, fill)
+    return True
+
+
+def _read_or_none(f, count):
+    """f.read(count), o None si el archivo no se puede leer o no es UTF-8"""
+    try:
+        return f.read(count)
+    except (IOError, OSError, UnicodeDecodeError):
+        return None
+
+
+def _iter_chunks(lines):
+    """Agrupa líneas en bloques de texto de ~STREAM_CHUNK_CHARS caracteres"""
+    block, size = [], 0
+    for line in lines:
+        block.append(line)
+        block.append('\n')
+        size += len(line) + 1
+        if size >= STREAM_CHUNK_CHARS:
+            yield ''.join(block)
+            block, size = [], 0
+    if block:
+        yield ''.join(block)
+
+
+def _copy_prefix(path, dest, count):
+    """Copia a dest los primeros count caracteres de path (por bloques)"""
+    with open(path, 'r', encoding='utf-8', newline=None) as f:
+        while count > 0:
+            block = f.read(min(count, STREAM_CHUNK_CHARS))
+            if not block:
+                break
+            dest.write(block)
+            count -= len(block)
+
+
+def _replace_atomic(path, mode, fill):
+    """
+    Escribe path de forma atómica: fill(f) escribe en un temporal del mismo
+    directorio que luego se renombra con os.replace()
+    """
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            fill(f)
+        os.chmod(tmp_path, mode if mode is not None else _default_mode())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,31 @@
+"""
+Trigramas para la búsqueda aproximada de nombres.
+Lo usan tanto el motor (al escribir .ai/index.db) como .ai/query.py (al
+buscar), así ambos normalizan los nombres exactamente igual.
+"""
+
+import re
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_name(name):
+    """'create_user_handler' / 'createUserHandler' → 'createuserhandler'"""
+    return _NON_ALNUM.sub('', name.lower())
+
+
+def name_trigrams(name):
+    """
+    Conjunto de trigramas del nombre normalizado, con bordes.
+
+    Los bordes (' us', 'vc ') hacen que coincidir en el inicio o el final
+    del nombre pese más que coincidir en el medio.
+
+    Returns:
+        set de strings de 3 caracteres (vacío si el nombre no tiene letras ni dígitos)
+    """
+    norm = normalize_name(name)
+    if not norm:
+        return set()
+    padded = f" {norm} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
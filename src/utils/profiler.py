@@ -0,0 +1,375 @@
+"""
+Perfilado por etapas del pipeline de indexación (--profile).
+
+Registra tiempo real, tiempo de CPU, memoria y número de elementos de cada
+llamada al scanner, detectores, extractores y generadores, para saber cuál
+es el cuello de botella. Desactivado, cada función decorada solo hace una
+comprobación extra por llamada.
+
+Dos tipos de mediciones:
+    - Etapas: funciones decoradas con @profiled (una medición por llamada,
+      agrupadas por (tipo, nombre))
+    - Extractores: visitors por archivo de extract_file_record(). Se
+      acumulan por nombre porque se ejecutan miles de veces, y también en
+      los procesos del ProcessPoolExecutor (ver take_extractor_stats())
+"""
+
+import os
+import sys
+import json
+import time
+import datetime
+import platform
+import inspect
+import functools
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # Windows: sin getrusage, la memoria residente no está disponible
+    resource = None
+
+from .files import write_if_changed
+
+PROFILE_FILE = '.profile.json'
+
+# Incrementar cuando cambie el formato de .ai/.profile.json
+PROFILE_VERSION = 1
+
+_MB = 1024 * 1024
+
+# Estado global (None = perfilado desactivado)
+_STAGES = None      # [entrada por llamada] en orden de ejecución
+_STACK = []         # etapas abiertas (las etapas pueden anidarse)
+_EXTRACTORS = {}    # {nombre: [llamadas, real, cpu, elementos]}
+_STARTED = None     # (real, cpu, memoria trazada) al activar
+_TRACE = {'owned': False, 'peak': 0}
+
+
+def enable_profiling(trace_memory=False, origin=None):
+    """
+    Activa el perfilado (si ya estaba activo, conserva lo medido).
+
+    Args:
+        trace_memory: Medir además el pico de asignaciones de cada etapa con
+            tracemalloc. Hace el código Python varias veces más lento, así que
+            los tiempos dejan de ser comparables; los workers nunca lo usan
+        origin: perf_counter() desde el que se miden los inicios de etapa
+            (los workers usan el del proceso principal, ver profile_origin())
+    """
+    global _STAGES, _STARTED
+    if _STAGES is not None:
+        return
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _TRACE['owned'] = True
+    _STAGES = []
+    _STACK.clear()
+    _EXTRACTORS.clear()
+    current = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+    _TRACE['peak'] = current
+    _STARTED = (origin if origin is not None else time.perf_counter(), _cpu_time(), current)
+
+
+def disable_profiling():
+    """Desactiva el perfilado y descarta lo medido"""
+    global _STAGES, _STARTED
+    if _TRACE['owned']:
+        tracemalloc.stop()
+        _TRACE['owned'] = False
+    _STAGES = None
+    _STARTED = None
+    _STACK.clear()
+    _EXTRACTORS.clear()
+
+
+def is_profiling():
+    """True si el perfilado está activo"""
+    return _STAGES is not None
+
+
+def profile_origin():
+    """perf_counter() al activar el perfilado (None si está desactivado)"""
+    return _STARTED[0] if _STARTED is not None else None
+
+
+def _cpu_time():
+    """CPU del proceso más la de sus hijos ya terminados (ej: workers del pool)"""
+    t = os.times()
+    return time.process_time() + t.children_user + t.children_system
+
+
+def _peak_rss_mb():
+    """Memoria residente máxima (MB) del proceso; igual que core.scanner.peak_memory_mb"""
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # Linux reporta KB, macOS bytes
+    return peak / (_MB if sys.platform == 'darwin' else 1024)
+
+
+def _count_items(result):
+    """Elementos de un resultado: líneas si es texto, len() si es colección"""
+    if isinstance(result, str):
+        return result.count('\n')
+    if isinstance(result, (dict, list, tuple, set)):
+        return len(result)
+    return None
+
+
+def _enter_stage():
+    """Abre una etapa y retorna su marco de medición"""
+    tracing = tracemalloc.is_tracing() and hasattr(tracemalloc, 'reset_peak')
+    frame = {'tracing': tracing, 'wall': time.perf_counter(), 'cpu': _cpu_time(),
+             'mem': 0, 'peak': 0}
+    if tracing:
+        current, peak = tracemalloc.get_traced_memory()
+        if _STACK:
+            # reset_peak() borra el pico de la etapa padre: se lo guarda antes
+            _STACK[-1]['peak'] = max(_STACK[-1]['peak'], peak)
+        tracemalloc.reset_peak()
+        frame['mem'] = frame['peak'] = current
+    _STACK.append(frame)
+    return frame
+
+
+def _exit_stage(frame, kind, name, items):
+    """Cierra la etapa abierta más reciente y registra su medición"""
+    wall = time.perf_counter() - frame['wall']
+    cpu = _cpu_time() - frame['cpu']
+    _STACK.pop()
+    alloc = None
+    if frame['tracing']:
+        peak = max(tracemalloc.get_traced_memory()[1], frame['peak'])
+        alloc = (peak - frame['mem']) / _MB
+        _TRACE['peak'] = max(_TRACE['peak'], peak)
+        if _STACK:
+            _STACK[-1]['peak'] = max(_STACK[-1]['peak'], peak)
+    _STAGES.append({
+        'kind': kind,
+        'name': name,
+        'depth': len(_STACK),
+        'start_s': frame['wall'] - _STARTED[0],
+        'wall_s': wall,
+        'cpu_s': cpu,
+        'alloc_mb': alloc,
+        'rss_mb': _peak_rss_mb(),
+        'items': items,
+    })
+
+
+def profiled(kind, name=None, items=None):
+    """
+    Decorador: mide cada llamada a la función como una etapa.
+
+    En funciones generadoras (ej: emisores de YAML) la etapa abarca toda la
+    iteración, incluido lo que haga el consumidor entre elementos (escribir a
+    disco), y los elementos son los valores producidos.
+
+    Args:
+        kind: Tipo de etapa ('scan', 'detect', 'merge', 'generate', 'write')
+        name: Nombre en el informe (default: nombre de la función)
+        items: Función resultado -> número de elementos (default: líneas si
+            retorna texto, len() si retorna una colección)
+    """
+    def decorator(func):
+        stage_name = name or func.__name__
+        count = items or _count_items
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                if _STAGES is None:
+                    return (yield from func(*args, **kwargs))
+                frame = _enter_stage()
+                produced = 0
+                try:
+                    for item in func(*args, **kwargs):
+                        produced += 1
+                        yield item
+                except BaseException:
+                    _exit_stage(frame, kind, stage_name, None)
+                    raise
+                _exit_stage(frame, kind, stage_name, produced)
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _STAGES is None:
+                return func(*args, **kwargs)
+            frame = _enter_stage()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                _exit_stage(frame, kind, stage_name, None)
+                raise
+            _exit_stage(frame, kind, stage_name, count(result))
+            return result
+        return wrapper
+    return decorator
+
+
+def count_extractor(name, func, *args):
+    """Ejecuta func(*args) acumulando su tiempo en el extractor name"""
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    result = func(*args)
+    totals = _EXTRACTORS.get(name)
+    if totals is None:
+        totals = _EXTRACTORS[name] = [0, 0.0, 0.0, 0]
+    totals[0] += 1
+    totals[1] += time.perf_counter() - wall
+    totals[2] += time.process_time() - cpu
+    totals[3] += len(result) if isinstance(result, (dict, list)) else 0
+    return result
+
+
+def take_extractor_stats():
+    """Retorna y reinicia los acumulados de extractores (los workers los envían así)"""
+    stats = dict(_EXTRACTORS)
+    _EXTRACTORS.clear()
+    return stats
+
+
+def merge_extractor_stats(stats):
+    """Suma acumulados de extractores recibidos de otro proceso"""
+    for name, (calls, wall, cpu, n_items) in stats.items():
+        totals = _EXTRACTORS.get(name)
+        if totals is None:
+            totals = _EXTRACTORS[name] = [0, 0.0, 0.0, 0]
+        totals[0] += calls
+        totals[1] += wall
+        totals[2] += cpu
+        totals[3] += n_items
+
+
+def take_stages():
+    """Retorna y descarta las etapas registradas (los workers las envían así)"""
+    if not _STAGES:
+        return []
+    stages = list(_STAGES)
+    _STAGES.clear()
+    return stages
+
+
+def merge_stages(stages):
+    """Agrega etapas medidas en otro proceso, anidadas bajo la etapa abierta actual"""
+    if _STAGES is None:
+        return
+    for stage in stages:
+        _STAGES.append(dict(stage, depth=stage['depth'] + len(_STACK)))
+
+
+def _round(value, digits=4):
+    return round(value, digits) if value is not None else None
+
+
+def profile_report(context=None):
+    """
+    Informe de lo medido desde enable_profiling().
+
+    Las etapas con el mismo (tipo, nombre) se agrupan: tiempos y elementos
+    se suman y la memoria es el máximo. Los tiempos de los extractores son
+    la suma de todos los procesos.
+
+    Args:
+        context: Dict con datos de la ejecución (archivos, jobs, modo...)
+
+    Returns:
+        Dict serializable a JSON ({'version', 'created', 'python', 'platform',
+        'context', 'total', 'stages', 'extractors'})
+    """
+    if _STAGES is None:
+        return None
+
+    grouped = {}
+    for stage in _STAGES:
+        key = (stage['kind'], stage['name'])
+        entry = grouped.get(key)
+        if entry is None:
+            grouped[key] = dict(stage, calls=1)
+            continue
+        entry['calls'] += 1
+        entry['depth'] = min(entry['depth'], stage['depth'])
+        entry['wall_s'] += stage['wall_s']
+        entry['cpu_s'] += stage['cpu_s']
+        for field in ('alloc_mb', 'rss_mb'):
+            if stage[field] is not None:
+                entry[field] = max(entry[field] or 0, stage[field])
+        if stage['items'] is not None:
+            entry['items'] = (entry['items'] or 0) + stage['items']
+    # Las etapas se registran al cerrarse (los hijos antes que el padre):
+    # se ordenan por inicio de la primera llamada
+    stages = sorted(grouped.values(), key=lambda s: s['start_s'])
+
+    for stage in stages:
+        for field in ('start_s', 'wall_s', 'cpu_s', 'alloc_mb', 'rss_mb'):
+            stage[field] = _round(stage[field])
+
+    extractors = [
+        {'name': name, 'calls': calls, 'wall_s': _round(wall), 'cpu_s': _round(cpu), 'items': n_items}
+        for name, (calls, wall, cpu, n_items) in _EXTRACTORS.items()
+    ]
+    extractors.sort(key=lambda e: -e['wall_s'])
+
+    wall0, cpu0, mem0 = _STARTED
+    alloc = (_TRACE['peak'] - mem0) / _MB if tracemalloc.is_tracing() else None
+    return {
+        'version': PROFILE_VERSION,
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': sys.platform,
+        'context': context or {},
+        'total': {
+            'wall_s': _round(time.perf_counter() - wall0),
+            'cpu_s': _round(_cpu_time() - cpu0),
+            'alloc_mb': _round(alloc),
+            'rss_mb': _round(_peak_rss_mb()),
+        },
+        'stages': stages,
+        'extractors': extractors,
+    }
+
+
+def format_profile(report, top=25):
+    """
+    Tabla del informe ordenada por tiempo real (las etapas más lentas primero).
+
+    Returns:
+        Lista de líneas
+    """
+    rows = [(s['wall_s'], s['kind'], s['name'], s['calls'], s['cpu_s'], s['alloc_mb'], s['rss_mb'], s['items'])
+            for s in report['stages']]
+    rows += [(e['wall_s'], 'extract', e['name'], e['calls'], e['cpu_s'], None, None, e['items'])
+             for e in report['extractors']]
+    rows.sort(key=lambda r: -r[0])
+
+    def fmt(value, spec):
+        return format(value, spec) if value is not None else '-'
+
+    total = report['total']
+    lines = [
+        f"  Perfil: {total['wall_s']:.2f}s real, {total['cpu_s']:.2f}s CPU, "
+        f"alloc pico {fmt(total['alloc_mb'], '.1f')} MB, RSS pico {fmt(total['rss_mb'], '.0f')} MB",
+        f"  {'tipo':<9} {'nombre':<32} {'llamadas':>8} {'real(s)':>9} {'cpu(s)':>9} "
+        f"{'alloc(MB)':>9} {'rss(MB)':>8} {'elementos':>10}",
+    ]
+    for wall, kind, name, calls, cpu, alloc, rss, n_items in rows[:top]:
+        lines.append(
+            f"  {kind:<9} {name[:32]:<32} {calls:>8} {wall:>9.3f} {cpu:>9.3f} "
+            f"{fmt(alloc, '.1f'):>9} {fmt(rss, '.0f'):>8} {fmt(n_items, 'd'):>10}"
+        )
+    if len(rows) > top:
+        lines.append(f"  ... {len(rows) - top} más en {PROFILE_FILE}")
+    if report['extractors']:
+        lines.append("  (extract: suma de todos los procesos; alloc/rss no disponibles por extractor)")
+    return lines
+
+
+def write_profile(ai_dir, report):
+    """Guarda el informe en .ai/.profile.json (atómico). Retorna la ruta"""
+    path = os.path.join(str(ai_dir), PROFILE_FILE)
+    write_if_changed(path, json.dumps(report, indent=2, ensure_ascii=False) + '\n')
+    return path
@@ -50,3 +50,8 @@ def clear_warnings():
 def get_warnings():
     """Retorna lista de warnings acumulados"""
     return WARNINGS.copy()
+
+
+def extend_warnings(warnings):
+    """Agrega warnings ya registrados en otro proceso (workers del pool)"""
+    WARNINGS.extend(warnings)
@@ -6,20 +6,33 @@ import unittest
 import tempfile
 import os
 import shutil
+import subprocess
 import sys
+import json
 
-# Agregar src al path
+# Agregar src (y benchmarks, para el generador sintético) al path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
 
 from core.validators import check_python_version, check_git_installed, check_disk_space, check_write_permissions
-from core.scanner import scan_files, is_empty_project
-from core.detectors import detect_languages, detect_frameworks
+from core.scanner import scan_files, is_empty_project, iter_scanned_files, iter_source_files, peak_memory_mb
+from core.detectors import detect_languages, detect_frameworks, detect_monorepo
 from core.extractors import (
     extract_functions, extract_endpoints, extract_ui_components, extract_dependencies,
     extract_call_graph, extract_types_and_models, extract_docstrings,
     extract_config_map, extract_patterns
 )
+from core.cache import new_cache, load_cache, save_cache, scan_incremental, MIN_PARALLEL_FILES
+from core.extractors import merge_file_records, extract_all, extract_file_record, register_file_visitor, FILE_VISITORS
+from core.extractors import extract_python_ast, set_python_backend, build_file_index
 from templates.project_templates import suggest_template
+from utils.warnings import clear_warnings, get_warnings
+from utils.files import write_if_changed, write_lines_if_changed
+from utils.profiler import (
+    profiled, enable_profiling, disable_profiling, profile_report, format_profile, write_profile,
+    merge_extractor_stats, take_extractor_stats
+)
+from core.index_db import write_index_db, open_index_db, INDEX_DB_FILE
 from generators.all_generators import (
     generate_project_index, generate_all_yamls,
     generate_architecture_yaml, generate_flow_yaml, generate_graph_yaml,
@@ -27,8 +40,10 @@ from generators.all_generators import (
     generate_context_budget_yaml, generate_protocol_yaml,
     generate_context_anchor_yaml, generate_call_graph_yaml,
     generate_types_yaml, generate_docstrings_yaml, generate_config_map_yaml,
-    generate_entry_points_yaml, generate_patterns_yaml, generate_quick_context_yaml
+    generate_entry_points_yaml, generate_patterns_yaml, generate_quick_context_yaml,
+    emit_project_index, emit_call_graph_yaml
 )
+from generators.index_shards import plan_shards, prune_shards, write_sharded_index
 
 
 class TestValidators(unittest.TestCase):
@@ -92,6 +107,90 @@ class TestScanner(unittest.TestCase):
         self.assertEqual(files_map['test.py']['lines'], 2)
 
 
+    def _make_ignored_tree(self):
+        """Crea un árbol con .gitignore anidados y salida generada"""
+        for rel in ['src/app.py', 'src/gen/out.py', 'out/bundle.js', 'src/keep.log.py',
+                    'lib/util.py', 'lib/debug.py', 'node_modules/pkg/index.js']:
+            os.makedirs(os.path.join(self.tmpdir, os.path.dirname(rel)), exist_ok=True)
+            with open(os.path.join(self.tmpdir, rel), 'w') as f:
+                f.write('x = 1\n')
+        with open(os.path.join(self.tmpdir, '.gitignore'), 'w') as f:
+            f.write('# salida\nout/\n*.log.py\n!keep.log.py\n')
+        with open(os.path.join(self.tmpdir, 'lib', '.gitignore'), 'w') as f:
+            f.write('debug.py\n')
+        with open(os.path.join(self.tmpdir, 'src', '.gitignore'), 'w') as f:
+            f.write('/gen\n')
+
+    def _rel_files(self, **kwargs):
+        return sorted(os.path.relpath(p, self.tmpdir).replace(os.sep, '/')
+                      for p in iter_source_files(self.tmpdir, **kwargs))
+
+    def test_walker_honours_gitignore(self):
+        """Sin git, el recorrido respeta .gitignore anidados y negaciones"""
+        self._make_ignored_tree()
+        self.assertEqual(self._rel_files(use_git=False), ['lib/util.py', 'src/app.py', 'src/keep.log.py'])
+
+    def test_git_enumeration_matches_walker(self):
+        """Con git, se listan versionados + no ignorados, igual que el recorrido"""
+        self._make_ignored_tree()
+        try:
+            subprocess.run(['git', 'init', '-q'], cwd=self.tmpdir, check=True)
+        except (OSError, subprocess.CalledProcessError):
+            self.skipTest("git no disponible")
+        subprocess.run(['git', 'add', 'src/app.py'], cwd=self.tmpdir, check=True)
+        self.assertEqual(self._rel_files(), self._rel_files(use_git=False))
+
+        # Los archivos versionados borrados del working tree no se listan
+        os.remove(os.path.join(self.tmpdir, 'src', 'app.py'))
+        self.assertNotIn('src/app.py', self._rel_files())
+
+    def test_git_enumeration_includes_submodules(self):
+        """Los archivos de un submódulo se listan con git igual que con el recorrido"""
+        subrepo = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, subrepo, True)
+        git = ['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com',
+               '-c', 'protocol.file.allow=always']
+        try:
+            subprocess.run(['git', 'init', '-q'], cwd=subrepo, check=True)
+        except (OSError, subprocess.CalledProcessError):
+            self.skipTest("git no disponible")
+        for rel, content in [('lib.py', 'x = 1\n'), ('build/gen.py', 'x = 1\n'), ('.gitignore', 'build/\n')]:
+            os.makedirs(os.path.join(subrepo, os.path.dirname(rel)), exist_ok=True)
+            with open(os.path.join(subrepo, rel), 'w') as f:
+                f.write(content)
+        subprocess.run(['git', 'add', 'lib.py', '.gitignore'], cwd=subrepo, check=True)
+        subprocess.run(git + ['commit', '-q', '-m', 'sub'], cwd=subrepo, check=True)
+
+        with open(os.path.join(self.tmpdir, 'app.py'), 'w') as f:
+            f.write('x = 1\n')
+        subprocess.run(['git', 'init', '-q'], cwd=self.tmpdir, check=True)
+        subprocess.run(git + ['submodule', 'add', '-q', subrepo, 'vendored'], cwd=self.tmpdir,
+                       check=True, capture_output=True)
+        with open(os.path.join(self.tmpdir, 'vendored', 'local.py'), 'w') as f:
+            f.write('x = 1\n')
+
+        self.assertEqual(self._rel_files(), ['app.py', 'vendored/lib.py', 'vendored/local.py'])
+        self.assertEqual(self._rel_files(), self._rel_files(use_git=False))
+
+    def test_wait_for_changes(self):
+        """El sondeo detecta archivos modificados, nuevos y eliminados"""
+        from core.scanner import build_manifest, stat_snapshot, wait_for_changes
+        for name in ('a.py', 'b.py'):
+            with open(os.path.join(self.tmpdir, name), 'w') as f:
+                f.write('x = 1\n')
+        snapshot = stat_snapshot(build_manifest(self.tmpdir, use_git=False)['files'])
+
+        with open(os.path.join(self.tmpdir, 'a.py'), 'a') as f:
+            f.write('y = 2\n')
+        os.remove(os.path.join(self.tmpdir, 'b.py'))
+        open(os.path.join(self.tmpdir, 'c.py'), 'w').close()
+        manifest, new_snapshot, changed = wait_for_changes(
+            self.tmpdir, snapshot, interval=0.01, debounce=0.01, use_git=False)
+        self.assertEqual(changed, 3)
+        self.assertEqual(sorted(os.path.basename(f) for f in manifest['files']), ['a.py', 'c.py'])
+        self.assertEqual(new_snapshot, stat_snapshot(manifest['files']))
+
+
 class TestDetectors(unittest.TestCase):
     """Tests para detectores"""
     
@@ -122,6 +221,21 @@ class TestDetectors(unittest.TestCase):
         frameworks = detect_frameworks(self.tmpdir)
         self.assertIn('Django', frameworks['backend'])
 
+    def test_manifest_matches_disk_probes(self):
+        """Detectores y config map dan lo mismo con el manifiesto que sondeando el disco"""
+        from core.scanner import build_manifest
+        for name in ['manage.py', 'package.json', '.env', 'lerna.json']:
+            with open(os.path.join(self.tmpdir, name), 'w') as f:
+                f.write('{"dependencies": {"react": "18"}}' if name == 'package.json' else '{}')
+        os.makedirs(os.path.join(self.tmpdir, '.github'))
+
+        manifest = build_manifest(self.tmpdir)
+        self.assertEqual(sorted(os.path.basename(p) for p in manifest['files']),
+                         ['lerna.json', 'manage.py', 'package.json'])
+        self.assertEqual(detect_frameworks(self.tmpdir, manifest), detect_frameworks(self.tmpdir))
+        self.assertEqual(detect_monorepo(self.tmpdir, manifest), detect_monorepo(self.tmpdir))
+        self.assertEqual(extract_config_map({}, self.tmpdir, manifest), extract_config_map({}, self.tmpdir))
+
     def test_detect_frameworks_laravel(self):
         """Detecta Laravel por artisan"""
         open(os.path.join(self.tmpdir, 'artisan'), 'w').close()
@@ -304,6 +418,20 @@ class TestExtractors(unittest.TestCase):
         endpoints = extract_endpoints(files_map)
         self.assertTrue(len(endpoints) >= 2, f"Debe extraer al menos 2 endpoints Django, encontrados: {len(endpoints)}")
     
+    def test_extract_endpoints_line_numbers(self):
+        """Los números de línea de endpoints son exactos en archivos con muchas rutas"""
+        content = ["const router = express.Router()\n"]
+        for i in range(500):
+            content.append("\n")
+            content.append(f"router.get('/r{i}', function h{i}(req, res) {{}})\n")
+        files_map = {'routes.js': {'type': 'js', 'lines': len(content), 'content': content}}
+
+        endpoints = extract_endpoints(files_map)
+        self.assertEqual(len(endpoints), 500)
+        self.assertEqual(endpoints['GET /r0']['line'], 3)
+        self.assertEqual(endpoints['GET /r499']['line'], 1001)
+        self.assertEqual(endpoints['GET /r499']['handler'], 'h499')
+
     def test_extract_dependencies_python(self):
         """Extrae dependencias Python"""
         files_map = {
@@ -326,6 +454,29 @@ class TestExtractors(unittest.TestCase):
         self.assertIn('main.py', deps)
         self.assertIn('utils/helpers.py', deps['main.py'])
 
+    def test_extract_dependencies_resolution(self):
+        """Resuelve módulos con puntos, imports relativos, aliases y namespaces"""
+        def f(ext, *lines):
+            return {'type': ext, 'lines': len(lines), 'content': [l + '\n' for l in lines]}
+
+        files_map = {
+            'src/core/scanner.py': f('py', 'import os'),
+            'src/core/cache.py': f('py', 'from core.scanner import scan', 'from .scanner import x'),
+            'web/components/Button.vue': f('vue', '<template></template>'),
+            'web/pages/Home.js': f('js', "import Button from '../components/Button.vue'",
+                                   "import api from '@/services/api'", "import React from 'react'"),
+            'web/services/api.js': f('js', 'export default {}'),
+            'app/Models/User.php': f('php', '<?php'),
+            'app/Http/UserController.php': f('php', 'use App\\Models\\User;', "require_once '../helpers.php';"),
+            'app/helpers.php': f('php', '<?php'),
+        }
+
+        deps = extract_dependencies(files_map)
+        self.assertEqual(deps['src/core/cache.py'], ['src/core/scanner.py'])
+        self.assertEqual(deps['web/pages/Home.js'], ['web/components/Button.vue', 'web/services/api.js'])
+        self.assertEqual(deps['app/Http/UserController.php'], ['app/Models/User.php', 'app/helpers.php'])
+        self.assertNotIn('src/core/scanner.py', deps)
+
 
 class TestGenerators(unittest.TestCase):
     """Tests para generadores de YAML"""
@@ -459,6 +610,51 @@ class TestNewExtractors(unittest.TestCase):
         main_calls = graph['calls'].get('app.py::main', [])
         self.assertIn('app.py::process', main_calls)
 
+    def test_call_graph_scopes_common_names(self):
+        """Un nombre común se resuelve por clase, archivo e imports, no a todo el proyecto"""
+        files_map = {
+            'app.py': {'type': 'py', 'lines': 4, 'content': [
+                'from store import save\n',
+                'def main():\n',
+                '    save(1)\n',
+                '    helper()\n',
+            ]},
+            'store.py': {'type': 'py', 'lines': 2, 'content': [
+                'def save(x):\n', '    pass\n',
+            ]},
+            'cache.py': {'type': 'py', 'lines': 2, 'content': [
+                'def save(x):\n', '    pass\n',
+            ]},
+            'models.py': {'type': 'py', 'lines': 8, 'content': [
+                'class User:\n',
+                '    def save(self):\n',
+                '        pass\n',
+                '    def update(self):\n',
+                '        self.save()\n',
+                'class Order:\n',
+                '    def save(self):\n',
+                '        pass\n',
+            ]},
+            'util.py': {'type': 'py', 'lines': 2, 'content': [
+                'def helper():\n', '    pass\n',
+            ]},
+        }
+        functions = {
+            'app.py': {'main': 2},
+            'store.py': {'save': 1},
+            'cache.py': {'save': 1},
+            'models.py': {'User': 1, 'User.save': 2, 'User.update': 4,
+                          'Order': 6, 'Order.save': 7},
+            'util.py': {'helper': 1},
+        }
+        graph = extract_call_graph(files_map, functions)
+        # Import: solo store.save; nombre único en el proyecto: util.helper
+        self.assertEqual(graph['calls']['app.py::main'], ['store.py::save', 'util.py::helper'])
+        # Misma clase gana sobre otras clases del mismo archivo
+        self.assertEqual(graph['calls']['models.py::User.update'], ['models.py::User.save'])
+        self.assertNotIn('cache.py::save', graph['called_by'])
+        self.assertNotIn('models.py::Order.save', graph['called_by'])
+
     def test_extract_types_and_models(self):
         """Extrae tipos y modelos de Python"""
         files_map = {
@@ -612,6 +808,48 @@ class TestNewGenerators(unittest.TestCase):
         )
         self.assertIn('ENTRY POINTS', content)
 
+    def test_emitters_match_generate(self):
+        """emit_*() produce las mismas líneas que el texto de generate_*()"""
+        call_graph = {'calls': {'app.py::main': ['app.py::create_app']},
+                      'called_by': {'app.py::create_app': ['app.py::main']}}
+        args = ('/tmp/p', self.project_name, self.languages, self.frameworks, self.files_map,
+                self.functions, self.endpoints, self.components, {})
+        text = generate_project_index(*args)
+        self.assertTrue(text.endswith('\n'))
+        self.assertEqual(list(emit_project_index(*args)), text[:-1].split('\n'))
+        self.assertEqual(''.join(line + '\n' for line in emit_call_graph_yaml(call_graph)),
+                         generate_call_graph_yaml(call_graph))
+        self.assertEqual(generate_call_graph_yaml.__name__, 'generate_call_graph_yaml')
+
+    def test_file_index(self):
+        """Índices inversos por archivo en orden de aparición; mismo YAML que sin ellos"""
+        endpoints = {
+            'GET /a': {'handler': 'a', 'file': 'api.py', 'line': 1},
+            'GET /b': {'handler': 'b', 'file': 'app.py', 'line': 2},
+            'POST /a': {'handler': 'c', 'file': 'api.py', 'line': 3},
+        }
+        components = {'Card': {'file': 'Card.vue', 'props': [], 'emits': []}}
+        types = {'User': {'file': 'models.py', 'line': 1, 'kind': 'class'}}
+        env_vars = [{'name': 'DEBUG', 'file': 'app.py', 'line': 4}]
+        index = build_file_index(endpoints, components, types, env_vars)
+        self.assertEqual(index, {
+            'endpoints': {'api.py': ['GET /a', 'POST /a'], 'app.py': ['GET /b']},
+            'components': {'Card.vue': ['Card']},
+            'types': {'models.py': ['User']},
+            'env_vars': {'app.py': ['DEBUG']},
+        })
+
+        files_map = dict(self.files_map, **{'api.py': {'type': 'py', 'lines': 3},
+                                            'Card.vue': {'type': 'vue', 'lines': 9}})
+        call_graph = {'calls': {}, 'called_by': {}}
+        self.assertEqual(
+            generate_context_budget_yaml(files_map, self.functions, endpoints, components, index),
+            generate_context_budget_yaml(files_map, self.functions, endpoints, components))
+        content = generate_entry_points_yaml(files_map, self.functions, endpoints, components, {}, call_graph, index)
+        self.assertEqual(content, generate_entry_points_yaml(
+            files_map, self.functions, endpoints, components, {}, call_graph))
+        self.assertIn('2: api.py', content)
+
     def test_generate_patterns_yaml(self):
         """Genera PATTERNS.yaml"""
         patterns = {
@@ -647,6 +885,922 @@ class TestNewGenerators(unittest.TestCase):
         self.assertIn('PENDIENTE', content)
 
 
+def _count_lines_visitor(ctx):
+    """Visitor de prueba a nivel de módulo (serializable con pickle)"""
+    return len(ctx['lines'])
+
+
+class TestIncrementalCache(unittest.TestCase):
+    """Tests para la caché incremental por archivo"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.ai_dir = os.path.join(self.tmpdir, '.ai')
+        with open(os.path.join(self.tmpdir, 'app.py'), 'w') as f:
+            f.write('def main():\n    helper()\n\ndef helper():\n    pass\n')
+        with open(os.path.join(self.tmpdir, 'api.py'), 'w') as f:
+            f.write('@app.get("/users")\ndef list_users():\n    return []\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_merge_matches_full_extraction(self):
+        """Los registros combinados equivalen a los extractores globales"""
+        files_map, records, stats = scan_incremental(self.tmpdir, new_cache())
+        self.assertEqual(stats['extracted'], 2)
+        full_map = scan_files(self.tmpdir)
+        self.assertEqual({k: (v['type'], v['lines']) for k, v in files_map.items()},
+                         {k: (v['type'], v['lines']) for k, v in full_map.items()})
+
+        results = merge_file_records(records, self.tmpdir)
+        functions = extract_functions(full_map)
+        self.assertEqual(results['functions'], functions)
+        self.assertEqual(results['endpoints'], extract_endpoints(full_map))
+        self.assertEqual(results['call_graph'], extract_call_graph(full_map, functions))
+
+    def test_second_scan_reuses_records(self):
+        """Un segundo escaneo sin cambios no re-extrae nada"""
+        cache = new_cache()
+        scan_incremental(self.tmpdir, cache)
+        save_cache(self.ai_dir, cache)
+
+        cache = load_cache(self.ai_dir)
+        _, _, stats = scan_incremental(self.tmpdir, cache)
+        self.assertEqual(stats, {'reused': 2, 'extracted': 0, 'removed': 0, 'workers_peak_mb': 0})
+
+    def test_modified_and_removed_files(self):
+        """Solo se re-extraen archivos modificados; los eliminados se descartan"""
+        cache = new_cache()
+        scan_incremental(self.tmpdir, cache)
+
+        with open(os.path.join(self.tmpdir, 'app.py'), 'w') as f:
+            f.write('def main():\n    pass\n\ndef renamed():\n    pass\n')
+        os.remove(os.path.join(self.tmpdir, 'api.py'))
+
+        _, records, stats = scan_incremental(self.tmpdir, cache)
+        self.assertEqual(stats, {'reused': 0, 'extracted': 1, 'removed': 1, 'workers_peak_mb': 0})
+        self.assertIn('renamed', records['app.py']['functions'])
+        self.assertNotIn('api.py', cache['files'])
+
+    def test_corrupt_cache_is_rebuilt(self):
+        """Una caché ilegible se reemplaza por una vacía"""
+        os.makedirs(self.ai_dir)
+        with open(os.path.join(self.ai_dir, '.cache.json'), 'w') as f:
+            f.write('{no es json')
+        self.assertEqual(load_cache(self.ai_dir)['files'], {})
+
+    def test_streaming_scan(self):
+        """iter_scanned_files entrega los mismos archivos que scan_files, uno a uno"""
+        self.assertEqual(dict(iter_scanned_files(self.tmpdir)), scan_files(self.tmpdir))
+
+    def test_max_memory_guard(self):
+        """Superar max_memory_mb registra una advertencia con el archivo"""
+        if peak_memory_mb() is None:
+            self.skipTest("getrusage no disponible")
+        clear_warnings()
+        scan_incremental(self.tmpdir, new_cache(), max_memory_mb=1)
+        self.assertEqual(len([w for w in get_warnings() if 'Memoria pico' in w]), 1)
+        clear_warnings()
+
+    def test_changes_yaml_uses_scan_hash(self):
+        """CHANGES.yaml usa el hash del escaneo y detecta modificaciones"""
+        files_map, _, _ = scan_incremental(self.tmpdir, new_cache())
+        self.assertIn('summary:\n  total_files: 2\n  changed: 0\n  added: 2', generate_changes_yaml(self.tmpdir, files_map))
+
+        with open(os.path.join(self.tmpdir, 'app.py'), 'a') as f:
+            f.write('# cambio\n')
+        files_map, _, _ = scan_incremental(self.tmpdir, new_cache())
+        self.assertIn('changed: 1\n  added: 0', generate_changes_yaml(self.tmpdir, files_map))
+
+    def test_changed_paths_only(self):
+        """Con changed_paths solo se revisan esos archivos; el resto sale de la caché"""
+        from core.cache import cached_file_list
+        from core.scanner import build_manifest
+        cache = new_cache()
+        scan_incremental(self.tmpdir, cache)
+        with open(os.path.join(self.tmpdir, 'app.py'), 'a') as f:
+            f.write('\ndef unstaged():\n    pass\n')
+        with open(os.path.join(self.tmpdir, 'new.py'), 'w') as f:
+            f.write('def staged():\n    pass\n')
+        os.remove(os.path.join(self.tmpdir, 'api.py'))
+
+        changed = ['new.py', 'api.py']
+        files = cached_file_list(self.tmpdir, cache, changed)
+        self.assertEqual([os.path.basename(f) for f in files], ['app.py', 'new.py'])
+        manifest = build_manifest(self.tmpdir, files=files)
+        _, records, stats = scan_incremental(self.tmpdir, cache, manifest=manifest, changed_paths=changed)
+        self.assertEqual(stats, {'reused': 1, 'extracted': 1, 'removed': 1, 'workers_peak_mb': 0})
+        self.assertNotIn('unstaged', records['app.py']['functions'])
+        self.assertIn('staged', records['new.py']['functions'])
+
+    def test_staged_source_files(self):
+        """Lista los archivos fuente staged, incluidos los eliminados"""
+        from core.scanner import staged_source_files
+        try:
+            subprocess.run(['git', 'init', '-q'], cwd=self.tmpdir, check=True)
+        except (OSError, subprocess.CalledProcessError):
+            self.skipTest("git no disponible")
+        self.assertEqual(staged_source_files(self.tmpdir), [])
+        open(os.path.join(self.tmpdir, 'logo.png'), 'w').close()
+        subprocess.run(['git', 'add', 'app.py', 'logo.png'], cwd=self.tmpdir, check=True)
+        self.assertEqual(staged_source_files(self.tmpdir), ['app.py'])
+
+    def test_partial_scan_keeps_racy_window(self):
+        """Un escaneo con changed_paths no da por confiables entradas que no revisó"""
+        import core.cache as cache_module
+        app_path = os.path.join(self.tmpdir, 'app.py')
+        mtime_ns = os.stat(app_path).st_mtime_ns
+        real_time = cache_module.time
+
+        class Clock:
+            now = mtime_ns + 10**9  # app.py queda dentro de la ventana de este escaneo
+            time_ns = staticmethod(lambda: Clock.now)
+
+        cache = new_cache()
+        cache_module.time = Clock
+        try:
+            scan_incremental(self.tmpdir, cache)
+            scanned_ns = cache['scanned_ns']
+            Clock.now += 5 * 10**9
+            scan_incremental(self.tmpdir, cache, changed_paths=['api.py'])
+            self.assertEqual(cache['scanned_ns'], scanned_ns)
+
+            # Mismo tamaño y mtime, otro contenido: solo el hash lo detecta
+            with open(app_path, 'w') as f:
+                f.write('def main():\n    helper()\n\ndef helpe2():\n    pass\n')
+            os.utime(app_path, ns=(mtime_ns, mtime_ns))
+            _, records, stats = scan_incremental(self.tmpdir, cache)
+        finally:
+            cache_module.time = real_time
+        self.assertIn('helpe2', records['app.py']['functions'])
+        self.assertEqual(stats['extracted'], 1)
+
+    def test_registered_visitor_invalidates_cache(self):
+        """Registrar un visitor cambia la huella: la caché anterior no se reutiliza"""
+        cache = new_cache()
+        scan_incremental(self.tmpdir, cache)
+        save_cache(self.ai_dir, cache)
+        saved = list(FILE_VISITORS)
+        try:
+            register_file_visitor('n_lines', _count_lines_visitor)
+            cache = load_cache(self.ai_dir)
+            self.assertEqual(cache['files'], {})
+            _, records, _ = scan_incremental(self.tmpdir, cache)
+            self.assertEqual(records['app.py']['n_lines'], 5)
+        finally:
+            FILE_VISITORS[:] = saved
+
+    def test_registered_visitor_in_merge(self):
+        """merge_file_records expone la salida de los visitors registrados en results['extra']"""
+        saved = list(FILE_VISITORS)
+        try:
+            register_file_visitor('n_lines', _count_lines_visitor)
+            _, records, _ = scan_incremental(self.tmpdir, new_cache())
+            results = merge_file_records(records, self.tmpdir)
+        finally:
+            FILE_VISITORS[:] = saved
+        self.assertEqual(results['extra']['n_lines']['app.py'], 5)
+        self.assertEqual(set(results['extra']['n_lines']), set(records))
+        self.assertEqual(merge_file_records(records, self.tmpdir)['extra'], {})
+
+    def test_visitor_code_change_invalidates_cache(self):
+        """Un visitor con el mismo nombre pero otro código cambia la huella"""
+        from core.cache import _engine_fingerprint
+        versions = []
+        for body in ('return 1', 'return 2'):
+            namespace = {'__name__': 'plugin_visitors'}
+            exec(f"def visitor(ctx):\n    {body}\n", namespace)
+            versions.append(namespace['visitor'])
+        saved = list(FILE_VISITORS)
+        try:
+            fingerprints = []
+            for visitor in versions:
+                register_file_visitor('plugin', visitor)
+                fingerprints.append(_engine_fingerprint())
+        finally:
+            FILE_VISITORS[:] = saved
+        self.assertNotEqual(fingerprints[0], fingerprints[1])
+
+    def test_registered_visitor_in_workers(self):
+        """Los workers reciben los visitors registrados; si no son serializables se extrae en serie"""
+        from core.cache import _init_worker
+        for i in range(MIN_PARALLEL_FILES):
+            with open(os.path.join(self.tmpdir, f'mod_{i}.py'), 'w') as f:
+                f.write(f'def func_{i}():\n    pass\n')
+        saved = list(FILE_VISITORS)
+        try:
+            # Como un worker con spawn: solo los visitors del motor, más los del initializer
+            _init_worker('regex', False, [('n_lines', _count_lines_visitor)])
+            self.assertEqual(FILE_VISITORS[-1], ('n_lines', _count_lines_visitor))
+            _, records, stats = scan_incremental(self.tmpdir, new_cache(), jobs=2)
+            self.assertEqual(records['mod_0.py']['n_lines'], 2)
+            if peak_memory_mb() is not None:
+                self.assertGreater(stats['workers_peak_mb'], 0)  # extraído en el pool
+
+            clear_warnings()
+            register_file_visitor('n_lines', lambda ctx: len(ctx['lines']))
+            _, records, stats = scan_incremental(self.tmpdir, new_cache(), jobs=2)
+            self.assertEqual(records['mod_0.py']['n_lines'], 2)
+            self.assertEqual(stats['workers_peak_mb'], 0)
+            self.assertEqual(len([w for w in get_warnings() if 'pickle' in w]), 1)
+        finally:
+            FILE_VISITORS[:] = saved
+            clear_warnings()
+
+    def test_parallel_matches_serial(self):
+        """La extracción con varios procesos produce el mismo resultado que en serie"""
+        for i in range(MIN_PARALLEL_FILES):
+            with open(os.path.join(self.tmpdir, f'mod_{i}.py'), 'w') as f:
+                f.write(f'def func_{i}():\n    helper()\n')
+
+        serial_cache = new_cache()
+        serial = scan_incremental(self.tmpdir, serial_cache, jobs=1)
+        parallel_cache = new_cache()
+        parallel = scan_incremental(self.tmpdir, parallel_cache, jobs=2)
+        self.assertEqual(serial[:2], parallel[:2])
+        serial_peak = serial[2].pop('workers_peak_mb')
+        parallel_peak = parallel[2].pop('workers_peak_mb')
+        self.assertEqual(serial[2], parallel[2])
+        # En serie no hay workers; en paralelo cada worker reporta su memoria
+        self.assertEqual(serial_peak, 0)
+        if peak_memory_mb() is not None:
+            self.assertGreater(parallel_peak, 0)
+        self.assertEqual(list(serial[1]), list(parallel[1]))
+        self.assertEqual(serial_cache['files'], parallel_cache['files'])
+
+
+class TestSinglePassEngine(unittest.TestCase):
+    """Tests para el motor de extracción de una sola pasada"""
+
+    def setUp(self):
+        self.files_map = {
+            'app.py': {'type': 'py', 'lines': 6, 'content': [
+                'import os\n', 'DB = os.getenv("DB_URL")\n', '\n',
+                '@app.get("/items")\n', 'def list_items():\n', '    return load()\n',
+            ]},
+            'util.js': {'type': 'js', 'lines': 2, 'content': [
+                'export function load() {\n', '  return fetch("/api/items")\n',
+            ]},
+        }
+
+    def test_extract_all_matches_individual_extractors(self):
+        """extract_all produce lo mismo que los nueve extract_* por separado"""
+        results = extract_all(self.files_map, '.')
+        functions = extract_functions(self.files_map)
+        self.assertEqual(results['functions'], functions)
+        self.assertEqual(results['endpoints'], extract_endpoints(self.files_map))
+        self.assertEqual(results['components'], extract_ui_components(self.files_map))
+        self.assertEqual(results['dependencies'], extract_dependencies(self.files_map))
+        self.assertEqual(results['call_graph'], extract_call_graph(self.files_map, functions))
+        self.assertEqual(results['types'], extract_types_and_models(self.files_map))
+        self.assertEqual(results['docstrings'], extract_docstrings(self.files_map, functions))
+        self.assertEqual(results['config_map'], extract_config_map(self.files_map, '.'))
+        self.assertEqual(results['patterns'], extract_patterns(self.files_map, functions, {}))
+
+    def test_register_file_visitor(self):
+        """Un visitor registrado recibe el contexto y las salidas previas"""
+        saved = list(FILE_VISITORS)
+        try:
+            register_file_visitor('n_funcs', lambda ctx: len(ctx['record']['functions']))
+            record = extract_file_record('app.py', self.files_map['app.py'])
+            self.assertEqual(record['n_funcs'], 1)
+        finally:
+            FILE_VISITORS[:] = saved
+
+
+class TestPythonAstBackend(unittest.TestCase):
+    """Tests para el backend AST de archivos .py"""
+
+    SOURCE = (
+        'from dataclasses import dataclass\n'
+        '\n'
+        '@dataclass\n'
+        'class User:\n'
+        '    """Usuario del sistema"""\n'
+        '    name: str\n'
+        '    age: int = 0\n'
+        '\n'
+        '    @property\n'
+        '    def label(self):\n'
+        '        return fmt(self.name)\n'
+        '\n'
+        'def outer(x):\n'
+        '    """Procesa x.\n'
+        '\n'
+        '    :param x: valor\n'
+        '    """\n'
+        '    def inner():\n'
+        '        return save(x)\n'
+        '    if x:\n'
+        '        load(x)\n'
+        '    return inner()\n'
+    )
+
+    def tearDown(self):
+        set_python_backend('regex')
+
+    def test_functions_with_nesting(self):
+        """Nombra métodos y funciones anidadas con su ruta completa"""
+        result = extract_python_ast('app.py', self.SOURCE)
+        self.assertEqual(result['functions'], {
+            '@dataclass User': 4, 'User.@property label': 10, 'outer': 13, 'outer.inner': 18,
+        })
+
+    def test_calls_per_body(self):
+        """Las llamadas de una función anidada no se atribuyen a la externa"""
+        calls = dict(extract_python_ast('app.py', self.SOURCE)['calls'])
+        self.assertEqual(calls['outer'], ['inner', 'load'])
+        self.assertEqual(calls['outer.inner'], ['save'])
+        self.assertEqual(calls['User.@property label'], ['fmt'])
+
+    def test_types_and_docstrings(self):
+        """Extrae campos de dataclass y docstrings con parámetros"""
+        result = extract_python_ast('app.py', self.SOURCE)
+        self.assertEqual(result['types']['User']['fields'],
+                         [{'name': 'name', 'type': 'str'}, {'name': 'age', 'type': 'int'}])
+        self.assertEqual(result['types']['User']['kind'], 'dataclass')
+        doc = result['docstrings']['app.py::outer']
+        self.assertEqual(doc['description'], 'Procesa x.')
+        self.assertEqual(doc['params'][0]['name'], 'x')
+
+    def test_engine_uses_backend_and_falls_back(self):
+        """El motor usa AST si está activo y regex si el archivo no parsea"""
+        lines = self.SOURCE.splitlines(True)
+        set_python_backend('ast')
+        record = extract_file_record('app.py', {'type': 'py', 'lines': len(lines), 'content': lines})
+        self.assertIn('outer.inner', record['functions'])
+
+        broken = ['def ok():\n', '    pass\n', 'print "py2"\n']
+        record = extract_file_record('old.py', {'type': 'py', 'lines': 3, 'content': broken})
+        self.assertEqual(record['functions'], {'ok': 1})
+
+    def test_unknown_backend(self):
+        """Un backend desconocido se rechaza"""
+        with self.assertRaises(ValueError):
+            set_python_backend('cst')
+
+
+class TestFileWriter(unittest.TestCase):
+    """Tests para la escritura atómica de YAML"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'INDEX.yaml')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_skips_identical_content(self):
+        """No reescribe (ni cambia mtime) si el contenido es idéntico"""
+        self.assertTrue(write_if_changed(self.path, 'a: 1\n'))
+        os.utime(self.path, ns=(0, 0))
+        self.assertFalse(write_if_changed(self.path, 'a: 1\n'))
+        self.assertEqual(os.stat(self.path).st_mtime_ns, 0)
+
+    def test_replaces_changed_content(self):
+        """Reescribe el contenido distinto sin dejar temporales"""
+        write_if_changed(self.path, 'a: 1\n')
+        self.assertTrue(write_if_changed(self.path, 'a: 2\n'))
+        with open(self.path, encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'a: 2\n')
+        self.assertEqual(os.listdir(self.tmpdir), ['INDEX.yaml'])
+
+    def test_streaming_lines(self):
+        """write_lines_if_changed escribe lo mismo que write_if_changed, por bloques"""
+        import utils.files
+        lines = [f"key_{i}: {i}" for i in range(200)]
+        text = ''.join(line + '\n' for line in lines)
+        chunk = utils.files.STREAM_CHUNK_CHARS
+        utils.files.STREAM_CHUNK_CHARS = 64  # varios bloques
+        try:
+            self.assertTrue(write_lines_if_changed(self.path, iter(lines)))
+            self.assertFalse(write_if_changed(self.path, text))
+            os.utime(self.path, ns=(0, 0))
+            self.assertFalse(write_lines_if_changed(self.path, iter(lines)))
+            self.assertEqual(os.stat(self.path).st_mtime_ns, 0)
+
+            # Cambio a mitad (prefijo copiado del archivo actual) y archivo más corto
+            for new_lines in (lines[:150] + ['changed: 1'] + lines[151:], lines[:20]):
+                self.assertTrue(write_lines_if_changed(self.path, iter(new_lines)))
+                with open(self.path, encoding='utf-8') as f:
+                    self.assertEqual(f.read(), ''.join(line + '\n' for line in new_lines))
+        finally:
+            utils.files.STREAM_CHUNK_CHARS = chunk
+        self.assertEqual(os.listdir(self.tmpdir), ['INDEX.yaml'])
+
+    def test_streaming_emitter_error_keeps_file(self):
+        """Si el emisor falla a mitad, el archivo anterior queda intacto"""
+        write_if_changed(self.path, 'a: 1\n')
+
+        def failing():
+            yield 'b: 2'
+            raise ValueError('boom')
+
+        with self.assertRaises(ValueError):
+            write_lines_if_changed(self.path, failing())
+        with open(self.path, encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'a: 1\n')
+        self.assertEqual(os.listdir(self.tmpdir), ['INDEX.yaml'])
+
+
+class _IndexedProject:
+    """Proyecto mínimo (modelo, endpoint, llamada, variable de entorno) ya escaneado"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.ai_dir = os.path.join(self.tmpdir, '.ai')
+        files = {
+            'models.py': 'import os\n\nclass User:\n    def save(self):\n        return os.getenv("DB_URL")\n',
+            'api.py': ('from flask import Flask\nfrom models import User\napp = Flask(__name__)\n\n'
+                       "@app.route('/users', methods=['POST'])\n"
+                       'def create_user():\n    return User().save()\n'),
+        }
+        for name, content in files.items():
+            with open(os.path.join(self.tmpdir, name), 'w') as f:
+                f.write(content)
+        self.files_map, records, _ = scan_incremental(self.tmpdir, new_cache())
+        self.results = merge_file_records(records, self.tmpdir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+
+class TestIndexDb(_IndexedProject, unittest.TestCase):
+    """Tests para el índice binario .ai/index.db"""
+
+    def test_point_lookups(self):
+        """Símbolos, llamadas, endpoints y variables de entorno se consultan por índice"""
+        self.assertTrue(write_index_db(self.ai_dir, self.files_map, self.results))
+        conn = open_index_db(self.ai_dir)
+        try:
+            row = conn.execute("SELECT f.path, s.line FROM symbols s JOIN files f ON f.id = s.file_id "
+                               "WHERE s.short_name = 'save'").fetchone()
+            self.assertEqual(row, ('models.py', 4))
+            callers = conn.execute("SELECT a.name FROM calls c JOIN symbols a ON a.id = c.caller "
+                                   "JOIN symbols b ON b.id = c.callee WHERE b.name = 'User.save'").fetchall()
+            self.assertEqual(callers, [('create_user',)])
+            self.assertEqual(conn.execute("SELECT handler FROM endpoints WHERE method = 'POST' "
+                                          "AND path = '/users'").fetchone(), ('create_user',))
+            self.assertEqual(conn.execute("SELECT line FROM env_vars WHERE name = 'DB_URL'").fetchone(), (5,))
+            plan = ' '.join(r[-1] for r in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM symbols WHERE name = 'User.save'"))
+            self.assertIn('USING INDEX', plan)
+        finally:
+            conn.close()
+
+    def test_unchanged_index_not_rewritten(self):
+        """Con los mismos datos el archivo no se reescribe"""
+        write_index_db(self.ai_dir, self.files_map, self.results)
+        db_path = os.path.join(self.ai_dir, INDEX_DB_FILE)
+        os.utime(db_path, ns=(0, 0))
+        self.assertFalse(write_index_db(self.ai_dir, self.files_map, self.results))
+        self.assertEqual(os.stat(db_path).st_mtime_ns, 0)
+        self.assertEqual(os.listdir(self.ai_dir), [INDEX_DB_FILE])
+
+    def test_missing_index(self):
+        """Sin index.db, open_index_db retorna None"""
+        self.assertIsNone(open_index_db(self.ai_dir))
+
+
+class TestGenerationStage(_IndexedProject, unittest.TestCase):
+    """Tests para la etapa de generación (serie y en paralelo)"""
+
+    def _generate(self, name, jobs):
+        import generators.runner as runner
+        ai_dir = os.path.join(self.tmpdir, name)
+        os.makedirs(ai_dir)
+        # CHANGES.yaml compara contra el estado de la ejecución anterior
+        shutil.rmtree(os.path.join(self.tmpdir, '.ai'), ignore_errors=True)
+        minimum = runner.MIN_PARALLEL_GENERATION_FILES
+        runner.MIN_PARALLEL_GENERATION_FILES = 0  # forzar el pool con un proyecto mínimo
+        try:
+            outputs = runner.run_generation(ai_dir, self.tmpdir, 'demo', ['Python'], {'backend': ['Flask']},
+                                            self.files_map, self.results, jobs=jobs)
+        finally:
+            runner.MIN_PARALLEL_GENERATION_FILES = minimum
+        contents = {}
+        for filename, _ in outputs:
+            if filename.endswith('.yaml'):
+                with open(os.path.join(ai_dir, filename), encoding='utf-8') as f:
+                    contents[filename] = f.read()
+        return outputs, contents
+
+    def test_parallel_matches_serial(self):
+        """Mismos archivos, contenido y orden en serie y con varios procesos"""
+        serial, serial_contents = self._generate('serial', 1)
+        parallel, parallel_contents = self._generate('parallel', 2)
+        self.assertEqual(serial, parallel)
+        self.assertEqual(serial_contents, parallel_contents)
+        self.assertEqual(serial[0], ('PROJECT_INDEX.yaml', True))
+        self.assertEqual(serial[-1], (INDEX_DB_FILE, True))
+        # Sin tipos en el proyecto TYPES.yaml no aplica en ningún modo
+        self.assertNotIn('TYPES.yaml', serial_contents)
+        self.assertIn('CHANGES.yaml', serial_contents)
+
+    def test_without_fork_generates_serially(self):
+        """Sin fork no se arranca el pool (spawn copiaría los resultados a cada worker)"""
+        import generators.runner as runner
+
+        def no_pool(*args, **kwargs):
+            raise AssertionError("no debe arrancar el pool")
+
+        saved = runner._fork_context, runner.ProcessPoolExecutor
+        runner._fork_context, runner.ProcessPoolExecutor = (lambda: None), no_pool
+        try:
+            outputs, contents = self._generate('nofork', 2)
+        finally:
+            runner._fork_context, runner.ProcessPoolExecutor = saved
+        self.assertEqual(outputs[0], ('PROJECT_INDEX.yaml', True))
+        self.assertIn('create_user', contents['PROJECT_INDEX.yaml'])
+
+    def test_parallel_profile_merges_worker_stages(self):
+        """Con --profile las etapas de los workers llegan una vez, bajo 'generation'"""
+        enable_profiling()
+        try:
+            self._generate('profiled', 2)
+            stages = {s['name']: s for s in profile_report()['stages']}
+        finally:
+            disable_profiling()
+        self.assertEqual(stages['generation']['depth'], 0)
+        self.assertEqual(stages['emit_project_index']['calls'], 1)
+        self.assertEqual(stages['emit_project_index']['depth'], 1)
+        self.assertEqual(stages[INDEX_DB_FILE]['calls'], 1)
+
+
+class TestIndexShards(unittest.TestCase):
+    """Tests para PROJECT_INDEX fragmentado en .ai/index/"""
+
+    FILES = {
+        'app.py': 'def main():\n    pass\n',
+        os.path.join('api', 'users.py'): ("from flask import Flask\napp = Flask(__name__)\n\n"
+                                          "@app.route('/users')\ndef list_users():\n    pass\n"),
+        os.path.join('api', 'items.py'): 'def list_items():\n    pass\n',
+        os.path.join('lib', 'util.py'): 'def helper():\n    pass\n',
+        os.path.join('lib', 'deep', 'x.py'): 'def deep():\n    pass\n',
+    }
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.ai_dir = os.path.join(self.tmpdir, '.ai')
+        for name, content in self.FILES.items():
+            self._put(name, content)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _put(self, name, content):
+        path = os.path.join(self.tmpdir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+
+    def _write(self):
+        files_map, records, _ = scan_incremental(self.tmpdir, new_cache())
+        results = merge_file_records(records, self.tmpdir)
+        return write_sharded_index(self.ai_dir, self.tmpdir, 'demo', ['Python'], {}, files_map, results,
+                                   max_files=2), files_map, results
+
+    def _read(self, *parts):
+        with open(os.path.join(self.ai_dir, *parts), encoding='utf-8') as f:
+            return f.read()
+
+    def test_plan_shards(self):
+        """Los directorios grandes se dividen; los pequeños son un shard con su subárbol"""
+        plan = plan_shards(list(self.FILES), max_files=2)
+        self.assertEqual([(d, scope, sorted(files)) for d, scope, files in plan], [
+            ('.', 'files', ['app.py']),
+            ('api', 'subtree', sorted([os.path.join('api', 'items.py'), os.path.join('api', 'users.py')])),
+            ('lib', 'subtree', [os.path.join('lib', 'deep', 'x.py'), os.path.join('lib', 'util.py')]),
+        ])
+        self.assertEqual([d for d, _, _ in plan_shards(list(self.FILES), max_files=10)], ['.'])
+        self.assertEqual(plan_shards(list(self.FILES), max_files=1)[-1][0], 'lib/deep')
+
+    def test_shard_filenames_do_not_collide(self):
+        """Cada directorio tiene un nombre de shard propio, que no depende de los demás"""
+        from generators.index_shards import _shard_filename
+        directories = ['.', 'a/b', 'a__b', 'a%2Fb', 'a.b', 'a%2Eb', '_root', '%2E']
+        names = [_shard_filename(d) for d in directories]
+        self.assertEqual(len(set(names)), len(directories))
+        self.assertEqual(names[:2], ['%2E.yaml', 'a%2Fb.yaml'])
+
+    def test_shards_cover_full_index(self):
+        """Manifiesto pequeño; los shards juntos tienen las mismas funciones y endpoints"""
+        outputs, files_map, results = self._write()
+        self.assertEqual(outputs, [('PROJECT_INDEX.yaml', True), ('index/%2E.yaml', True),
+                                   ('index/api.yaml', True), ('index/lib.yaml', True)])
+        manifest = self._read('PROJECT_INDEX.yaml')
+        self.assertIn('"api": {file: index/api.yaml, scope: subtree, files: 2, functions: 2, endpoints: 1}',
+                      manifest)
+        self.assertNotIn('functions:\n', manifest)
+
+        full = generate_project_index(self.tmpdir, 'demo', ['Python'], {}, files_map, results['functions'],
+                                      results['endpoints'], results['components'], results['dependencies'])
+        sections = lambda text: sorted(l for l in text.splitlines() if l.startswith('    ') or l.startswith('  "'))
+        sharded = ''.join(self._read('index', name) for name in os.listdir(os.path.join(self.ai_dir, 'index')))
+        self.assertEqual(sections(sharded), sections(full))
+        self.assertIn('"GET /users"', self._read('index', 'api.yaml'))
+
+    def test_only_changed_shard_rewritten(self):
+        """Sin cambios no se toca ningún shard; al editar un archivo solo su shard"""
+        self._write()
+        outputs, _, _ = self._write()
+        self.assertFalse(any(written for _, written in outputs))
+
+        self._put(os.path.join('lib', 'util.py'), 'def helper():\n    pass\n\ndef other():\n    pass\n')
+        outputs, _, _ = self._write()
+        self.assertEqual([name for name, written in outputs if written], ['PROJECT_INDEX.yaml', 'index/lib.yaml'])
+        self.assertIn('other: 4', self._read('index', 'lib.yaml'))
+
+    def test_stale_shards_removed(self):
+        """Los shards de directorios eliminados se borran, y todos al dejar de fragmentar"""
+        self._write()
+        shutil.rmtree(os.path.join(self.tmpdir, 'lib'))
+        outputs, _, _ = self._write()
+        self.assertNotIn('index/lib.yaml', [name for name, _ in outputs])
+        self.assertFalse(os.path.exists(os.path.join(self.ai_dir, 'index', 'lib.yaml')))
+
+        self.assertEqual(prune_shards(self.ai_dir), 2)  # %2E.yaml y api.yaml
+        self.assertFalse(os.path.exists(os.path.join(self.ai_dir, 'index')))
+
+
+class TestQueryCli(_IndexedProject, unittest.TestCase):
+    """Tests para .ai/query.py sobre el índice binario"""
+
+    def setUp(self):
+        super().setUp()
+        import importlib.util
+        spec = importlib.util.spec_from_file_location(
+            'query', os.path.join(os.path.dirname(__file__), '..', 'src', 'scripts', 'query.py'))
+        self.query = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(self.query)
+        write_index_db(self.ai_dir, self.files_map, self.results)
+        self.conn = self.query.open_index(self.ai_dir)
+
+    def tearDown(self):
+        self.conn.close()
+        super().tearDown()
+
+    def run_query(self, command, *args):
+        return self.query.run_query(self.conn, command, list(args))
+
+    def test_schema_version_matches_engine(self):
+        """query.py y el motor comparten la versión del esquema"""
+        from core.index_db import INDEX_DB_VERSION
+        self.assertEqual(self.query.INDEX_DB_VERSION, INDEX_DB_VERSION)
+
+    def test_symbol_queries(self):
+        """where/callers/callees aceptan nombre simple o Clase.metodo"""
+        self.assertEqual(self.run_query('where', 'User.save'), ['models.py:4  User.save'])
+        self.assertEqual(self.run_query('where', 'save'), ['models.py:4  User.save'])
+        self.assertEqual(self.run_query('callers', 'save'), ['api.py:6  create_user'])
+        self.assertEqual(self.run_query('callees', 'create_user'),
+                         ['models.py:3  User', 'models.py:4  User.save'])
+        self.assertEqual(self.run_query('where', 'Order.save'), [])
+
+    def test_endpoint_and_env(self):
+        """endpoint con o sin método, y variables de entorno"""
+        expected = ['POST /users → create_user  api.py:5']
+        self.assertEqual(self.run_query('endpoint', 'post', '/users'), expected)
+        self.assertEqual(self.run_query('endpoint', '/users'), expected)
+        self.assertEqual(self.run_query('env', 'DB_URL'), ['DB_URL  models.py:5'])
+
+    def test_fuzzy_search(self):
+        """Nombres mal escritos o con otro estilo encuentran el símbolo, ordenados por similitud"""
+        hits = self.query.find_fuzzy(self.conn, 'createUser')
+        self.assertEqual(hits[0][1:], ('function', 'create_user', 'api.py', 6))
+        self.assertEqual(hits[0][0], 1.0)
+        self.assertEqual(self.query.find_fuzzy(self.conn, 'usr')[0][1:3], ('function', 'User'))
+        self.assertEqual(self.query.find_fuzzy(self.conn, 'users')[0][1:3], ('endpoint', 'POST /users'))
+        self.assertEqual(self.query.find_fuzzy(self.conn, '__'), [])
+        self.assertTrue(self.run_query('search', 'create', 'user')[0].startswith('1.00  function '))
+
+    def test_unknown_command(self):
+        """Un comando desconocido se rechaza"""
+        with self.assertRaises(ValueError):
+            self.run_query('grep', 'x')
+
+    def test_without_sqlite3(self):
+        """Sin sqlite3 el script informa que index.db no está disponible y sale con código 2"""
+        script = self.query.__file__
+        code = ("import sys, runpy; sys.modules['sqlite3'] = None; "
+                f"sys.argv = [{script!r}, 'where', 'save']; runpy.run_path({script!r}, run_name='__main__')")
+        env = dict(os.environ, PYTHONPATH=os.path.join(os.path.dirname(script), '..'))
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                timeout=60, env=env)
+        self.assertEqual(result.returncode, 2, result.stderr)
+        self.assertIn('sqlite3 no disponible', result.stdout)
+
+
+class TestProfiler(unittest.TestCase):
+    """Tests para el perfilado por etapas (--profile)"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        disable_profiling()
+        shutil.rmtree(self.tmpdir)
+
+    def test_disabled_records_nothing(self):
+        """Sin enable_profiling() las funciones decoradas no registran nada"""
+        calls = []
+        staged = profiled('scan')(lambda: calls.append(1) or ['a'])
+        self.assertEqual(staged(), ['a'])
+        self.assertIsNone(profile_report())
+
+    def test_stages_grouped_and_nested(self):
+        """Agrupa llamadas por (tipo, nombre) y respeta el anidamiento"""
+        inner = profiled('merge', name='inner')(lambda n: list(range(n)))
+
+        @profiled('generate', name='outer')
+        def outer():
+            inner(3)
+            inner(4)
+            return 'a\nb\n'
+
+        enable_profiling(trace_memory=True)
+        outer()
+        report = profile_report({'mode': 'test'})
+        stages = {s['name']: s for s in report['stages']}
+
+        self.assertEqual([s['name'] for s in report['stages']], ['outer', 'inner'])
+        self.assertEqual(stages['inner']['calls'], 2)
+        self.assertEqual(stages['inner']['items'], 7)
+        self.assertEqual(stages['inner']['depth'], 1)
+        self.assertEqual(stages['outer']['items'], 2)  # líneas del texto generado
+        self.assertGreaterEqual(stages['outer']['wall_s'], stages['inner']['wall_s'])
+        self.assertIsNotNone(stages['outer']['alloc_mb'])
+        self.assertEqual(report['context'], {'mode': 'test'})
+
+    def test_generator_stage_spans_iteration(self):
+        """En emisores (generadores) la etapa cubre toda la iteración y cuenta lo producido"""
+        @profiled('generate', name='emitter')
+        def emitter(n):
+            for i in range(n):
+                yield f"line {i}"
+
+        enable_profiling()
+        self.assertEqual(list(emitter(5)), [f"line {i}" for i in range(5)])
+        stage = profile_report()['stages'][0]
+        self.assertEqual((stage['name'], stage['calls'], stage['items']), ('emitter', 1, 5))
+
+    def test_extractor_totals_and_report_file(self):
+        """Acumula tiempos por visitor y los escribe en .profile.json"""
+        enable_profiling()
+        extract_file_record('a.py', {'type': 'py', 'lines': 2, 'content': ['def a():\n', '    b()\n']})
+        report = profile_report()
+        extractors = {e['name']: e for e in report['extractors']}
+        self.assertEqual(set(extractors), {key for key, _ in FILE_VISITORS})
+        self.assertEqual(extractors['functions']['calls'], 1)
+        self.assertEqual(extractors['functions']['items'], 1)
+
+        lines = format_profile(report)
+        self.assertTrue(any('functions' in line for line in lines))
+
+        path = write_profile(self.tmpdir, report)
+        with open(path, encoding='utf-8') as f:
+            saved = json.load(f)
+        self.assertEqual(saved['version'], report['version'])
+        self.assertEqual(len(saved['extractors']), len(FILE_VISITORS))
+
+    def test_worker_stats_merge(self):
+        """Los acumulados de un worker se suman a los del proceso principal"""
+        enable_profiling()
+        merge_extractor_stats({'functions': [10, 0.5, 0.4, 20]})
+        merge_extractor_stats({'functions': [5, 0.25, 0.2, 10]})
+        calls, wall, cpu, n_items = take_extractor_stats()['functions']
+        self.assertEqual((calls, n_items), (15, 30))
+        self.assertAlmostEqual(wall, 0.75)
+        self.assertAlmostEqual(cpu, 0.6)
+        self.assertEqual(take_extractor_stats(), {})
+
+
+class TestSyntheticRepo(unittest.TestCase):
+    """Tests para el generador de repositorios de benchmarks"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _read_all(self, root):
+        contents = {}
+        for dirpath, _, files in os.walk(root):
+            for name in files:
+                path = os.path.join(dirpath, name)
+                with open(path, 'rb') as f:
+                    contents[os.path.relpath(path, root)] = (f.read(), os.stat(path).st_mtime_ns)
+        return contents
+
+    def test_deterministic(self):
+        """Misma configuración y semilla → mismos archivos, contenido y mtime"""
+        from synthetic_repo import generate_repo
+        a, b = os.path.join(self.tmpdir, 'a'), os.path.join(self.tmpdir, 'b')
+        generate_repo(a, 60, seed=3)
+        generate_repo(b, 60, seed=3)
+        self.assertEqual(self._read_all(a), self._read_all(b))
+
+    def test_extractors_see_generated_shape(self):
+        """El motor encuentra los endpoints, lenguajes y clases generados"""
+        from synthetic_repo import generate_repo
+        from core.scanner import build_manifest
+        root = os.path.join(self.tmpdir, 'repo')
+        stats = generate_repo(root, 80, routes=1.5, imports=2, classes=2, functions=3)
+        manifest = build_manifest(root, use_git=False)
+        files_map, records, _ = scan_incremental(root, new_cache(), manifest=manifest)
+        results = merge_file_records(records, root, manifest)
+
+        self.assertEqual(stats['files'], sum(stats['languages'].values()))
+        self.assertEqual(len(results['endpoints']), stats['routes'])
+        self.assertEqual(set(detect_languages(root, manifest['files'])),
+                         {'Python', 'TypeScript', 'Go', 'PHP', 'Vue'})
+        py_file = next(f for f in files_map if f.endswith('.py'))
+        classes = [name for name in results['functions'][py_file] if name.startswith('Model') and '.' not in name]
+        self.assertEqual(len(classes), 2)
+        self.assertTrue(results['dependencies'])
+        self.assertEqual(sum(len(keys) for keys in results['file_index']['endpoints'].values()),
+                         stats['routes'])
+
+    def test_scaling_exponents(self):
+        """run_benchmarks distingue etapas lineales de cuadráticas"""
+        from run_benchmarks import scaling_exponents
+
+        def entry(size, factor):
+            return {'scenario': 'full', 'size': size, 'pipeline_s': size * factor,
+                    'stages': {'generate:linear': size * factor, 'generate:quadratic': size * size * factor / 1000}}
+
+        report = {'results': [entry(1000, 1e-3), entry(10000, 1e-3)]}
+        exponents = {name: exponent for _, name, _, _, _, _, exponent in scaling_exponents(report)}
+        self.assertAlmostEqual(exponents['update_all'], 1.0)
+        self.assertAlmostEqual(exponents['generate:linear'], 1.0)
+        self.assertAlmostEqual(exponents['generate:quadratic'], 2.0)
+
+    def test_import_stage_table(self):
+        """--imports-heavy reporta las etapas de resolución de imports por tamaño"""
+        from run_benchmarks import stage_table, IMPORT_STAGES
+
+        def entry(size):
+            return {'scenario': 'full', 'size': size, 'pipeline_s': 1.0,
+                    'stages': {'merge:import_index': size / 1e5, 'merge:dependencies': size / 1e4}}
+
+        report = {'results': [entry(10000), entry(1000)]}
+        self.assertEqual(stage_table(report, IMPORT_STAGES), [
+            (1000, 'full', [0.01, 0.1]), (10000, 'full', [0.1, 1.0]),
+        ])
+        self.assertEqual(stage_table(report, ['merge:otra'])[0][2], [None])
+
+    def test_dependencies_stage(self):
+        """La resolución de imports se mide como etapa propia dentro de merge_file_records"""
+        from synthetic_repo import generate_repo
+        root = tempfile.mkdtemp()
+        try:
+            generate_repo(root, 50, imports=3)
+            _, records, _ = scan_incremental(root, new_cache())
+            enable_profiling()
+            try:
+                results = merge_file_records(records, root)
+                stages = {s['name']: s for s in profile_report()['stages']}
+            finally:
+                disable_profiling()
+        finally:
+            shutil.rmtree(root)
+        self.assertEqual(stages['dependencies']['items'], len(results['dependencies']))
+        self.assertGreater(stages['dependencies']['items'], 0)
+        self.assertEqual(stages['import_index']['depth'], stages['dependencies']['depth'] + 1)
+
+
+class TestExtractorThroughput(unittest.TestCase):
+    """Micro-benchmark de extract_functions: líneas/segundo por lenguaje"""
+
+    # Piso conservador: detecta regresiones graves (ej: volver a compilar por línea)
+    MIN_LINES_PER_SECOND = 20000
+
+    SAMPLES = {
+        'py': ['@property\n', 'def bar(self):\n', '    return self.x + 1  # c\n', '\n', 'class Foo:\n'],
+        'js': ['export function a() {\n', '  const x = foo(1, 2);\n', '}\n', 'class C {\n', '  // c\n'],
+        'go': ['func (s *Srv) Run(x int) error {\n', '\treturn nil\n', '}\n', 'type T struct {\n'],
+        'rs': ['pub fn a() {\n', '    let x = 1;\n', '}\n', 'pub struct S {\n'],
+        'java': ['public class A {\n', '    private int foo(int x) {\n', '        return x;\n', '    }\n'],
+        'rb': ['class A\n', '  def b(x)\n', '    x + 1\n', '  end\n'],
+        'php': ['class A {\n', '    public function b($x) {\n', '        return $x;\n', '    }\n'],
+    }
+
+    def test_lines_per_second(self):
+        """Cada lenguaje supera el piso de líneas/segundo"""
+        import time
+        rates = {}
+        for ext, sample in self.SAMPLES.items():
+            content = sample * 2000
+            files_map = {f'bench.{ext}': {'type': ext, 'lines': len(content), 'content': content}}
+            start = time.perf_counter()
+            functions = extract_functions(files_map)
+            rates[ext] = int(len(content) / max(time.perf_counter() - start, 1e-9))
+            self.assertTrue(functions, ext)
+        slow = {ext: rate for ext, rate in rates.items() if rate < self.MIN_LINES_PER_SECOND}
+        self.assertFalse(slow, f"líneas/segundo por lenguaje: {rates}")
+
+
 class TestTemplates(unittest.TestCase):
     """Tests para templates de proyectos"""
     
@@ -693,7 +1847,7 @@ class TestInstallFlow(unittest.TestCase):
             'AI_INSTRUCTIONS.yaml',
             'CONTEXT_ANCHOR.yaml', 'CALL_GRAPH.yaml', 'CONFIG_MAP.yaml',
             'ENTRY_POINTS.yaml', 'PATTERNS.yaml', 'QUICK_CONTEXT.yaml',
-            'update.py', 'update_index.py', 'pre-commit.hook'
+            'update.py', 'update_index.py', 'query.py', 'pre-commit.hook', 'index.db'
         ]
         for fname in expected_files:
             self.assertTrue(
@@ -721,6 +1875,107 @@ class TestInstallFlow(unittest.TestCase):
         # Verificar que .ai/src/ (motor) fue copiado
         self.assertTrue(os.path.isdir(os.path.join(ai_dir, 'src')))
 
+    def test_regenerate_indices_in_process(self):
+        """update.py regenera con el motor instalado sin lanzar otro intérprete"""
+        import io
+        import importlib.util
+        from contextlib import redirect_stdout
+        from main import install
+        self.assertTrue(install(self.tmpdir, auto_mode=True))
+        ai_dir = os.path.join(self.tmpdir, '.ai')
+        os.remove(os.path.join(ai_dir, 'PROJECT_INDEX.yaml'))
+
+        spec = importlib.util.spec_from_file_location(
+            'ai_update', os.path.join(ai_dir, 'update.py'))
+        updater = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(updater)
+
+        # El motor instalado reemplaza al de src/ en sys.modules: restaurarlo
+        saved_modules = dict(sys.modules)
+        saved_path = list(sys.path)
+        try:
+            with redirect_stdout(io.StringIO()):
+                self.assertTrue(updater.regenerate_indices(ai_dir))
+        finally:
+            sys.modules.clear()
+            sys.modules.update(saved_modules)
+            sys.path[:] = saved_path
+
+        self.assertTrue(os.path.exists(os.path.join(ai_dir, 'PROJECT_INDEX.yaml')))
+
+    def _load_update_index(self, ai_dir):
+        """Importa .ai/update_index.py instalado (motor de .ai/src)"""
+        import importlib.util
+        spec = importlib.util.spec_from_file_location(
+            'ai_update_index', os.path.join(ai_dir, 'update_index.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    def test_watch_uses_backend_cache(self):
+        """--watch --python-ast tras una instalación con regex no reutiliza registros regex"""
+        from main import install
+        with open(os.path.join(self.tmpdir, 'nested.py'), 'w') as f:
+            f.write('def outer():\n    def inner():\n        pass\n    return inner\n')
+        self.assertTrue(install(self.tmpdir, auto_mode=True))  # backend regex
+        ai_dir = os.path.join(self.tmpdir, '.ai')
+
+        saved_modules = dict(sys.modules)
+        saved_path = list(sys.path)
+        try:
+            updater = self._load_update_index(ai_dir)
+            cache, manifest = updater._watch_state('ast')
+            self.assertEqual(cache['files'], {})
+            updater.update_all(quiet=True, python_backend='ast', cache=cache, manifest=manifest)
+            with open(os.path.join(ai_dir, 'PROJECT_INDEX.yaml'), encoding='utf-8') as f:
+                self.assertIn('outer.inner: 2', f.read())
+
+            # Una caché ya cargada con otro backend se descarta en _regenerate()
+            updater.set_python_backend('regex')
+            regex_cache = updater.load_cache(ai_dir)
+            self.assertEqual(regex_cache['files'], {})  # guardada con la huella de ast
+            updater.update_all(quiet=True, python_backend='regex', cache=regex_cache, manifest=manifest)
+            updater.update_all(quiet=True, python_backend='ast', cache=regex_cache, manifest=manifest)
+            with open(os.path.join(ai_dir, 'PROJECT_INDEX.yaml'), encoding='utf-8') as f:
+                self.assertIn('outer.inner: 2', f.read())
+            self.assertTrue(updater.cache_matches_engine(regex_cache))
+        finally:
+            updater.set_python_backend('regex')
+            sys.modules.clear()
+            sys.modules.update(saved_modules)
+            sys.path[:] = saved_path
+
+    def test_watch_cycle_skips_stat_only_changes(self):
+        """Un ciclo de --watch sin cambios de contenido no regenera; con cambios sí"""
+        from main import install
+        self.assertTrue(install(self.tmpdir, auto_mode=True))
+        ai_dir = os.path.join(self.tmpdir, '.ai')
+        index_path = os.path.join(ai_dir, 'PROJECT_INDEX.yaml')
+        app_path = os.path.join(self.tmpdir, 'app.py')
+
+        saved_modules = dict(sys.modules)
+        saved_path = list(sys.path)
+        try:
+            updater = self._load_update_index(ai_dir)
+            cache, manifest = updater._watch_state('regex')
+            updater.update_all(quiet=True, cache=cache, manifest=manifest)
+            os.remove(index_path)
+            os.utime(app_path, ns=(0, 0))  # solo cambia el stat
+            stats = updater.update_all(quiet=True, cache=cache, manifest=manifest, skip_unchanged=True)
+            self.assertEqual((stats['extracted'], stats['removed']), (0, 0))
+            self.assertFalse(os.path.exists(index_path))
+
+            with open(app_path, 'a') as f:
+                f.write('\ndef added():\n    pass\n')
+            stats = updater.update_all(quiet=True, cache=cache, manifest=manifest, skip_unchanged=True)
+            self.assertEqual(stats['extracted'], 1)
+            with open(index_path, encoding='utf-8') as f:
+                self.assertIn('added:', f.read())
+        finally:
+            sys.modules.clear()
+            sys.modules.update(saved_modules)
+            sys.path[:] = saved_path
+
 
 if __name__ == '__main__':
     unittest.main()